@@ -0,0 +1,67 @@
+"""
+batching.py
+
+Throughput of anonymise_texts (batched recognition) against a loop of
+anonymise_text calls over the same short records.
+
+    python -m benchmarks.batching --model dslim/bert-base-NER --records 500
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.common import write_results
+
+TEMPLATES = [
+    "Theresa May met with Boris Johnson at Downing Street on {n} March.",
+    "Please call Alice Smith on 07700 900{n:03d} about invoice {n}.",
+    "Order {n} shipped from Leeds to Acme Corp.",
+    "No personal data in record {n}.",
+]
+
+
+def make_records(count: int):
+    return [TEMPLATES[n % len(TEMPLATES)].format(n=n) for n in range(count)]
+
+
+def main():
+    from pd_anonymiser.anonymiser import anonymise_text, anonymise_texts, get_analyser
+
+    parser = argparse.ArgumentParser(description="Batch vs per-call anonymisation")
+    parser.add_argument("--model", default="all")
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    try:
+        get_analyser(model=args.model)
+        get_analyser(model=None)
+    except (OSError, ImportError) as e:
+        print(f"Skipping: model {args.model} is not available ({e})")
+        return
+
+    start = time.perf_counter()
+    for record in records:
+        anonymise_text(record, model=args.model)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    anonymise_texts(records, model=args.model, batch_size=args.batch_size)
+    batch_s = time.perf_counter() - start
+
+    results = {
+        "model": args.model,
+        "records": args.records,
+        "batch_size": args.batch_size,
+        "loop_records_per_s": args.records / loop_s,
+        "batch_records_per_s": args.records / batch_s,
+        "speedup": loop_s / batch_s,
+    }
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('batching', results)}")
+
+
+if __name__ == "__main__":
+    main()
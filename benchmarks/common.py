@@ -0,0 +1,45 @@
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def time_call(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> Dict:
+    for _ in range(warmup):
+        fn()
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "repeat": repeat,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "max_s": max(timings),
+    }
+
+
+def write_results(name: str, results: Dict, output_dir: Path = RESULTS_DIR) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc)
+    payload = {
+        "benchmark": name,
+        "timestamp": stamp.isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    out_path = output_dir / f"{name}-{stamp.strftime('%Y%m%dT%H%M%SZ')}.json"
+    with open(out_path, "w") as f_out:
+        json.dump(payload, f_out, indent=2)
+    return out_path
@@ -0,0 +1,170 @@
+"""
+corpus.py
+
+Seeded synthetic corpus with known PII spans, for benchmarks that should not
+depend on real data. The same arguments always produce the same corpus.
+
+ - ``words``: approximate length of each document in words;
+ - ``entity_density``: fraction of words that are (the start of) an entity;
+ - ``repetition``: probability that a document repeats an earlier one, as
+   templated emails and retried prompts do.
+
+    python -m benchmarks.corpus --documents 3 --words 40
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
+
+from presidio_analyzer import RecognizerResult
+
+FIRST_NAMES = [
+    "Alice", "Amir", "Bethan", "Boris", "Chloe", "Daniel", "Fatima", "George",
+    "Hannah", "Isaac", "Jasmine", "Kwame", "Laura", "Mohammed", "Niamh", "Oliver",
+    "Priya", "Rhys", "Sophie", "Theresa", "Tomasz", "Wei", "Yusuf", "Zara",
+]  # fmt: skip
+LAST_NAMES = [
+    "Ahmed", "Brown", "Campbell", "Davies", "Evans", "Fraser", "Green", "Hughes",
+    "Jones", "Khan", "Kowalski", "Li", "May", "Murphy", "Nowak", "Patel",
+    "Roberts", "Singh", "Smith", "Taylor", "Thomas", "Walker", "Williams", "Wilson",
+]  # fmt: skip
+LOCATIONS = [
+    "Aberdeen", "Belfast", "Birmingham", "Bristol", "Cardiff", "Edinburgh",
+    "Glasgow", "Leeds", "Liverpool", "London", "Manchester", "Swansea",
+]  # fmt: skip
+ORGANISATIONS = [
+    "Acme Corp", "Brightwater Ltd", "Northgate Bank", "Oakridge Health",
+    "Riverside Council", "Summit Logistics",
+]  # fmt: skip
+FILLER = (
+    "the a to of and in on for with about after before meeting report invoice "
+    "order account request update please call email visit review confirm "
+    "discussed arranged sent received asked agreed noted shipped booked "
+    "yesterday today tomorrow morning afternoon week month quarter office team"
+).split()
+
+SENTENCE_WORDS = 12
+
+Span = Tuple[str, str]
+
+
+@dataclass
+class Document:
+    text: str
+    # Ground-truth spans, in order
+    results: List[RecognizerResult]
+
+
+def _person(rng: random.Random) -> Span:
+    return "PERSON", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _location(rng: random.Random) -> Span:
+    return "LOCATION", rng.choice(LOCATIONS)
+
+
+def _organisation(rng: random.Random) -> Span:
+    return "ORGANIZATION", rng.choice(ORGANISATIONS)
+
+
+def _email(rng: random.Random) -> Span:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return "EMAIL_ADDRESS", f"{first}.{last}@example.com".lower()
+
+
+def _phone(rng: random.Random) -> Span:
+    return "PHONE_NUMBER", f"07700 900{rng.randrange(1000):03d}"
+
+
+# Relative frequency of each entity type
+ENTITY_MAKERS: List[Tuple[Callable[[random.Random], Span], int]] = [
+    (_person, 5),
+    (_location, 2),
+    (_organisation, 1),
+    (_email, 1),
+    (_phone, 1),
+]
+
+
+def generate_document(
+    rng: random.Random, words: int, entity_density: float
+) -> Document:
+    makers, weights = zip(*ENTITY_MAKERS)
+    parts: List[str] = []
+    results: List[RecognizerResult] = []
+    position = 0
+
+    for i in range(words):
+        at_sentence_start = i % SENTENCE_WORDS == 0
+        if parts:
+            separator = ". " if at_sentence_start else " "
+            parts.append(separator)
+            position += len(separator)
+
+        if rng.random() < entity_density:
+            entity_type, word = rng.choices(makers, weights)[0](rng)
+            results.append(
+                RecognizerResult(entity_type, position, position + len(word), 1.0)
+            )
+        else:
+            word = rng.choice(FILLER)
+            if at_sentence_start:
+                word = word.capitalize()
+        parts.append(word)
+        position += len(word)
+
+    parts.append(".")
+    return Document(text="".join(parts), results=results)
+
+
+def generate_corpus(
+    documents: int = 100,
+    words: int = 200,
+    entity_density: float = 0.05,
+    repetition: float = 0.0,
+    seed: int = 0,
+) -> List[Document]:
+    """Generate ``documents`` documents; see the module docstring."""
+    if not 0 <= entity_density <= 1 or not 0 <= repetition <= 1:
+        raise ValueError("entity_density and repetition must be between 0 and 1")
+
+    rng = random.Random(seed)
+    corpus: List[Document] = []
+    for _ in range(documents):
+        if corpus and rng.random() < repetition:
+            original = rng.choice(corpus)
+            corpus.append(
+                Document(
+                    text=original.text,
+                    results=[
+                        RecognizerResult(r.entity_type, r.start, r.end, r.score)
+                        for r in original.results
+                    ],
+                )
+            )
+        else:
+            corpus.append(generate_document(rng, words, entity_density))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a synthetic PII corpus")
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--entity-density", type=float, default=0.1)
+    parser.add_argument("--repetition", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(
+        args.documents, args.words, args.entity_density, args.repetition, args.seed
+    )
+    for document in corpus:
+        print(document.text)
+        for r in document.results:
+            print(f"  {r.entity_type}: {document.text[r.start : r.end]}")
+
+
+if __name__ == "__main__":
+    main()
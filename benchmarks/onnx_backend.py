@@ -0,0 +1,73 @@
+"""
+onnx_backend.py
+
+Per-text latency of HuggingFaceRecogniser on the torch backend against ONNX
+Runtime (fp32 and dynamic int8), for each Hugging Face model. Exports are
+built once, before timing, in the ONNX cache directory.
+
+Backends that cannot be loaded (model or optimum not installed) are
+reported as skipped.
+
+    python -m benchmarks.onnx_backend --repeat 20
+"""
+
+import argparse
+import json
+
+from benchmarks.batching import make_records
+from benchmarks.common import time_call, write_results
+
+MODELS = ["dslim/bert-base-NER", "StanfordAIMI/stanford-deidentifier-base"]
+
+BACKENDS = {
+    "torch": {"backend": "torch"},
+    "onnx": {"backend": "onnx"},
+    "onnx-int8": {"backend": "onnx", "quantize": True},
+}
+
+
+def main():
+    from pd_anonymiser.recognisers.huggingface import HuggingFaceRecogniser
+
+    parser = argparse.ArgumentParser(description="torch vs ONNX Runtime latency")
+    parser.add_argument("--model", action="append", help="Defaults to every HF model")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=32, help="Texts per batch call")
+    args = parser.parse_args()
+
+    records = make_records(args.batch)
+    text = records[0]
+    results = {}
+    for model in args.model or MODELS:
+        results[model] = {}
+        for name, options in BACKENDS.items():
+            try:
+                recogniser = HuggingFaceRecogniser(model_name=model, **options)
+            except (OSError, ImportError) as e:
+                results[model][name] = {"skipped": str(e)}
+                continue
+
+            entities = recogniser.supported_entities
+            results[model][name] = {
+                "single": time_call(
+                    lambda: recogniser.analyze(text, entities), repeat=args.repeat
+                ),
+                "batch": time_call(
+                    lambda: recogniser.analyze_batch(records, entities),
+                    repeat=max(1, args.repeat // 4),
+                ),
+            }
+
+        torch_result = results[model].get("torch", {})
+        for name, result in results[model].items():
+            if name != "torch" and "single" in result and "single" in torch_result:
+                result["speedup"] = (
+                    torch_result["single"]["median_s"] / result["single"]["median_s"]
+                )
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('onnx_backend', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+parallel.py
+
+Throughput of ParallelAnonymiser as the number of worker processes grows.
+Pool start-up (model loading) is excluded; records per second should grow
+close to linearly with workers up to the number of physical cores.
+
+    python -m benchmarks.parallel --model dslim/bert-base-NER --max-workers 32
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.batching import make_records
+from benchmarks.common import write_results
+
+
+def main():
+    from pd_anonymiser.anonymiser import get_analyser
+    from pd_anonymiser.parallel import ParallelAnonymiser
+
+    parser = argparse.ArgumentParser(description="Parallel anonymisation scaling")
+    parser.add_argument("--model", default="all")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    try:
+        get_analyser(model=args.model)
+    except (OSError, ImportError) as e:
+        print(f"Skipping: model {args.model} is not available ({e})")
+        return
+
+    records = make_records(args.records)
+    runs = []
+    workers = 1
+    while workers <= args.max_workers:
+        with ParallelAnonymiser(workers=workers, model=args.model) as pool:
+            pool.anonymise(records[: workers * 8])  # wait for every worker to load
+            start = time.perf_counter()
+            pool.anonymise(records)
+            elapsed = time.perf_counter() - start
+        runs.append(
+            {
+                "workers": workers,
+                "torch_threads": pool.torch_threads,
+                "records_per_s": args.records / elapsed,
+            }
+        )
+        workers *= 2
+
+    for run in runs:
+        run["speedup"] = run["records_per_s"] / runs[0]["records_per_s"]
+
+    results = {"model": args.model, "records": args.records, "runs": runs}
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('parallel', results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+replacements.py
+
+Scaling of _apply_manual_replacements with the number of entities, next to
+the old splice-per-entity implementation for reference. Time per entity
+should stay flat for the single-pass writer as the entity count grows.
+
+    python -m benchmarks.replacements --max-entities 32000
+"""
+
+import argparse
+import json
+
+from presidio_analyzer import RecognizerResult
+from presidio_anonymizer import OperatorConfig
+
+from benchmarks.common import time_call, write_results
+from pd_anonymiser.anonymiser import _apply_manual_replacements
+
+
+def _splice_replacements(text, results):
+    for r in sorted(results, key=lambda r: -r.start):
+        text = text[: r.start] + r.operator.params["new_value"] + text[r.end :]
+    return text
+
+
+def make_document(entities: int):
+    filler = " met with "
+    name = "Alice Smith"
+    text = (name + filler) * entities
+    results = []
+    for i in range(entities):
+        start = i * (len(name) + len(filler))
+        result = RecognizerResult("PERSON", start, start + len(name), 0.9)
+        result.operator = OperatorConfig("replace", {"new_value": "Person A"})
+        results.append(result)
+    return text, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replacement writer scaling")
+    parser.add_argument("--max-entities", type=int, default=32000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--skip-splice", action="store_true", help="Skip the quadratic reference"
+    )
+    args = parser.parse_args()
+
+    results = []
+    entities = 1000
+    while entities <= args.max_entities:
+        text, spans = make_document(entities)
+        row = {"entities": entities, "text_chars": len(text)}
+
+        writer = time_call(
+            lambda: _apply_manual_replacements(text, spans), repeat=args.repeat
+        )
+        row["writer_median_s"] = writer["median_s"]
+        row["writer_us_per_entity"] = writer["median_s"] / entities * 1e6
+
+        if not args.skip_splice:
+            splice = time_call(
+                lambda: _splice_replacements(text, spans), repeat=1, warmup=0
+            )
+            row["splice_median_s"] = splice["median_s"]
+            row["splice_us_per_entity"] = splice["median_s"] / entities * 1e6
+
+        results.append(row)
+        entities *= 2
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('replacements', {'runs': results})}")
+
+
+if __name__ == "__main__":
+    main()
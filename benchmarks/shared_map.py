@@ -0,0 +1,153 @@
+"""
+shared_map.py
+
+Scaling of one pseudonym map shared across many texts, as anonymise_dataframe,
+anonymise_json, the CLI and anonymise_stream build it, with the number of
+distinct entities. Each text holds one new name, so the map grows by one
+entry per text; time per entity should stay flat as the count grows.
+
+The ``dataframe`` case runs anonymise_dataframe on a column with that many
+distinct values, each repeated over ``--rows-per-value`` rows, and the
+``json`` case runs anonymise_json on a list of that many customer records.
+
+Analysis is not timed: every text comes with its known span.
+
+    python -m benchmarks.shared_map --max-entities 64000 --check
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from typing import Callable, Dict, List, Sequence
+from unittest.mock import patch
+
+from presidio_analyzer import RecognizerResult
+
+from benchmarks.common import time_call, write_results
+from pd_anonymiser.anonymiser import _anonymise_shared
+from pd_anonymiser.sessions import session_store_from_url, set_session_store
+
+# Largest allowed growth in time per entity from the smallest to the largest run
+MAX_SLOWDOWN = 3.0
+
+
+def make_texts(entities: int):
+    texts = [f"Customer {i:07d}" for i in range(entities)]
+    analyses = [known_spans(text) for text in texts]
+    return texts, analyses
+
+
+def known_spans(text: str) -> List[RecognizerResult]:
+    return [RecognizerResult("PERSON", 0, len(text), 0.85)]
+
+
+def known_analyses(texts: Sequence[str], *args) -> List[List[RecognizerResult]]:
+    """Stands in for analyse_texts, so that only the code after it is timed."""
+    return [known_spans(text) for text in texts]
+
+
+def bench_shared(entities: int) -> Callable[[], object]:
+    texts, analyses = make_texts(entities)
+    return lambda: _anonymise_shared(texts, analyses, True, True)
+
+
+def bench_dataframe(entities: int, rows_per_value: int) -> Callable[[], object]:
+    import pandas as pd
+
+    from pd_anonymiser.dataframe import anonymise_dataframe
+
+    texts, _ = make_texts(entities)
+    df = pd.DataFrame({"customer": texts * rows_per_value})
+
+    def run():
+        with patch("pd_anonymiser.dataframe.analyse_texts", known_analyses):
+            anonymise_dataframe(df, allow_reidentification=True)
+
+    return run
+
+
+def bench_json(entities: int) -> Callable[[], object]:
+    from pd_anonymiser.structured import anonymise_json
+
+    texts, _ = make_texts(entities)
+    records = [{"id": i, "customer": {"name": text}} for i, text in enumerate(texts)]
+
+    def run():
+        with patch("pd_anonymiser.structured.analyse_texts", known_analyses):
+            anonymise_json(records, allow_reidentification=True)
+
+    return run
+
+
+def scaling(
+    make: Callable[[int], Callable[[], object]],
+    min_entities: int,
+    max_entities: int,
+    repeat: int,
+) -> List[Dict]:
+    runs = []
+    entities = min_entities
+    while entities <= max_entities:
+        timing = time_call(make(entities), repeat=repeat)
+        runs.append(
+            {
+                "entities": entities,
+                "median_s": timing["median_s"],
+                "us_per_entity": timing["median_s"] / entities * 1e6,
+            }
+        )
+        entities *= 2
+    return runs
+
+
+def slowdown(runs) -> float:
+    """Time per entity in the largest run relative to the smallest."""
+    return runs[-1]["us_per_entity"] / runs[0]["us_per_entity"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared pseudonym map scaling")
+    parser.add_argument("--min-entities", type=int, default=2000)
+    parser.add_argument("--max-entities", type=int, default=32000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rows-per-value", type=int, default=20)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help=f"Fail if time per entity grows more than {MAX_SLOWDOWN}x",
+    )
+    args = parser.parse_args()
+
+    cases = {"shared_map": bench_shared, "json": bench_json}
+    try:
+        import pandas  # noqa: F401
+
+        cases["dataframe"] = lambda n: bench_dataframe(n, args.rows_per_value)
+    except ImportError:
+        print("Skipping the dataframe case: pandas is not installed")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        set_session_store(session_store_from_url(f"file:{directory}"))
+        try:
+            for name, make in cases.items():
+                runs = scaling(make, args.min_entities, args.max_entities, args.repeat)
+                results[name] = {"runs": runs, "slowdown": slowdown(runs)}
+        finally:
+            set_session_store(None)
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('shared_map', results)}")
+    if args.check:
+        failed = [
+            f"{name} ({case['slowdown']:.1f}x)"
+            for name, case in results.items()
+            if case["slowdown"] > MAX_SLOWDOWN
+        ]
+        if failed:
+            sys.exit(f"Time per entity grew with the map: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+startup.py
+
+Import-time and cold-start benchmark.
+
+Every measurement runs in a fresh interpreter so nothing is already cached:
+ - import time of the public entry points (no model should be loaded here);
+ - cold start per model: loading the recogniser and its first analysis.
+
+Models that are not installed are reported as skipped.
+
+    python -m benchmarks.startup --repeat 3
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmarks.common import write_results
+
+MODULES = [
+    "pd_anonymiser.models",
+    "pd_anonymiser.anonymiser",
+    "pd_anonymiser.reidentifier",
+    "pd_anonymiser_mcp.server",
+]
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from pd_anonymiser.models import _loaded
+print(json.dumps({{"seconds": elapsed, "models_loaded": sorted(_loaded)}}))
+"""
+
+COLD_START_SNIPPET = """
+import json, time
+from pd_anonymiser.models import get_recogniser
+start = time.perf_counter()
+try:
+    recogniser = get_recogniser({model!r})
+except (OSError, ImportError) as e:
+    print(json.dumps({{"skipped": str(e)}}))
+    raise SystemExit(0)
+loaded = time.perf_counter()
+recogniser.analyze("Theresa May met Boris Johnson in London.", recogniser.supported_entities)
+done = time.perf_counter()
+print(json.dumps({{"load_s": loaded - start, "first_analyze_s": done - loaded}}))
+"""
+
+
+def _run(snippet: str) -> Dict:
+    out = subprocess.run(
+        [sys.executable, "-c", snippet], capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_imports(repeat: int) -> Dict:
+    results = {}
+    for module in MODULES:
+        runs: List[Dict] = [
+            _run(IMPORT_SNIPPET.format(module=module)) for _ in range(repeat)
+        ]
+        results[module] = {
+            "median_s": statistics.median(r["seconds"] for r in runs),
+            "models_loaded": runs[-1]["models_loaded"],
+        }
+    return results
+
+
+def bench_cold_start(models: List[str]) -> Dict:
+    return {model: _run(COLD_START_SNIPPET.format(model=model)) for model in models}
+
+
+def main():
+    from pd_anonymiser.models import model_registry
+
+    parser = argparse.ArgumentParser(description="Import-time and cold-start benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--model",
+        action="append",
+        help="Model to cold-start (repeatable, defaults to every registered model)",
+    )
+    parser.add_argument("--skip-models", action="store_true")
+    args = parser.parse_args()
+
+    results = {"imports": bench_imports(args.repeat)}
+    if not args.skip_models:
+        results["cold_start"] = bench_cold_start(args.model or list(model_registry))
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('startup', results)}")
+
+
+if __name__ == "__main__":
+    main()
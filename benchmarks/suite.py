@@ -0,0 +1,248 @@
+"""
+suite.py
+
+End-to-end benchmark suite over a seeded synthetic corpus (see corpus.py):
+
+ - anonymise_text per model, and anonymise_texts with repeated documents
+   analysed once;
+ - _generate_pseudonyms and _apply_manual_replacements on the known spans;
+ - session save and load against file and SQLite session stores;
+ - reidentify_text with a cold and a warm session cache.
+
+Models that are not installed are reported as skipped, and --skip-models
+runs only the model-free cases. Results are written as JSON under
+benchmarks/results/; pass --compare with an earlier results file to print
+the change in median time per case.
+
+    python -m benchmarks.suite --documents 200 --words 300 --repetition 0.2
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import time_call, write_results
+from benchmarks.corpus import Document, generate_corpus
+from pd_anonymiser import reidentifier as reid
+from pd_anonymiser.anonymiser import (
+    _apply_manual_replacements,
+    _attach_replacements,
+    _generate_pseudonyms,
+    _save_session,
+    anonymise_text,
+    anonymise_texts,
+    get_analyser,
+)
+from pd_anonymiser.result_cache import set_analysis_cache
+from pd_anonymiser.sessions import session_store_from_url, set_session_store
+from pd_anonymiser.utils import (
+    generate_key,
+    load_encrypted_json,
+    save_encrypted_json,
+)
+
+
+def _case(fn: Callable[[], object], corpus: List[Document], repeat: int) -> Dict:
+    timing = time_call(fn, repeat=repeat)
+    chars = sum(len(d.text) for d in corpus)
+    timing["documents_per_s"] = len(corpus) / timing["median_s"]
+    timing["chars_per_s"] = chars / timing["median_s"]
+    return timing
+
+
+def bench_pseudonyms(corpus: List[Document], repeat: int) -> Dict:
+    def run():
+        for document in corpus:
+            _generate_pseudonyms(document.results, document.text, True)
+
+    return _case(run, corpus, repeat)
+
+
+def bench_replacements(corpus: List[Document], repeat: int) -> Dict:
+    for document in corpus:
+        pseudonyms = _generate_pseudonyms(document.results, document.text, True)
+        _attach_replacements(document.results, pseudonyms, document.text)
+
+    def run():
+        for document in corpus:
+            _apply_manual_replacements(document.text, document.results)
+
+    return _case(run, corpus, repeat)
+
+
+def bench_sessions(corpus: List[Document], repeat: int, directory: Path) -> Dict:
+    maps = [_generate_pseudonyms(d.results, d.text, True) for d in corpus]
+    key = generate_key()
+    results = {}
+    for url in (f"file:{directory / 'files'}", f"sqlite:{directory / 'sessions.db'}"):
+        store = session_store_from_url(url)
+        ids = [f"bench-{i}" for i in range(len(maps))]
+
+        def save():
+            for session_id, pseudonyms in zip(ids, maps):
+                save_encrypted_json(pseudonyms, session_id, key, store=store)
+
+        def load():
+            for session_id in ids:
+                load_encrypted_json(session_id, key, store=store)
+
+        scheme = url.partition(":")[0]
+        results[f"save_{scheme}"] = _case(save, corpus, repeat)
+        results[f"load_{scheme}"] = _case(load, corpus, repeat)
+        store.close()
+    return results
+
+
+def bench_reidentify(corpus: List[Document], repeat: int) -> Dict:
+    sessions = []
+    for document in corpus:
+        pseudonyms = _generate_pseudonyms(document.results, document.text, True)
+        _attach_replacements(document.results, pseudonyms, document.text)
+        anonymised = _apply_manual_replacements(document.text, document.results)
+        sessions.append((anonymised, *_save_session(pseudonyms)))
+
+    def run():
+        for anonymised, session_id, key in sessions:
+            reid.reidentify_text(anonymised, session_id, key)
+
+    def cold():
+        reid.session_cache.clear()
+        run()
+
+    return {"cold": _case(cold, corpus, repeat), "warm": _case(run, corpus, repeat)}
+
+
+def bench_anonymise(
+    corpus: List[Document], models: List[str], repeat: int, batch_size: int
+) -> Dict:
+    texts = [d.text for d in corpus]
+    results = {}
+    for model in models:
+        try:
+            get_analyser(model=model)
+        except (OSError, ImportError) as e:
+            results[model] = {"skipped": str(e)}
+            continue
+
+        def loop():
+            for text in texts:
+                anonymise_text(text, model=model, allow_reidentification=True)
+
+        def batched():
+            anonymise_texts(
+                texts,
+                model=model,
+                allow_reidentification=True,
+                batch_size=batch_size,
+                dedupe=True,
+            )
+
+        results[model] = {
+            "anonymise_text": _case(loop, corpus, repeat),
+            "anonymise_texts_dedupe": _case(batched, corpus, repeat),
+        }
+    return results
+
+
+def compare(results: Dict, baseline: Dict, path: str = "") -> Dict[str, float]:
+    """Ratio of median times, new / baseline, for every case in both runs."""
+    ratios = {}
+    for name, value in results.items():
+        other = baseline.get(name)
+        if not isinstance(value, dict) or not isinstance(other, dict):
+            continue
+        if "median_s" in value and "median_s" in other:
+            ratios[f"{path}{name}"] = value["median_s"] / other["median_s"]
+        else:
+            ratios.update(compare(value, other, f"{path}{name}."))
+    return ratios
+
+
+def run_suite(
+    documents: int,
+    words: int,
+    entity_density: float,
+    repetition: float,
+    seed: int,
+    repeat: int,
+    models: Optional[List[str]],
+    batch_size: int,
+) -> Dict:
+    corpus_args = {
+        "documents": documents,
+        "words": words,
+        "entity_density": entity_density,
+        "repetition": repetition,
+        "seed": seed,
+    }
+
+    def corpus():
+        return generate_corpus(**corpus_args)
+
+    results: Dict = {"corpus": corpus_args}
+    # Measure analysis itself, not the result cache
+    set_analysis_cache(None)
+    with tempfile.TemporaryDirectory() as directory:
+        set_session_store(session_store_from_url(f"file:{directory}/sessions"))
+        try:
+            results["generate_pseudonyms"] = bench_pseudonyms(corpus(), repeat)
+            results["apply_manual_replacements"] = bench_replacements(corpus(), repeat)
+            results["sessions"] = bench_sessions(corpus(), repeat, Path(directory))
+            results["reidentify_text"] = bench_reidentify(corpus(), repeat)
+            if models:
+                results["anonymise"] = bench_anonymise(
+                    corpus(), models, repeat, batch_size
+                )
+        finally:
+            set_session_store(None)
+            reid.session_cache.clear()
+    return results
+
+
+def main():
+    from pd_anonymiser.models import model_registry
+
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--entity-density", type=float, default=0.05)
+    parser.add_argument("--repetition", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--model",
+        action="append",
+        help="Model to benchmark (repeatable, defaults to every registered model)",
+    )
+    parser.add_argument("--skip-models", action="store_true")
+    parser.add_argument(
+        "--compare", type=Path, help="Earlier results file to compare against"
+    )
+    args = parser.parse_args()
+
+    models = None if args.skip_models else (args.model or list(model_registry))
+    results = run_suite(
+        args.documents,
+        args.words,
+        args.entity_density,
+        args.repetition,
+        args.seed,
+        args.repeat,
+        models,
+        args.batch_size,
+    )
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('suite', results)}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        print("Median time relative to baseline (<1 is faster):")
+        for name, ratio in compare(results, baseline).items():
+            print(f"  {name}: {ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,13 @@ setup(
         "tiktoken",
         "fastmcp",
     ],
-    extras_require={"dev": ["pytest", "pytest-cov", "black", "pip-tools"]},
+    extras_require={
+        "dev": ["pytest", "pytest-cov", "black", "pip-tools"],
+        "onnx": ["optimum[onnxruntime]"],
+        "pandas": ["pandas"],
+    },
+    entry_points={
+        "console_scripts": ["pd-anonymiser=pd_anonymiser.cli:main"],
+    },
     python_requires=">=3.10",
 )
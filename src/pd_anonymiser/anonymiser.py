@@ -1,19 +1,27 @@
 import base64
+import re
+import threading
+import time
 import uuid
+import pd_anonymiser.metrics as metrics
 import pd_anonymiser.models as model_registry
-from pathlib import Path
-from typing import List, Optional
+from copy import copy
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
 
-from collections import defaultdict
-from presidio_analyzer import AnalyzerEngine, RecognizerResult
+from collections import Counter
+from presidio_analyzer import AnalyzerEngine, EntityRecognizer, RecognizerResult
 from presidio_anonymizer import AnonymizerEngine, OperatorConfig
-from pd_anonymiser.utils import generate_key, save_encrypted_json
+from pd_anonymiser.merging import merge_results
+from pd_anonymiser.result_cache import cache_key, get_analysis_cache
+from pd_anonymiser.utils import (
+    generate_key,
+    save_encrypted_json,
+    save_encrypted_jsons,
+)
 
 
-DATA_DIR = Path("sessions")
-DATA_DIR.mkdir(exist_ok=True)
-
 DEFAULT_MAPPING = {
     "PERSON": "Person",
     "LOCATION": "Location",
@@ -23,6 +31,14 @@ DEFAULT_MAPPING = {
     "DATE_TIME": "Date",
 }
 
+DEFAULT_BATCH_SIZE = 32
+
+# A line without its line break
+_LINE = re.compile(r"[^\r\n]+")
+
+_analysers: Dict[Tuple[str, Optional[str], bool], AnalyzerEngine] = {}
+_analysers_lock = threading.Lock()
+
 
 @dataclass
 class AnonymisationResult:
@@ -37,43 +53,441 @@ def anonymise_text(
     use_reusable_tags: bool = True,
     model: str = "all",
     allow_reidentification: bool = False,
+    cascade: bool = False,
 ) -> AnonymisationResult:
-    analyser = AnalyzerEngine()
-    model_registry.register_models(analyser, model)
+    """Anonymise one text.
+
+    With ``cascade``, the model recognisers only run on the sentences that
+    Presidio's cheap NLP and pattern stage flags; see ``CascadeRecogniser``.
+    When a result cache is configured, a text analysed before is not
+    analysed again; see ``pd_anonymiser.result_cache``.
+    """
+
+    def analyse() -> List[RecognizerResult]:
+        analyser = get_analyser(language, model, cascade=cascade)
+        return analyser.analyze(text=text, language=language)
+
+    with metrics.timed("anonymise_text"):
+        cache = get_analysis_cache()
+        if cache is None:
+            results = analyse()
+        else:
+            results = cache.analyse(cache_key(text, language, model, cascade), analyse)
+        return _anonymise_analysed(
+            text, results, use_reusable_tags, allow_reidentification
+        )
+
+
+def anonymise_texts(
+    texts: Iterable[str],
+    language: str = "en",
+    use_reusable_tags: bool = True,
+    model: str = "all",
+    allow_reidentification: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dedupe: bool = False,
+    save_sessions: bool = True,
+    cascade: bool = False,
+) -> List[AnonymisationResult]:
+    """Anonymise many texts, running recognition in batches.
+
+    Returns one result, with its own session, per input text, exactly as if
+    ``anonymise_text`` had been called on each.
+
+    With ``dedupe``, texts are analysed line by line and each distinct line
+    is analysed once per batch, however often it repeats (footers,
+    disclaimers, quoted replies). Recognition then sees each line on its own.
+
+    With ``save_sessions=False``, no session is written and the results have
+    no session id or key: for bulk output that will never be reidentified.
+
+    The result cache and ``cascade`` work as for ``anonymise_text``; see
+    ``analyse_texts``.
+    """
+    with metrics.timed("anonymise_texts"):
+        # Sessions are written together once the whole batch is anonymised.
+        pending: List[Tuple[dict, str, bytes]] = []
+        results = _anonymise_many(
+            list(texts),
+            language,
+            use_reusable_tags,
+            model,
+            allow_reidentification,
+            batch_size,
+            pending,
+            dedupe=dedupe,
+            save_sessions=save_sessions,
+            cascade=cascade,
+        )
+        if pending:
+            save_encrypted_jsons(pending)
+        return results
+
+
+def _anonymise_many(
+    texts: Sequence[str],
+    language: str,
+    use_reusable_tags: bool,
+    model: str,
+    allow_reidentification: bool,
+    batch_size: int,
+    pending: List[Tuple[dict, str, bytes]],
+    dedupe: bool = False,
+    save_sessions: bool = True,
+    cascade: bool = False,
+) -> List[AnonymisationResult]:
+    if dedupe:
+        analyses = analyse_lines(texts, language, model, batch_size, cascade=cascade)
+    else:
+        analyses = analyse_texts(texts, language, model, batch_size, cascade)
+    return [
+        _anonymise_analysed(
+            text,
+            results,
+            use_reusable_tags,
+            allow_reidentification,
+            pending,
+            save_session=save_sessions,
+        )
+        for text, results in zip(texts, analyses)
+    ]
+
+
+def analyse_texts(
+    texts: Sequence[str],
+    language: str = "en",
+    model: str = "all",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    cascade: bool = False,
+) -> List[List[RecognizerResult]]:
+    """Run the analyser over a batch of texts.
+
+    Presidio's NLP pass uses ``nlp.pipe`` and each model recogniser sees the
+    whole batch at once; the per-text results are then passed through the
+    usual Presidio post-processing (context, scores, de-duplication). With
+    ``cascade``, the models instead see only the sentences that
+    ``CascadeRecogniser`` escalates.
+
+    When a result cache is configured, every text is looked up first and
+    only the distinct texts it does not hold are analysed, as one batch.
+    """
+    if not texts:
+        return []
+    cache = get_analysis_cache()
+    if cache is None:
+        return _analyse_uncached(texts, language, model, batch_size, cascade)
+
+    keys = [cache_key(text, language, model, cascade) for text in texts]
+    analyses = [cache.get(key) for key in keys]
+    # Distinct texts the cache does not hold, by key
+    misses: Dict[str, str] = {}
+    for key, text, results in zip(keys, texts, analyses):
+        if results is None:
+            misses.setdefault(key, text)
+    if misses:
+        start = time.perf_counter()
+        fresh = dict(
+            zip(
+                misses,
+                _analyse_uncached(
+                    list(misses.values()), language, model, batch_size, cascade
+                ),
+            )
+        )
+        seconds = (time.perf_counter() - start) / len(misses)
+        for key, results in fresh.items():
+            cache.put(key, results, seconds)
+        # Callers mutate results, so a text repeated in the batch gets copies
+        analyses = [
+            results if results is not None else [copy(r) for r in fresh[key]]
+            for key, results in zip(keys, analyses)
+        ]
+    return analyses
+
+
+def _analyse_uncached(
+    texts: Sequence[str],
+    language: str,
+    model: str,
+    batch_size: int,
+    cascade: bool,
+) -> List[List[RecognizerResult]]:
+    if cascade:
+        # The cascade recogniser is registered on the engine and batches the
+        # escalated sentences of each text itself
+        analyser = get_analyser(language, model, cascade=True)
+        return [
+            analyser.analyze(text=text, language=language, nlp_artifacts=artifacts)
+            for text, artifacts in analyser.nlp_engine.process_batch(
+                texts, language, batch_size=batch_size
+            )
+        ]
+
+    analyser = get_analyser(language, model=None)
+    recognisers = [
+        model_registry.get_recogniser(name)
+        for name in model_registry.resolve_models(model)
+    ]
+    batch_results = [
+        _analyse_batch(recogniser, texts, batch_size) for recogniser in recognisers
+    ]
+    nlp_batch = analyser.nlp_engine.process_batch(
+        texts, language, batch_size=batch_size
+    )
+
+    analyses = []
+    for i, (text, nlp_artifacts) in enumerate(nlp_batch):
+        precomputed = [
+            _PrecomputedRecogniser(recogniser, results[i], language)
+            for recogniser, results in zip(recognisers, batch_results)
+        ]
+        analyses.append(
+            analyser.analyze(
+                text=text,
+                language=language,
+                nlp_artifacts=nlp_artifacts,
+                ad_hoc_recognizers=precomputed,
+            )
+        )
+    return analyses
+
+
+def analyse_lines(
+    texts: Sequence[str],
+    language: str = "en",
+    model: str = "all",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dedupe: bool = True,
+    cascade: bool = False,
+) -> List[List[RecognizerResult]]:
+    """Analyse texts line by line, each distinct line only once.
+
+    Results for a repeated line are copied to every occurrence, shifted to
+    its offset, so the output is the same as with ``dedupe=False``, where
+    every line is analysed where it occurs.
+    """
+    lines: List[str] = []
+    index: Dict[str, int] = {}
+    # Per text: (line number in ``lines``, offset of the line in the text)
+    placements: List[List[Tuple[int, int]]] = []
+    for text in texts:
+        placed = []
+        for m in _LINE.finditer(text):
+            line = m.group(0)
+            if line.isspace():
+                continue
+            if dedupe:
+                i = index.setdefault(line, len(lines))
+                if i == len(lines):
+                    lines.append(line)
+            else:
+                i = len(lines)
+                lines.append(line)
+            placed.append((i, m.start()))
+        placements.append(placed)
 
-    results = analyser.analyze(text=text, language=language)
+    line_results = analyse_texts(lines, language, model, batch_size, cascade)
+    return [
+        [_shifted(r, offset) for i, offset in placed for r in line_results[i]]
+        for placed in placements
+    ]
+
+
+def _shifted(result: RecognizerResult, offset: int) -> RecognizerResult:
+    return RecognizerResult(
+        entity_type=result.entity_type,
+        start=result.start + offset,
+        end=result.end + offset,
+        score=result.score,
+        analysis_explanation=result.analysis_explanation,
+        recognition_metadata=result.recognition_metadata,
+    )
+
+
+def _analyse_batch(
+    recogniser: EntityRecognizer, texts: Sequence[str], batch_size: int
+) -> List[List[RecognizerResult]]:
+    entities = recogniser.supported_entities
+    if hasattr(recogniser, "analyze_batch"):
+        return recogniser.analyze_batch(texts, entities, batch_size=batch_size)
+    return [recogniser.analyze(text, entities) for text in texts]
+
+
+class _PrecomputedRecogniser(EntityRecognizer):
+    """Replays results a model recogniser already produced in a batch."""
+
+    def __init__(
+        self,
+        recogniser: EntityRecognizer,
+        results: List[RecognizerResult],
+        language: str,
+    ):
+        self._results = results
+        super().__init__(
+            supported_entities=recogniser.supported_entities,
+            name=recogniser.name,
+            supported_language=language,
+        )
+
+    def load(self):
+        pass
+
+    def analyze(self, text, entities, nlp_artifacts=None) -> List[RecognizerResult]:
+        return [r for r in self._results if r.entity_type in entities]
+
+
+def _anonymise_analysed(
+    text: str,
+    results: List[RecognizerResult],
+    use_reusable_tags: bool,
+    allow_reidentification: bool,
+    pending: Optional[List[Tuple[dict, str, bytes]]] = None,
+    save_session: bool = True,
+) -> AnonymisationResult:
+    metrics.observe_text("anonymise", text)
     if not results:
+        metrics.observe_entities(0)
         return AnonymisationResult(text=text, session_id=None, key=None)
 
-    pseudonyms = _generate_pseudonyms(results, text, use_reusable_tags)
+    results = merge_results(results)
+    metrics.observe_entities(len(results))
+    with metrics.timed("pseudonyms"):
+        pseudonyms = _generate_pseudonyms(results, text, use_reusable_tags)
     _attach_replacements(results, pseudonyms, text)
 
+    session_id = key = None
+    if save_session:
+        session_id, key = _save_session(pseudonyms, pending)
+
+    return AnonymisationResult(
+        text=_render(text, results, allow_reidentification),
+        session_id=session_id,
+        key=key,
+    )
+
+
+def _anonymise_shared(
+    texts: Sequence[str],
+    analyses: Iterable[List[RecognizerResult]],
+    use_reusable_tags: bool,
+    allow_reidentification: bool,
+) -> Tuple[Dict[str, str], dict]:
+    """Anonymise analysed texts with one pseudonym map shared by all of them.
+
+    Returns the anonymised version of every text with findings, keyed by the
+    original, and the pseudonym map, which the caller saves as one session.
+    """
+    pseudonyms: dict = {}
+    counters: Counter = Counter()
+    replacements: Dict[str, str] = {}
+    for text, results in zip(texts, analyses):
+        if results:
+            results = merge_results(results)
+            with metrics.timed("pseudonyms"):
+                _generate_pseudonyms(
+                    results, text, use_reusable_tags, pseudonyms, counters
+                )
+            _attach_replacements(results, pseudonyms, text)
+            replacements[text] = _render(text, results, allow_reidentification)
+    return replacements, pseudonyms
+
+
+def _save_session(
+    pseudonyms: dict, pending: Optional[List[Tuple[dict, str, bytes]]] = None
+) -> Tuple[str, str]:
+    """Encrypt and store a pseudonym map, returning its session id and encoded key.
+
+    With ``pending``, the session is queued there for a batched write instead.
+    """
     session_id = str(uuid.uuid4())
     key = generate_key()
     if not key:
         raise ValueError("Encryption key generation failed.")
 
-    save_encrypted_json(pseudonyms, session_id, key)
+    if pending is None:
+        save_encrypted_json(pseudonyms, session_id, key)
+    else:
+        pending.append((pseudonyms, session_id, key))
+    return session_id, base64.urlsafe_b64encode(key).decode()
+
 
+def _render(
+    text: str, results: List[RecognizerResult], allow_reidentification: bool
+) -> str:
     if allow_reidentification:
-        anonymised_text = _apply_manual_replacements(text, results)
-    else:
-        anonymised_text = (
-            AnonymizerEngine().anonymize(text=text, analyzer_results=results).text
-        )
+        return _apply_manual_replacements(text, results)
+    return get_anonymiser_engine().anonymize(text=text, analyzer_results=results).text
 
-    return AnonymisationResult(
-        text=anonymised_text,
-        session_id=session_id,
-        key=base64.urlsafe_b64encode(key).decode(),
+
+def get_analyser(
+    language: str = "en", model: Optional[str] = "all", cascade: bool = False
+) -> AnalyzerEngine:
+    """Return the shared analyser for a language and model selection.
+
+    Engines are built once per process and reused by every call, so the
+    Presidio NLP pipeline and the model recognisers are only loaded once.
+    ``model=None`` gives an engine with only Presidio's built-in recognisers.
+    """
+    key = (language, model, cascade)
+    analyser = _analysers.get(key)
+    if analyser is not None:
+        return analyser
+
+    with _analysers_lock:
+        analyser = _analysers.get(key)
+        if analyser is None:
+            analyser = _build_analyser(language, model, cascade)
+            _analysers[key] = analyser
+    return analyser
+
+
+@lru_cache(maxsize=None)
+def get_anonymiser_engine() -> AnonymizerEngine:
+    return AnonymizerEngine()
+
+
+def clear_engines() -> None:
+    """Drop all cached engines, e.g. after changing the model registry."""
+    with _analysers_lock:
+        _analysers.clear()
+    get_anonymiser_engine.cache_clear()
+
+
+def _build_analyser(
+    language: str, model: Optional[str], cascade: bool = False
+) -> AnalyzerEngine:
+    # Engines for other model selections in the same language share one NLP engine.
+    nlp_engine = next(
+        (a.nlp_engine for (lang, *_), a in _analysers.items() if lang == language),
+        None,
     )
+    analyser = AnalyzerEngine(nlp_engine=nlp_engine)
+    if model is not None:
+        model_registry.register_models(analyser, model, cascade=cascade)
+    metrics.instrument_nlp_engine(analyser.nlp_engine)
+    for recogniser in analyser.registry.recognizers:
+        metrics.instrument_recogniser(recogniser)
+    return analyser
 
 
 def _generate_pseudonyms(
-    results: List[RecognizerResult], text: str, use_reusable: bool
+    results: List[RecognizerResult],
+    text: str,
+    use_reusable: bool,
+    pseudonyms: Optional[dict] = None,
+    counters: Optional[Counter] = None,
 ) -> dict:
-    entity_counters = defaultdict(int)
-    pseudonyms = {}
+    """Assign a pseudonym to each distinct (entity type, original) pair.
+
+    Pass an existing map to extend it: known values keep their pseudonym and
+    new ones continue the lettering, so several texts can share one map.
+    A caller that extends one map many times should keep ``counters``, the
+    number of pseudonyms per entity type, next to it; it is updated in
+    place, and otherwise recounted from the map on every call.
+    """
+    pseudonyms = {} if pseudonyms is None else pseudonyms
+    if counters is None:
+        counters = Counter(entity_type for entity_type, _ in pseudonyms)
 
     for r in results:
         entity_type = r.entity_type
@@ -81,9 +495,9 @@ def _generate_pseudonyms(
         key = (entity_type, original)
 
         if key not in pseudonyms:
-            entity_counters[entity_type] += 1
+            counters[entity_type] += 1
             pseudonym = (
-                f"{DEFAULT_MAPPING.get(entity_type, entity_type)} {chr(64 + entity_counters[entity_type])}"
+                f"{DEFAULT_MAPPING.get(entity_type, entity_type)} {_tag_suffix(counters[entity_type])}"
                 if use_reusable
                 else str(uuid.uuid4())
             )
@@ -92,6 +506,15 @@ def _generate_pseudonyms(
     return pseudonyms
 
 
+def _tag_suffix(n: int) -> str:
+    """1 -> "A", 26 -> "Z", 27 -> "AA", like spreadsheet columns."""
+    suffix = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        suffix = chr(65 + rem) + suffix
+    return suffix
+
+
 def _attach_replacements(
     results: List[RecognizerResult], pseudonyms: dict, text: str
 ) -> None:
@@ -104,7 +527,19 @@ def _attach_replacements(
 
 
 def _apply_manual_replacements(text: str, results: List[RecognizerResult]) -> str:
-    for r in sorted(results, key=lambda r: -r.start):
-        replacement = r.operator.params["new_value"]
-        text = text[: r.start] + replacement + text[r.end :]
-    return text
+    """Write the replacements in one left-to-right pass.
+
+    Spans are visited in order of start offset (longest first on ties) and
+    any span overlapping one already written is skipped, so no part of the
+    text is replaced twice.
+    """
+    parts = []
+    cursor = 0
+    for r in sorted(results, key=lambda r: (r.start, -r.end)):
+        if r.start < cursor:
+            continue
+        parts.append(text[cursor : r.start])
+        parts.append(r.operator.params["new_value"])
+        cursor = r.end
+    parts.append(text[cursor:])
+    return "".join(parts)
@@ -0,0 +1,570 @@
+"""
+Bulk anonymisation of CSV and JSONL files from the command line.
+
+    pd-anonymiser customers.csv -o customers.anon.csv --fields name,notes --workers 8
+
+Records are read in batches and the selected fields of a batch are
+anonymised together, across worker processes with ``--workers``. Output is
+appended batch by batch. The next batch is read and anonymised while the
+previous one is written, with at most ``--max-pending`` batches in memory,
+so a slow disk or a slow model holds back reading rather than filling
+memory.
+
+Once a batch is written, the input and output offsets are saved to a
+checkpoint file. A killed job resumes from the last checkpoint when it is
+run again with the same input, fields, language, model and
+re-identification settings; ``--restart`` starts over.
+
+Without ``--allow-reidentification`` entities are replaced by tags such as
+``<PERSON>`` and no session is saved. With it, entities get pseudonyms
+shared by all records of a batch, and the batch's pseudonym map is saved as
+one session; the keys file gets one JSONL line per batch (first_record,
+last_record, session_id, key).
+
+CSV fields are column names. JSONL fields are dotted paths into nested
+objects and lists, as for ``pd_anonymiser.structured``: ``customer.name``,
+``orders.*.note``. Without ``--fields``, every string in a record is
+anonymised, however deeply it is nested.
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import (
+    BinaryIO,
+    Callable,
+    Deque,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from presidio_analyzer import RecognizerResult
+
+from pd_anonymiser.anonymiser import (
+    DEFAULT_BATCH_SIZE,
+    _anonymise_shared,
+    _save_session,
+    analyse_texts,
+)
+from pd_anonymiser.parallel import ParallelAnonymiser
+from pd_anonymiser.structured import Path as FieldPath
+from pd_anonymiser.structured import _rebuild, _select_leaves, _Selector
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+DEFAULT_RECORDS_PER_BATCH = 256
+DEFAULT_MAX_PENDING = 2
+
+PathLike = Union[str, Path]
+# (session_id, key)
+Session = Tuple[str, str]
+# Whether to anonymise the value at a path in a record
+Select = Callable[[FieldPath], bool]
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a job, saved after every batch that is fully written."""
+
+    # What the job is: a checkpoint is only resumed by the same job
+    input: str
+    format: str
+    fields: Optional[List[str]]
+    language: str
+    model: str
+    allow_reidentification: bool
+    keys: Optional[str]
+    # How far it got
+    input_offset: int
+    records: int
+    output_bytes: int
+    keys_bytes: int
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f_out:
+            json.dump(asdict(self), f_out)
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["Checkpoint"]:
+        if not path.exists():
+            return None
+        with open(path) as f_in:
+            try:
+                return cls(**json.load(f_in))
+            except TypeError:
+                raise ValueError(
+                    f"{path} is from another version; pass --restart to start over"
+                ) from None
+
+    def same_job(self, other: "Checkpoint") -> bool:
+        return self._job() == other._job()
+
+    def _job(self) -> tuple:
+        return (
+            self.input,
+            self.format,
+            self.fields,
+            self.language,
+            self.model,
+            self.allow_reidentification,
+            self.keys,
+        )
+
+
+class _Lines:
+    """Decoded lines of a binary file, tracking the offset after each one."""
+
+    def __init__(self, f: BinaryIO, offset: int):
+        f.seek(offset)
+        self.f = f
+        self.offset = offset
+
+    def __iter__(self) -> "_Lines":
+        return self
+
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset = self.f.tell()
+        return line.decode("utf-8")
+
+
+def read_jsonl(f: BinaryIO, offset: int = 0) -> Iterator[Tuple[dict, int]]:
+    """(record, offset after the record) for each non-blank line."""
+    lines = _Lines(f, offset)
+    for line in lines:
+        if line.strip():
+            yield json.loads(line), lines.offset
+
+
+def read_csv_header(f: BinaryIO) -> Tuple[List[str], int]:
+    """The column names and the offset of the first record."""
+    lines = _Lines(f, 0)
+    header = next(csv.reader(lines), None)
+    if header is None:
+        raise ValueError("CSV input is empty")
+    return header, lines.offset
+
+
+def read_csv(f: BinaryIO, header: List[str], offset: int) -> Iterator[Tuple[dict, int]]:
+    """(record, offset after the record); records may span lines."""
+    lines = _Lines(f, offset)
+    # csv.reader pulls lines only until a record is complete, so the offset
+    # after each row is exact even for quoted multi-line fields.
+    for row in csv.reader(lines):
+        if row:
+            yield dict(zip(header, row)), lines.offset
+
+
+def encode_jsonl(records: Sequence[dict]) -> bytes:
+    return "".join(
+        json.dumps(record, ensure_ascii=False) + "\n" for record in records
+    ).encode("utf-8")
+
+
+def encode_csv_header(header: List[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=header, lineterminator="\n").writeheader()
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_csv(records: Sequence[dict], header: List[str]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header, lineterminator="\n")
+    writer.writerows(records)
+    return buffer.getvalue().encode("utf-8")
+
+
+def field_selector(fields: Optional[Sequence[str]], format: str) -> Select:
+    """Which values of a record to anonymise; see the module docstring."""
+    if format == "csv" and fields is not None:
+        columns = set(fields)
+        return lambda path: path[0] in columns
+    return _Selector(fields, ())
+
+
+def anonymise_records(
+    analyse: Callable[[List[str]], List[List[RecognizerResult]]],
+    records: Sequence[dict],
+    select: Select,
+    allow_reidentification: bool = False,
+) -> Tuple[List[dict], Optional[Session]]:
+    """Anonymise the selected string values of a batch of records.
+
+    Values nested in objects and lists are selected by their path, from
+    ``field_selector``. Empty and non-string values are left as they are.
+    Each distinct value is analysed once, and with ``allow_reidentification``
+    the batch's pseudonym map is saved as one session, which is returned.
+    """
+    leaves = [_select_leaves(record, select) for record in records]
+    values = list(
+        dict.fromkeys(
+            text for selected in leaves for text in selected.values() if text.strip()
+        )
+    )
+    if not values:
+        return list(records), None
+
+    replacements, pseudonyms = _anonymise_shared(
+        values, analyse(values), True, allow_reidentification
+    )
+    anonymised = [
+        _rebuild(
+            record,
+            (),
+            lambda path, text: (
+                replacements.get(text, text) if path in selected else text
+            ),
+        )
+        for record, selected in zip(records, leaves)
+    ]
+
+    session = None
+    if allow_reidentification and pseudonyms:
+        session = _save_session(pseudonyms)
+    return anonymised, session
+
+
+@contextmanager
+def _analyser(workers: int, language: str, model: str, batch_size: int):
+    if workers > 1:
+        with ParallelAnonymiser(
+            workers=workers, language=language, model=model, batch_size=batch_size
+        ) as pool:
+            yield pool.analyse
+    else:
+        yield partial(
+            analyse_texts, language=language, model=model, batch_size=batch_size
+        )
+
+
+def _open_output(path: Path, size: Optional[int]) -> BinaryIO:
+    """Open for appending, truncated to ``size``; a fresh file if ``size`` is None."""
+    if size is None:
+        return open(path, "wb")
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        raise ValueError(
+            f"Cannot resume: {path} is missing; pass --restart to start over"
+        ) from None
+    if os.fstat(f.fileno()).st_size < size:
+        f.close()
+        raise ValueError(
+            f"Cannot resume: {path} is shorter than the checkpoint says; "
+            "pass --restart to start over"
+        )
+    f.truncate(size)
+    f.seek(size)
+    return f
+
+
+def _sync(f: BinaryIO) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def infer_format(path: PathLike) -> str:
+    suffix = Path(path).suffix.lower().lstrip(".")
+    if suffix in ("jsonl", "ndjson"):
+        return "jsonl"
+    if suffix == "csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; pass --format")
+
+
+def anonymise_file(
+    input_path: PathLike,
+    output_path: PathLike,
+    fields: Optional[Sequence[str]] = None,
+    format: Optional[str] = None,
+    language: str = "en",
+    model: str = "all",
+    allow_reidentification: bool = False,
+    keys_path: Optional[PathLike] = None,
+    records_per_batch: int = DEFAULT_RECORDS_PER_BATCH,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+    max_pending: int = DEFAULT_MAX_PENDING,
+    checkpoint_path: Optional[PathLike] = None,
+    restart: bool = False,
+) -> int:
+    """Anonymise a CSV or JSONL file, resuming from a checkpoint if there is one.
+
+    Returns the number of records in the output.
+    """
+    if records_per_batch < 1 or max_pending < 1:
+        raise ValueError("records_per_batch and max_pending must be at least 1")
+    input_path, output_path = Path(input_path), Path(output_path)
+    format = format or infer_format(input_path)
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    fields = list(fields) if fields else None
+    checkpoint_path = Path(checkpoint_path or f"{output_path}.checkpoint")
+    if allow_reidentification:
+        keys_path = Path(keys_path or f"{output_path}.keys.jsonl")
+
+    job = Checkpoint(
+        input=str(input_path.resolve()),
+        format=format,
+        fields=fields,
+        language=language,
+        model=model,
+        allow_reidentification=allow_reidentification,
+        keys=str(keys_path.resolve()) if keys_path else None,
+        input_offset=0,
+        records=0,
+        output_bytes=0,
+        keys_bytes=0,
+    )
+    checkpoint = None if restart else Checkpoint.load(checkpoint_path)
+    if checkpoint is not None and not checkpoint.same_job(job):
+        raise ValueError(
+            f"{checkpoint_path} is for another job; pass --restart to start over"
+        )
+    if checkpoint is not None:
+        logger.info("Resuming after %d records", checkpoint.records)
+
+    with open(input_path, "rb") as src:
+        if format == "csv":
+            header, first_record = read_csv_header(src)
+            unknown = sorted(set(fields or ()) - set(header))
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            encode = partial(encode_csv, header=header)
+            read = partial(read_csv, src, header)
+        else:
+            first_record = 0
+            encode = encode_jsonl
+            read = partial(read_jsonl, src)
+
+        if checkpoint is None:
+            out = _open_output(output_path, None)
+            if format == "csv":
+                out.write(encode_csv_header(header))
+            keys = _open_output(keys_path, None) if keys_path else None
+            # As after every batch, the files are durable before the checkpoint
+            _sync(out)
+            if keys is not None:
+                _sync(keys)
+            checkpoint = job
+            checkpoint.input_offset = first_record
+            checkpoint.output_bytes = out.tell()
+            checkpoint.save(checkpoint_path)
+        else:
+            out = _open_output(output_path, checkpoint.output_bytes)
+            keys = _open_output(keys_path, checkpoint.keys_bytes) if keys_path else None
+
+        try:
+            with _analyser(workers, language, model, batch_size) as analyse:
+                _run(
+                    partial(
+                        anonymise_records,
+                        analyse,
+                        select=field_selector(fields, format),
+                        allow_reidentification=allow_reidentification,
+                    ),
+                    read(checkpoint.input_offset),
+                    encode,
+                    out,
+                    keys,
+                    checkpoint,
+                    checkpoint_path,
+                    records_per_batch,
+                    max_pending,
+                )
+        finally:
+            out.close()
+            if keys is not None:
+                keys.close()
+
+    checkpoint_path.unlink()
+    logger.info("Wrote %d records to %s", checkpoint.records, output_path)
+    return checkpoint.records
+
+
+def _batches(
+    records: Iterator[Tuple[dict, int]], size: int
+) -> Iterator[Tuple[List[dict], int]]:
+    """Lists of up to ``size`` records, with the input offset after the last."""
+    batch: List[dict] = []
+    offset = 0
+    for record, offset in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch, offset
+            batch = []
+    if batch:
+        yield batch, offset
+
+
+def _run(
+    anonymise: Callable[..., Tuple[List[dict], Optional[Session]]],
+    records: Iterator[Tuple[dict, int]],
+    encode: Callable[[Sequence[dict]], bytes],
+    out: BinaryIO,
+    keys: Optional[BinaryIO],
+    checkpoint: Checkpoint,
+    checkpoint_path: Path,
+    records_per_batch: int,
+    max_pending: int,
+) -> None:
+    started = time.perf_counter()
+    done_here = 0
+
+    def commit(offset: int, future: Future) -> None:
+        nonlocal done_here
+        anonymised, session = future.result()
+        out.write(encode(anonymised))
+        _sync(out)
+        if keys is not None and session is not None:
+            session_id, key = session
+            record = {
+                "first_record": checkpoint.records,
+                "last_record": checkpoint.records + len(anonymised) - 1,
+                "session_id": session_id,
+                "key": key,
+            }
+            keys.write(encode_jsonl([record]))
+            _sync(keys)
+            checkpoint.keys_bytes = keys.tell()
+        # The checkpoint only moves once the batch is durably written
+        checkpoint.input_offset = offset
+        checkpoint.records += len(anonymised)
+        checkpoint.output_bytes = out.tell()
+        checkpoint.save(checkpoint_path)
+
+        done_here += len(anonymised)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "%d records (%.1f records/s)", checkpoint.records, done_here / elapsed
+        )
+
+    # One thread anonymises batches in order while this one reads and writes.
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        in_flight: Deque[Tuple[int, Future]] = deque()
+        for batch, offset in _batches(records, records_per_batch):
+            future = runner.submit(anonymise, batch)
+            in_flight.append((offset, future))
+            if len(in_flight) >= max_pending:
+                commit(*in_flight.popleft())
+        while in_flight:
+            commit(*in_flight.popleft())
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="pd-anonymiser",
+        description="Anonymise the personal data in a CSV or JSONL file",
+        epilog="Example: pd-anonymiser customers.csv -o customers.anon.csv "
+        "--fields name,notes --workers 8",
+    )
+    parser.add_argument("input", type=Path, help="CSV or JSONL file to anonymise")
+    parser.add_argument("-o", "--output", type=Path, required=True)
+    parser.add_argument(
+        "--format", choices=FORMATS, help="Input format (default: from the extension)"
+    )
+    parser.add_argument(
+        "--fields",
+        type=lambda value: [f for f in value.split(",") if f],
+        help=(
+            "Comma-separated fields to anonymise: CSV columns, or dotted paths "
+            "such as customer.name in JSONL (default: every text field)"
+        ),
+    )
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--model", default="all")
+    parser.add_argument(
+        "--allow-reidentification",
+        action="store_true",
+        help=(
+            "Replace entities with pseudonyms rather than tags, and save one "
+            "session per batch to the keys file"
+        ),
+    )
+    parser.add_argument(
+        "--keys", type=Path, help="Keys file (default: OUTPUT.keys.jsonl)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes; each loads its own copy of the models",
+    )
+    parser.add_argument(
+        "--records-per-batch",
+        type=int,
+        default=DEFAULT_RECORDS_PER_BATCH,
+        help="Records read, anonymised and checkpointed together",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Texts per model batch",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=DEFAULT_MAX_PENDING,
+        help="Batches held in memory between reading and writing",
+    )
+    parser.add_argument(
+        "--checkpoint", type=Path, help="Checkpoint file (default: OUTPUT.checkpoint)"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore an existing checkpoint"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)-8s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    try:
+        anonymise_file(
+            args.input,
+            args.output,
+            fields=args.fields,
+            format=args.format,
+            language=args.language,
+            model=args.model,
+            allow_reidentification=args.allow_reidentification,
+            keys_path=args.keys,
+            records_per_batch=args.records_per_batch,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            max_pending=args.max_pending,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+        )
+    except ValueError as e:
+        raise SystemExit(f"pd-anonymiser: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Anonymisation of pandas DataFrames.
+
+Tabular exports repeat a few thousand distinct values across millions of
+rows, so each column is factorised and only the distinct values are
+analysed, in one batch for the whole frame. Needs the ``pandas`` extra::
+
+    pip install "pd-anonymiser[pandas]"
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pd_anonymiser.anonymiser import (
+    DEFAULT_BATCH_SIZE,
+    _anonymise_shared,
+    _save_session,
+    analyse_texts,
+)
+from pd_anonymiser.reidentifier import load_matcher
+
+if TYPE_CHECKING:
+    import numpy
+    import pandas
+
+
+@dataclass
+class DataFrameAnonymisationResult:
+    frame: "pandas.DataFrame"
+    session_id: Optional[str]
+    key: Optional[str]
+    # The columns that were analysed, to pass to ``reidentify_dataframe``
+    columns: List[str]
+
+
+def anonymise_dataframe(
+    df: "pandas.DataFrame",
+    columns: Optional[Iterable[str]] = None,
+    language: str = "en",
+    use_reusable_tags: bool = True,
+    model: str = "all",
+    allow_reidentification: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> DataFrameAnonymisationResult:
+    """Anonymise the text in ``columns`` (default: every string column).
+
+    Each distinct value is analysed once, however many rows and columns it
+    appears in, and its replacement is broadcast back to every row. One
+    pseudonym map covers the whole frame, so a name gets the same pseudonym
+    in every column, and it is saved as a single session. Values that are
+    not strings, and missing values, are left as they are, and every column
+    keeps its dtype. ``df`` itself is not modified.
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=["object", "string", "category"]).columns
+    columns = list(columns)
+    factorised = {column: _factorize(df[column]) for column in columns}
+
+    # Distinct strings across all columns, in order of first appearance
+    texts: Dict[str, None] = {}
+    for _, uniques in factorised.values():
+        for value in uniques:
+            if isinstance(value, str) and value.strip():
+                texts.setdefault(value)
+    values = list(texts)
+
+    replacements, pseudonyms = _anonymise_shared(
+        values,
+        analyse_texts(values, language, model, batch_size),
+        use_reusable_tags,
+        allow_reidentification,
+    )
+
+    frame = df.copy()
+    for column, (codes, uniques) in factorised.items():
+        new_uniques = [_replace(v, replacements) for v in uniques]
+        if new_uniques != uniques:
+            frame[column] = _broadcast(df[column], codes, new_uniques)
+
+    session_id = key = None
+    if pseudonyms:
+        session_id, key = _save_session(pseudonyms)
+    return DataFrameAnonymisationResult(
+        frame=frame, session_id=session_id, key=key, columns=columns
+    )
+
+
+def reidentify_dataframe(
+    df: "pandas.DataFrame",
+    session_id: str,
+    encoded_key: str,
+    columns: Iterable[str],
+) -> "pandas.DataFrame":
+    """Restore the original values in a frame from ``anonymise_dataframe``.
+
+    Only ``columns``, normally ``DataFrameAnonymisationResult.columns``, are
+    restored; text elsewhere that looks like a pseudonym is left alone.
+    """
+    matcher = load_matcher(session_id, encoded_key)
+
+    frame = df.copy()
+    for column in columns:
+        codes, uniques = _factorize(df[column])
+        new_uniques = [matcher.sub(v) if isinstance(v, str) else v for v in uniques]
+        if new_uniques != uniques:
+            frame[column] = _broadcast(df[column], codes, new_uniques)
+    return frame
+
+
+def _replace(value, replacements: Dict[str, str]):
+    return replacements.get(value, value) if isinstance(value, str) else value
+
+
+def _factorize(series: "pandas.Series") -> Tuple["numpy.ndarray", list]:
+    """Codes and distinct values of a column; a categorical's own categories."""
+    pd = _pandas()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, uniques = pd.factorize(series)
+    return codes, list(uniques)
+
+
+def _broadcast(
+    series: "pandas.Series", codes: "numpy.ndarray", new_uniques: Sequence
+) -> "pandas.Series":
+    """``series`` with each distinct value replaced, by integer indexing."""
+    import numpy as np
+
+    pd = _pandas()
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        if len(set(new_uniques)) == len(new_uniques):
+            return series.cat.rename_categories(new_uniques)
+        # Several categories now share a value, e.g. the same <PERSON> tag
+        values = np.asarray(new_uniques, dtype=object)[codes]
+        values[codes < 0] = None
+        return pd.Series(
+            pd.Categorical(values, ordered=dtype.ordered),
+            index=series.index,
+            name=series.name,
+        )
+
+    mapped = np.empty(len(new_uniques), dtype=object)
+    mapped[:] = new_uniques
+    values = series.to_numpy(dtype=object, copy=True)
+    present = codes >= 0  # factorize codes missing values as -1
+    values[present] = mapped[codes[present]]
+
+    result = pd.Series(values, index=series.index, name=series.name)
+    if isinstance(dtype, pd.StringDtype):
+        result = result.astype(dtype)
+    return result
+
+
+def _pandas():
+    try:
+        import pandas
+    except ImportError as e:
+        raise ImportError(
+            'DataFrame anonymisation needs pandas: pip install "pd-anonymiser[pandas]"'
+        ) from e
+    return pandas
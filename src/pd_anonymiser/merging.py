@@ -0,0 +1,119 @@
+"""
+Merge stage for recogniser results.
+
+With several models enabled the same entity is usually found more than once,
+with slightly different boundaries, and sometimes with different types.
+``merge_results`` turns those results into a clean list of non-overlapping
+spans before pseudonyms are assigned:
+
+ - where spans of different types overlap, the best one wins: highest
+   score, then highest entity priority, then longest span;
+ - overlapping spans of the same type are merged into one span covering
+   them all, so that no part of an entity is left in the text.
+
+The results are sorted by start, O(n log n), and split into clusters of
+spans that overlap each other; only spans in the same cluster are compared.
+Within a cluster each span is found by bisection in a sorted list of the
+spans kept so far, but inserting into that list is O(k) for k kept spans, so
+a cluster of m spans costs O(m²) in the worst case. Clusters are normally a
+few results for the same entity, which keeps the whole pass close to
+O(n log n).
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional
+
+from presidio_analyzer import RecognizerResult
+
+# Higher wins when spans of different types tie on score. Pattern-based
+# types are precise, so they outrank the broader NER labels.
+ENTITY_PRIORITY: Dict[str, int] = {
+    "EMAIL_ADDRESS": 60,
+    "PHONE_NUMBER": 50,
+    "PERSON": 40,
+    "ORGANIZATION": 30,
+    "LOCATION": 20,
+    "DATE_TIME": 10,
+}
+
+
+def merge_results(
+    results: List[RecognizerResult], priority: Optional[Dict[str, int]] = None
+) -> List[RecognizerResult]:
+    """Return non-overlapping results, sorted by start offset."""
+    priority = ENTITY_PRIORITY if priority is None else priority
+    merged: List[RecognizerResult] = []
+    for cluster in _clusters(sorted(results, key=lambda r: (r.start, -r.end))):
+        if len(cluster) == 1:
+            merged.extend(cluster)
+        else:
+            merged.extend(_select(cluster, priority))
+    return merged
+
+
+def _clusters(results: List[RecognizerResult]) -> Iterator[List[RecognizerResult]]:
+    """Runs of results, in start order, that overlap one another."""
+    cluster: List[RecognizerResult] = []
+    cluster_end = -1
+    for r in results:
+        if cluster and r.start >= cluster_end:
+            yield cluster
+            cluster = []
+        cluster_end = max(cluster_end, r.end) if cluster else r.end
+        cluster.append(r)
+    if cluster:
+        yield cluster
+
+
+def _select(
+    cluster: List[RecognizerResult], priority: Dict[str, int]
+) -> List[RecognizerResult]:
+    """Keep spans best first; merge into kept spans of the same type.
+
+    A span that overlaps a kept span of another type is dropped, so every
+    input span ends up covered by, or in conflict with, an output span.
+    """
+    ranked = sorted(
+        cluster,
+        key=lambda r: (
+            -r.score,
+            -priority.get(r.entity_type, 0),
+            -(r.end - r.start),
+            r.start,
+        ),
+    )
+    # Kept spans never overlap, so sorted by start they are sorted by end
+    # too, and the ones a candidate overlaps form a contiguous run.
+    starts: List[int] = []
+    ends: List[int] = []
+    kept: List[RecognizerResult] = []
+    for r in ranked:
+        lo = bisect_right(ends, r.start)
+        hi = bisect_left(starts, r.end)
+        overlapping = kept[lo:hi]
+        if any(k.entity_type != r.entity_type for k in overlapping):
+            continue
+        if len(overlapping) == 1 and _contains(overlapping[0], r):
+            continue
+        if overlapping:
+            r = _union(overlapping + [r])
+        starts[lo:hi] = [r.start]
+        ends[lo:hi] = [r.end]
+        kept[lo:hi] = [r]
+    return kept
+
+
+def _contains(outer: RecognizerResult, inner: RecognizerResult) -> bool:
+    return outer.start <= inner.start and inner.end <= outer.end
+
+
+def _union(group: List[RecognizerResult]) -> RecognizerResult:
+    best = max(group, key=lambda r: r.score)
+    return RecognizerResult(
+        entity_type=best.entity_type,
+        start=min(r.start for r in group),
+        end=max(r.end for r in group),
+        score=best.score,
+        analysis_explanation=best.analysis_explanation,
+        recognition_metadata=best.recognition_metadata,
+    )
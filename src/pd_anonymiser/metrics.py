@@ -0,0 +1,255 @@
+"""
+Per-stage latency and size metrics, rendered in Prometheus text format.
+
+Metrics are off unless ``PD_ANONYMISER_METRICS`` is set (to ``1``, ``true``,
+``yes`` or ``on``) or ``enable`` is called. While off, every instrumented
+call costs one check of a module-level flag.
+
+Stages recorded in ``pd_anonymiser_stage_seconds``:
+
+ - ``anonymise_text`` and ``reidentify_text``: the whole call;
+ - ``nlp``: Presidio's NLP pass (spaCy tokenisation and NER);
+ - ``pseudonyms``: pseudonym generation;
+ - ``encrypt`` / ``decrypt``: Fernet encryption of a pseudonym map;
+ - ``session_write`` / ``session_read``: the session store;
+ - ``cost_estimation``: a request to the cost estimation server.
+
+Each recogniser's ``analyze`` and ``analyze_batch`` is recorded in
+``pd_anonymiser_recogniser_seconds``, labelled with its model.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+METRICS_ENV = "PD_ANONYMISER_METRICS"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)  # fmt: skip
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+_enabled = os.getenv(METRICS_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+class Histogram:
+    """A Prometheus histogram with optional labels."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        label_names: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        # label values -> (count per bucket, +Inf last), sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[label_values] = series
+            counts, total = series
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def count(self, *label_values: str) -> int:
+        with self._lock:
+            series = self._series.get(label_values)
+            return sum(series[0]) if series else 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted(
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._series.items()
+            )
+        for label_values, counts, total in series:
+            labels = [
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.label_names, label_values)
+            ]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(labels + [f'le="{le}"'])
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(labels)} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(labels: List[str]) -> str:
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+stage_seconds = Histogram(
+    "pd_anonymiser_stage_seconds",
+    "Time spent in each processing stage.",
+    DURATION_BUCKETS,
+    ("stage",),
+)
+recogniser_seconds = Histogram(
+    "pd_anonymiser_recogniser_seconds",
+    "Time spent in each recogniser's analyze and analyze_batch calls.",
+    DURATION_BUCKETS,
+    ("recogniser", "call"),
+)
+entities = Histogram(
+    "pd_anonymiser_entities",
+    "Entities found per anonymised text.",
+    COUNT_BUCKETS,
+)
+text_chars = Histogram(
+    "pd_anonymiser_text_chars",
+    "Characters per processed text.",
+    SIZE_BUCKETS,
+    ("stage",),
+)
+
+HISTOGRAMS = [stage_seconds, recogniser_seconds, entities, text_chars]
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    """Turn metrics collection on or off for the whole process."""
+    global _enabled
+    _enabled = on
+
+
+def reset() -> None:
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [line for histogram in HISTOGRAMS for line in histogram.render()]
+    return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stage_seconds.observe(time.perf_counter() - self.start, self.stage)
+
+
+_NULL = nullcontext()
+
+
+def timed(stage: str):
+    """Context manager recording the duration of ``stage``."""
+    return _Timer(stage) if _enabled else _NULL
+
+
+def observe_text(stage: str, text: str) -> None:
+    if _enabled:
+        text_chars.observe(len(text), stage)
+
+
+def observe_entities(count: int) -> None:
+    if _enabled:
+        entities.observe(count)
+
+
+def instrument_recogniser(recogniser) -> None:
+    """Record the duration of a recogniser's ``analyze`` and ``analyze_batch``.
+
+    Recognisers are shared between engines, so this is idempotent.
+    """
+    label = getattr(recogniser, "model_name", None) or recogniser.name
+    for call in ("analyze", "analyze_batch"):
+        method = getattr(recogniser, call, None)
+        if method is None or getattr(method, "_instrumented", False):
+            continue
+        setattr(recogniser, call, _timed_method(method, label, call))
+
+
+def _timed_method(method, label: str, call: str):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            recogniser_seconds.observe(time.perf_counter() - start, label, call)
+
+    wrapper._instrumented = True
+    return wrapper
+
+
+def instrument_nlp_engine(nlp_engine) -> None:
+    """Record Presidio's NLP pass as the ``nlp`` stage."""
+    process_text = nlp_engine.process_text
+    if getattr(process_text, "_instrumented", False):
+        return
+
+    @wraps(process_text)
+    def timed_process_text(*args, **kwargs):
+        with timed("nlp"):
+            return process_text(*args, **kwargs)
+
+    process_batch = nlp_engine.process_batch
+
+    @wraps(process_batch)
+    def timed_process_batch(*args, **kwargs):
+        return _timed_iter("nlp", process_batch(*args, **kwargs))
+
+    timed_process_text._instrumented = True
+    nlp_engine.process_text = timed_process_text
+    nlp_engine.process_batch = timed_process_batch
+
+
+def _timed_iter(stage: str, items: Iterable) -> Iterator:
+    """Yield from ``items``, recording the time spent producing each item."""
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        if _enabled:
+            stage_seconds.observe(time.perf_counter() - start, stage)
+        yield item
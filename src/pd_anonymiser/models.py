@@ -1,27 +1,124 @@
-from pd_anonymiser.recognisers.huggingface import HuggingFaceRecogniser
-from pd_anonymiser.recognisers.spacy import SpacyNERRecogniser
-from presidio_analyzer import AnalyzerEngine
+import os
+import threading
+from functools import partial
+from typing import Callable, Dict, List
 
-model_registry = dict()
+from presidio_analyzer import AnalyzerEngine, EntityRecognizer
+
+import pd_anonymiser.metrics as metrics
+
+# Backend for the Hugging Face models: "torch", "onnx" or "onnx-int8"
+HF_BACKEND_ENV = "PD_ANONYMISER_HF_BACKEND"
+
+
+def _spacy_recogniser(model_name: str) -> EntityRecognizer:
+    from pd_anonymiser.recognisers.spacy import SpacyNERRecogniser
+
+    return SpacyNERRecogniser(model_name=model_name)
+
+
+def _huggingface_recogniser(model_name: str) -> EntityRecognizer:
+    from pd_anonymiser.recognisers.huggingface import HuggingFaceRecogniser
+
+    backend = os.getenv(HF_BACKEND_ENV, "torch")
+    if backend == "onnx-int8":
+        return HuggingFaceRecogniser(
+            model_name=model_name, backend="onnx", quantize=True
+        )
+    return HuggingFaceRecogniser(model_name=model_name, backend=backend)
+
+
+# Factories only: each model is loaded the first time it is requested.
+model_registry: Dict[str, Callable[[], EntityRecognizer]] = dict()
 model_registry.update(
     {
-        "en_core_web_trf": SpacyNERRecogniser(model_name="en_core_web_trf"),
-        "dslim/bert-base-NER": HuggingFaceRecogniser(model_name="dslim/bert-base-NER"),
-        "StanfordAIMI/stanford-deidentifier-base": HuggingFaceRecogniser(
-            model_name="StanfordAIMI/stanford-deidentifier-base"
+        "en_core_web_trf": partial(_spacy_recogniser, "en_core_web_trf"),
+        "dslim/bert-base-NER": partial(_huggingface_recogniser, "dslim/bert-base-NER"),
+        "StanfordAIMI/stanford-deidentifier-base": partial(
+            _huggingface_recogniser, "StanfordAIMI/stanford-deidentifier-base"
         ),
     }
 )
 
+_loaded: Dict[str, EntityRecognizer] = {}
+_cascades: Dict[str, EntityRecognizer] = {}
+_load_lock = threading.Lock()
 
-def register_models(analyser: AnalyzerEngine, model: str) -> None:
+
+def resolve_models(model: str) -> List[str]:
     if model == "all":
-        recognisers = model_registry.values()
-    else:
-        try:
-            recognisers = [model_registry[model]]
-        except KeyError:
-            raise ValueError(f"Unknown model type: {model}")
-
-    for recogniser in recognisers:
-        analyser.registry.add_recognizer(recogniser)
+        return list(model_registry)
+    if model not in model_registry:
+        raise ValueError(f"Unknown model type: {model}")
+    return [model]
+
+
+def get_recogniser(model_name: str) -> EntityRecognizer:
+    """Return the recogniser for a registered model, loading it on first use."""
+    recogniser = _loaded.get(model_name)
+    if recogniser is not None:
+        return recogniser
+
+    if model_name not in model_registry:
+        raise ValueError(f"Unknown model type: {model_name}")
+
+    with _load_lock:
+        recogniser = _loaded.get(model_name)
+        if recogniser is None:
+            recogniser = model_registry[model_name]()
+            metrics.instrument_recogniser(recogniser)
+            _loaded[model_name] = recogniser
+    return recogniser
+
+
+def is_loaded(model_name: str) -> bool:
+    return model_name in _loaded
+
+
+def preload(model: str = "all") -> None:
+    """Load the selected models up front, e.g. when a server starts."""
+    for model_name in resolve_models(model):
+        get_recogniser(model_name)
+
+
+def unload(model: str = "all") -> None:
+    with _load_lock:
+        for model_name in resolve_models(model):
+            _loaded.pop(model_name, None)
+        _cascades.clear()
+
+
+def get_cascade(model: str = "all") -> EntityRecognizer:
+    """Return the cascade recogniser wrapping the selected models."""
+    cascade = _cascades.get(model)
+    if cascade is not None:
+        return cascade
+
+    from pd_anonymiser.recognisers.cascade import CascadeRecogniser
+
+    recognisers = [get_recogniser(model_name) for model_name in resolve_models(model)]
+    with _load_lock:
+        return _cascades.setdefault(model, CascadeRecogniser(recognisers))
+
+
+def cascade_stats(model: str = "all") -> Dict[str, int]:
+    """Texts, segments and escalated segments seen by a model selection's cascade."""
+    cascade = _cascades.get(model)
+    if cascade is None:
+        return {"texts": 0, "segments": 0, "escalated": 0}
+    return cascade.stats()
+
+
+def register_models(
+    analyser: AnalyzerEngine, model: str, cascade: bool = False
+) -> None:
+    """Add the selected models to an analyser.
+
+    With ``cascade``, they are added behind a single ``CascadeRecogniser``
+    that runs them only on sentences the analyser's cheap NLP stage flags.
+    """
+    if cascade:
+        analyser.registry.add_recognizer(get_cascade(model))
+        return
+    for model_name in resolve_models(model):
+        analyser.registry.add_recognizer(get_recogniser(model_name))
@@ -0,0 +1,205 @@
+"""
+Anonymisation of large corpora across worker processes.
+
+Transformer NER on CPU is compute bound, so a corpus is split into chunks of
+roughly equal size and each chunk is anonymised with ``anonymise_texts``
+semantics in a pool of worker processes. Every worker loads the selected
+models once, in its initializer, and limits torch to its share of the cores
+so that workers do not oversubscribe the machine. Sessions are returned to
+the parent and written to its session store in one batch.
+
+``ParallelAnonymiser.analyse`` runs recognition only, for callers that build
+their own pseudonym map from the results.
+"""
+
+import bisect
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import pd_anonymiser.models as model_registry
+from presidio_analyzer import RecognizerResult
+
+from pd_anonymiser.anonymiser import (
+    DEFAULT_BATCH_SIZE,
+    AnonymisationResult,
+    _anonymise_many,
+    analyse_texts,
+    get_analyser,
+)
+from pd_anonymiser.utils import save_encrypted_jsons
+
+# Chunks per worker: enough that a slow chunk does not leave the other
+# workers idle at the end, few enough that per-chunk overhead stays small.
+CHUNKS_PER_WORKER = 4
+
+# Fixed cost of a text, in characters, on top of its length.
+_TEXT_OVERHEAD = 64
+
+_worker_options: Optional[dict] = None
+
+
+class ParallelAnonymiser:
+    """A pool of worker processes with the models already loaded.
+
+    Keep one around to anonymise several corpora without reloading models::
+
+        with ParallelAnonymiser(workers=8, model="dslim/bert-base-NER") as pool:
+            results = pool.anonymise(texts)
+
+    Results are in input order and match ``anonymise_texts`` on the same
+    texts: one result and one session per text, or none with
+    ``save_sessions=False``.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        language: str = "en",
+        use_reusable_tags: bool = True,
+        model: str = "all",
+        allow_reidentification: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        torch_threads: Optional[int] = None,
+        mp_context: str = "spawn",
+        save_sessions: bool = True,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.torch_threads = torch_threads or max(
+            1, (os.cpu_count() or 1) // self.workers
+        )
+        self._options = {
+            "language": language,
+            "use_reusable_tags": use_reusable_tags,
+            "model": model,
+            "allow_reidentification": allow_reidentification,
+            "batch_size": batch_size,
+            "save_sessions": save_sessions,
+        }
+        # Fail fast on an unknown model rather than in every worker
+        model_registry.resolve_models(model)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_init_worker,
+            initargs=(self._options, self.torch_threads),
+        )
+
+    def anonymise(self, texts: Iterable[str]) -> List[AnonymisationResult]:
+        futures = self._submit(_anonymise_chunk, list(texts))
+
+        results: List[AnonymisationResult] = []
+        pending: List[Tuple[dict, str, bytes]] = []
+        for future in futures:
+            chunk_results, chunk_pending = future.result()
+            results.extend(chunk_results)
+            pending.extend(chunk_pending)
+        if pending:
+            save_encrypted_jsons(pending)
+        return results
+
+    def analyse(self, texts: Iterable[str]) -> List[List[RecognizerResult]]:
+        """Analyser results for each text, in input order, without anonymising."""
+        futures = self._submit(_analyse_chunk, list(texts))
+        return [results for future in futures for results in future.result()]
+
+    def _submit(self, fn, texts: List[str]) -> list:
+        chunks = balanced_chunks(texts, self.workers * CHUNKS_PER_WORKER)
+        return [self._executor.submit(fn, texts[start:end]) for start, end in chunks]
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ParallelAnonymiser":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def anonymise_corpus(
+    texts: Iterable[str],
+    language: str = "en",
+    use_reusable_tags: bool = True,
+    model: str = "all",
+    allow_reidentification: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: Optional[int] = None,
+    save_sessions: bool = True,
+) -> List[AnonymisationResult]:
+    """Anonymise a corpus in a pool of worker processes.
+
+    Starting the pool loads the models once per worker, so this pays off for
+    corpora that take longer than that to anonymise in one process.
+    """
+    with ParallelAnonymiser(
+        workers=workers,
+        language=language,
+        use_reusable_tags=use_reusable_tags,
+        model=model,
+        allow_reidentification=allow_reidentification,
+        batch_size=batch_size,
+        save_sessions=save_sessions,
+    ) as pool:
+        return pool.anonymise(texts)
+
+
+def balanced_chunks(texts: Sequence[str], count: int) -> List[Tuple[int, int]]:
+    """Split texts into at most ``count`` contiguous ranges of similar size."""
+    if not texts:
+        return []
+    count = max(1, min(count, len(texts)))
+    ends = list(accumulate(len(text) + _TEXT_OVERHEAD for text in texts))
+    total = ends[-1]
+
+    bounds = [0]
+    for i in range(1, count):
+        cut = bisect.bisect_left(ends, total * i / count) + 1
+        if bounds[-1] < cut < len(texts):
+            bounds.append(cut)
+    bounds.append(len(texts))
+    return list(zip(bounds, bounds[1:]))
+
+
+def _init_worker(options: dict, torch_threads: int) -> None:
+    global _worker_options
+    _worker_options = options
+
+    # Tokenizers start their own thread pool unless told otherwise.
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    model_registry.preload(options["model"])
+    get_analyser(options["language"], model=None)
+
+
+def _anonymise_chunk(
+    texts: List[str],
+) -> Tuple[List[AnonymisationResult], List[Tuple[dict, str, bytes]]]:
+    options = _worker_options
+    pending: List[Tuple[dict, str, bytes]] = []
+    results = _anonymise_many(
+        texts,
+        options["language"],
+        options["use_reusable_tags"],
+        options["model"],
+        options["allow_reidentification"],
+        options["batch_size"],
+        pending,
+        save_sessions=options["save_sessions"],
+    )
+    return results, pending
+
+
+def _analyse_chunk(texts: List[str]) -> List[List[RecognizerResult]]:
+    options = _worker_options
+    return analyse_texts(
+        texts, options["language"], options["model"], options["batch_size"]
+    )
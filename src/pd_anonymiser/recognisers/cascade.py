@@ -0,0 +1,139 @@
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from presidio_analyzer import EntityRecognizer, RecognizerResult
+
+logger = logging.getLogger(__name__)
+
+# Cheap entities scoring under this are confirmed by the expensive models.
+# spaCy reports no confidence and Presidio scores all its entities 0.85, so by
+# default they are trusted; an NLP engine with real scores (e.g. transformers)
+# escalates its uncertain ones.
+DEFAULT_THRESHOLD = 0.8
+
+# Sentence ends: terminal punctuation followed by whitespace, or a line break.
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s)|\n")
+# A capitalised word in the middle of a sentence, e.g. "met with Alice".
+_CANDIDATE = re.compile(r"(?<=[a-z0-9,;:)] )[A-Z][\w'-]*")
+
+
+class CascadeRecogniser(EntityRecognizer):
+    """Runs expensive recognisers only on the sentences that need them.
+
+    Registered in place of the model recognisers, it relies on the cheap
+    stage that every Presidio analysis runs anyway: the NLP engine's spaCy
+    entities, passed in as ``nlp_artifacts``. A sentence is escalated to the
+    wrapped recognisers when the cheap stage found an entity there with a
+    score below ``threshold``, or when it contains a capitalised word in
+    mid-sentence that could be a name and is not part of an entity the cheap
+    stage is confident of. Other sentences are left to the cheap stage and
+    Presidio's pattern recognisers.
+    """
+
+    def __init__(
+        self,
+        recognisers: Sequence[EntityRecognizer],
+        threshold: float = DEFAULT_THRESHOLD,
+        supported_language: str = "en",
+    ):
+        self.recognisers = list(recognisers)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._counts = {"texts": 0, "segments": 0, "escalated": 0}
+        supported = sorted({e for r in self.recognisers for e in r.supported_entities})
+        super().__init__(
+            supported_entities=supported,
+            name="CascadeRecogniser",
+            supported_language=supported_language,
+        )
+
+    def load(self):
+        pass  # The wrapped recognisers are already loaded
+
+    def analyze(
+        self, text: str, entities: List[str], nlp_artifacts=None
+    ) -> List[RecognizerResult]:
+        segments = _segments(text)
+        escalated = [
+            (start, end)
+            for start, end in segments
+            if self._needs_escalation(text, start, end, nlp_artifacts)
+        ]
+        with self._lock:
+            self._counts["texts"] += 1
+            self._counts["segments"] += len(segments)
+            self._counts["escalated"] += len(escalated)
+        logger.debug("Escalated %d of %d segments", len(escalated), len(segments))
+        if not escalated:
+            return []
+
+        texts = [text[start:end] for start, end in escalated]
+        results = []
+        for recogniser in self.recognisers:
+            wanted = [e for e in entities if e in recogniser.supported_entities]
+            if not wanted:
+                continue
+            if hasattr(recogniser, "analyze_batch"):
+                batches = recogniser.analyze_batch(texts, wanted)
+            else:
+                batches = [recogniser.analyze(t, wanted) for t in texts]
+            for (start, _), batch in zip(escalated, batches):
+                for r in batch:
+                    r.start += start
+                    r.end += start
+                    results.append(r)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """Texts and segments seen so far, and how many segments were escalated."""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counts = dict.fromkeys(self._counts, 0)
+
+    def _needs_escalation(self, text: str, start: int, end: int, nlp_artifacts) -> bool:
+        confident = []
+        for ent_start, ent_end, score in _cheap_entities(nlp_artifacts):
+            if ent_start < end and start < ent_end:
+                if score < self.threshold:
+                    return True
+                confident.append((ent_start, ent_end))
+        return any(
+            not any(s <= m.start() and m.end() <= e for s, e in confident)
+            for m in _CANDIDATE.finditer(text, start, end)
+        )
+
+
+def _segments(text: str) -> List[Tuple[int, int]]:
+    """Sentence spans, without surrounding whitespace."""
+    spans = []
+    start = 0
+    for m in _SENTENCE_END.finditer(text):
+        spans.append((start, m.end()))
+        start = m.end()
+    spans.append((start, len(text)))
+
+    segments = []
+    for start, end in spans:
+        segment = text[start:end]
+        stripped = segment.strip()
+        if stripped:
+            start += len(segment) - len(segment.lstrip())
+            segments.append((start, start + len(stripped)))
+    return segments
+
+
+def _cheap_entities(nlp_artifacts) -> List[Tuple[int, int, float]]:
+    if nlp_artifacts is None or not nlp_artifacts.entities:
+        return []
+    scores: Optional[List[float]] = getattr(nlp_artifacts, "scores", None)
+    if not scores:
+        scores = [0.0] * len(nlp_artifacts.entities)
+    return [
+        (ent.start_char, ent.end_char, score)
+        for ent, score in zip(nlp_artifacts.entities, scores)
+    ]
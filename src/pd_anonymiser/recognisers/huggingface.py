@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 
 from presidio_analyzer import EntityRecognizer, RecognizerResult
 from transformers import pipeline
@@ -15,17 +15,37 @@ DEFAULT_ENTITY_MAPPING = {
     "DATE": "DATE_TIME",
 }
 
+# BERT-style encoders accept at most 512 positions, special tokens included.
+MAX_MODEL_LENGTH = 512
+DEFAULT_STRIDE = 64
+DEFAULT_BATCH_SIZE = 8
+
 
 class HuggingFaceRecogniser(EntityRecognizer):
     def __init__(
-        self, model_name="dslim/bert-base-NER", entity_mapping=None, device=-1
+        self,
+        model_name="dslim/bert-base-NER",
+        entity_mapping=None,
+        device=-1,
+        window_size: Optional[int] = None,
+        stride: int = DEFAULT_STRIDE,
+        backend: str = "torch",
+        quantize: bool = False,
     ):
         self.model_name = model_name
         self.device = device
+        self.backend = backend
+        self.quantize = quantize
         self.entity_mapping = entity_mapping or DEFAULT_ENTITY_MAPPING
-        self.ner_pipeline = pipeline(
-            task="ner", model=model_name, aggregation_strategy="simple", device=device
-        )
+        self.ner_pipeline = self._build_pipeline()
+        # Long texts are split into windows of ``window_size`` tokens that
+        # overlap by ``stride`` tokens.
+        self.window_size = window_size or self._default_window_size()
+        self.stride = stride
+        if not 0 <= self.stride < self.window_size:
+            raise ValueError(
+                f"stride ({stride}) must be smaller than window_size ({self.window_size})"
+            )
         self.supported_entities = list(set(self.entity_mapping.values()))
         super().__init__(self.supported_entities)
 
@@ -38,8 +58,109 @@ class HuggingFaceRecogniser(EntityRecognizer):
         if not any(ent in self.supported_entities for ent in entities):
             return []
 
+        predictions = self._predict([text], batch_size=DEFAULT_BATCH_SIZE)[0]
+        return self._to_results(predictions, entities)
+
+    def analyze_batch(
+        self, texts: Sequence[str], entities: List[str], batch_size: int = 32
+    ) -> List[List[RecognizerResult]]:
+        """Analyse many texts with padded batch inference in the pipeline."""
+        if not texts or not any(ent in self.supported_entities for ent in entities):
+            return [[] for _ in texts]
+
+        predictions = self._predict(texts, batch_size=batch_size)
+        return [self._to_results(preds, entities) for preds in predictions]
+
+    def _build_pipeline(self):
+        if self.backend == "torch":
+            if self.quantize:
+                raise ValueError("quantize is only supported by the onnx backend")
+            return pipeline(
+                task="ner",
+                model=self.model_name,
+                aggregation_strategy="simple",
+                device=self.device,
+            )
+        if self.backend == "onnx":
+            # ONNX Runtime runs on the CPU here; ``device`` applies to torch only.
+            from pd_anonymiser.recognisers.onnx import load_onnx_model
+
+            model, tokenizer = load_onnx_model(self.model_name, quantize=self.quantize)
+            return pipeline(
+                task="ner",
+                model=model,
+                tokenizer=tokenizer,
+                aggregation_strategy="simple",
+            )
+        raise ValueError(f"Unknown backend: {self.backend}")
+
+    def _default_window_size(self) -> int:
+        tokenizer = self.ner_pipeline.tokenizer
+        max_length = min(tokenizer.model_max_length, MAX_MODEL_LENGTH)
+        return max_length - tokenizer.num_special_tokens_to_add()
+
+    def _predict(self, texts: Sequence[str], batch_size: int) -> List[List[dict]]:
+        """Run the pipeline over every window of every text in a single call.
+
+        Texts that fit in one window are passed through unchanged. Longer texts
+        are split into overlapping windows whose predictions are shifted back
+        to document offsets and merged.
+        """
+        windows: List[Tuple[int, int, int]] = []
+        for i, text in enumerate(texts):
+            windows.extend((i, start, end) for start, end in self._windows(text))
+
+        window_predictions = self.ner_pipeline(
+            [texts[i][start:end] for i, start, end in windows], batch_size=batch_size
+        )
+
+        per_text: List[List[dict]] = [[] for _ in texts]
+        for (i, start, end), predictions in zip(windows, window_predictions):
+            first, last = start == 0, end == len(texts[i])
+            for pred in predictions:
+                # Anything touching an inner window edge may be cut off; the
+                # neighbouring window sees it whole, with context.
+                if (not first and pred["start"] == 0) or (
+                    not last and pred["end"] == end - start
+                ):
+                    continue
+                per_text[i].append(
+                    {**pred, "start": pred["start"] + start, "end": pred["end"] + start}
+                )
+
+        return [_merge_overlapping(predictions) for predictions in per_text]
+
+    def _windows(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans of overlapping token windows covering ``text``."""
+        offsets = self.ner_pipeline.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        n_tokens = len(offsets)
+        if n_tokens <= self.window_size:
+            return [(0, len(text))]
+
+        def word_start(i):
+            # Step back to the first sub-token of the word so that the window
+            # text tokenises exactly as it does inside the full document.
+            while i > 0 and offsets[i][0] == offsets[i - 1][1]:
+                i -= 1
+            return i
+
+        spans = []
+        start = 0
+        while True:
+            end = min(start + self.window_size, n_tokens)
+            if end < n_tokens:
+                end = max(word_start(end), start + 1)
+            char_start = 0 if start == 0 else offsets[start][0]
+            char_end = len(text) if end == n_tokens else offsets[end - 1][1]
+            spans.append((char_start, char_end))
+            if end == n_tokens:
+                return spans
+            start = max(word_start(end - self.stride), start + 1)
+
+    def _to_results(self, predictions, entities) -> List[RecognizerResult]:
         results = []
-        predictions = self.ner_pipeline(text)
 
         for pred in predictions:
             raw_label = pred["entity_group"].upper()
@@ -57,3 +178,20 @@ class HuggingFaceRecogniser(EntityRecognizer):
                 )
 
         return results
+
+
+def _merge_overlapping(predictions: List[dict]) -> List[dict]:
+    """Collapse predictions for the same entity seen by overlapping windows."""
+    merged: List[dict] = []
+    for pred in sorted(predictions, key=lambda p: (p["start"], -p["end"])):
+        last = merged[-1] if merged else None
+        if (
+            last
+            and pred["start"] < last["end"]
+            and pred["entity_group"] == last["entity_group"]
+        ):
+            last["end"] = max(last["end"], pred["end"])
+            last["score"] = max(last["score"], pred["score"])
+        else:
+            merged.append(dict(pred))
+    return merged
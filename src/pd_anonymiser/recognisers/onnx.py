@@ -0,0 +1,112 @@
+"""
+ONNX Runtime backend for HuggingFaceRecogniser.
+
+Models are exported to ONNX once, optionally quantised to dynamic int8, and
+cached on disk under ``PD_ANONYMISER_ONNX_CACHE`` (default
+``~/.cache/pd_anonymiser/onnx``). Needs the ``onnx`` extra::
+
+    pip install "pd-anonymiser[onnx]"
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+ONNX_CACHE_ENV = "PD_ANONYMISER_ONNX_CACHE"
+DEFAULT_ONNX_CACHE = Path.home() / ".cache" / "pd_anonymiser" / "onnx"
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+def onnx_cache_dir() -> Path:
+    return Path(os.getenv(ONNX_CACHE_ENV, DEFAULT_ONNX_CACHE))
+
+
+def export_dir(
+    model_name: str, quantize: bool = False, cache_dir: Union[str, Path, None] = None
+) -> Path:
+    """Where the exported model is cached, e.g. ``dslim--bert-base-NER/int8``."""
+    root = Path(cache_dir) if cache_dir else onnx_cache_dir()
+    return root / model_name.replace("/", "--") / ("int8" if quantize else "fp32")
+
+
+def load_onnx_model(
+    model_name: str, quantize: bool = False, cache_dir: Union[str, Path, None] = None
+) -> Tuple[object, object]:
+    """Return an ONNX Runtime token classifier and its tokenizer.
+
+    The model is exported (and quantised) on first use only; later calls,
+    from any process, load the cached files.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForTokenClassification
+    except ImportError as e:
+        raise ImportError(
+            "The onnx backend needs optimum and onnxruntime: "
+            'pip install "pd-anonymiser[onnx]"'
+        ) from e
+    from transformers import AutoTokenizer
+
+    fp32_dir = export_dir(model_name, False, cache_dir)
+    if not (fp32_dir / MODEL_FILE).exists():
+        _write_once(fp32_dir, lambda tmp: _export(model_name, tmp))
+
+    model_dir, file_name = fp32_dir, MODEL_FILE
+    if quantize:
+        model_dir = export_dir(model_name, True, cache_dir)
+        file_name = QUANTIZED_MODEL_FILE
+        if not (model_dir / file_name).exists():
+            _write_once(model_dir, lambda tmp: _quantize(fp32_dir, tmp))
+
+    model = ORTModelForTokenClassification.from_pretrained(
+        model_dir, file_name=file_name
+    )
+    return model, AutoTokenizer.from_pretrained(fp32_dir)
+
+
+def _export(model_name: str, save_dir: Path) -> None:
+    from optimum.onnxruntime import ORTModelForTokenClassification
+    from transformers import AutoTokenizer
+
+    ORTModelForTokenClassification.from_pretrained(
+        model_name, export=True
+    ).save_pretrained(save_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(save_dir)
+
+
+def _quantize(fp32_dir: Path, save_dir: Path) -> None:
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        config = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    else:
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    ORTQuantizer.from_pretrained(fp32_dir, file_name=MODEL_FILE).quantize(
+        save_dir=save_dir, quantization_config=config
+    )
+
+
+def _write_once(target: Path, write) -> None:
+    """Build a cache directory next to ``target`` and move it into place.
+
+    Readers never see a half-written export, and when several workers race
+    to build the same one the first to finish wins.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp: Optional[str] = tempfile.mkdtemp(prefix=f".{target.name}-", dir=target.parent)
+    try:
+        write(Path(tmp))
+        try:
+            os.rename(tmp, target)
+            tmp = None
+        except OSError:
+            if not target.exists():
+                raise
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
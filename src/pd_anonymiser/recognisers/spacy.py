@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Sequence
 
 import spacy
 from presidio_analyzer import EntityRecognizer, RecognizerResult
@@ -28,8 +28,22 @@ class SpacyNERRecogniser(EntityRecognizer):
         if not any(ent in self.supported_entities for ent in entities):
             return []
 
+        return self._to_results(self._nlp(text), entities)
+
+    def analyze_batch(
+        self, texts: Sequence[str], entities: List[str], batch_size: int = 32
+    ) -> List[List[RecognizerResult]]:
+        """Analyse many texts in one pass with ``nlp.pipe``."""
+        if not any(ent in self.supported_entities for ent in entities):
+            return [[] for _ in texts]
+
+        return [
+            self._to_results(doc, entities)
+            for doc in self._nlp.pipe(texts, batch_size=batch_size)
+        ]
+
+    def _to_results(self, doc, entities) -> List[RecognizerResult]:
         results = []
-        doc = self._nlp(text)
 
         for ent in doc.ents:
             spacy_label = ent.label_.upper()
@@ -1,26 +1,326 @@
 import base64
+import hashlib
 import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from pprint import pprint
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Tuple, Union
 
+import pd_anonymiser.metrics as metrics
+from pd_anonymiser.sessions import get_session_store, on_sessions_removed
 from pd_anonymiser.utils import load_encrypted_json
 
+DEFAULT_CACHE_ENTRIES = 256
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_TTL = 600.0
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+class PseudonymMatcher:
+    """Replaces every pseudonym in a text with its original in one scan.
+
+    The pseudonyms are compiled into a single regex shaped like a trie, so
+    the scan cost does not grow with the number of pseudonyms. At each
+    position the longest pseudonym that ends on a word boundary wins, as if
+    the pseudonyms were replaced longest first.
+    """
+
+    def __init__(self, reverse_map: Dict[str, str]):
+        self.reverse_map = {p: o for p, o in reverse_map.items() if p}
+        self.pattern = (
+            re.compile(rf"\b{_trie_pattern(self.reverse_map)}\b")
+            if self.reverse_map
+            else None
+        )
+        self._prefixes: Optional[FrozenSet[str]] = None
+
+    @property
+    def prefixes(self) -> FrozenSet[str]:
+        """Every non-empty prefix of every pseudonym, built on first use."""
+        if self._prefixes is None:
+            self._prefixes = frozenset(
+                p[:i] for p in self.reverse_map for i in range(1, len(p) + 1)
+            )
+        return self._prefixes
+
+    def size(self) -> int:
+        """Rough number of bytes held by the map and the compiled pattern."""
+        strings = sum(
+            sys.getsizeof(p) + sys.getsizeof(o) for p, o in self.reverse_map.items()
+        )
+        pattern = sys.getsizeof(self.pattern.pattern) if self.pattern else 0
+        return sys.getsizeof(self.reverse_map) + strings + pattern
+
+    def sub(self, text: str) -> str:
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(lambda m: self.reverse_map[m.group(0)], text)
+
+
+class Reidentifier:
+    """Reidentifies text that arrives in pieces, e.g. a streamed LLM response.
+
+    ``feed`` returns everything that can no longer change and holds back only
+    the shortest suffix that could still become a pseudonym, such as
+    "Person" or "Person A" (which might continue as "Person AB"). ``flush``
+    returns the rest at the end of the stream. The concatenated output is
+    identical to ``reidentify_text`` on the whole text.
+    """
+
+    def __init__(self, reverse_map: Union[Dict[str, str], PseudonymMatcher]):
+        self.matcher = (
+            reverse_map
+            if isinstance(reverse_map, PseudonymMatcher)
+            else get_matcher(reverse_map)
+        )
+        self._prefixes = self.matcher.prefixes
+        self._longest = max(map(len, self.matcher.reverse_map), default=0)
+        self._buffer = ""
+        # Last character already emitted, needed to judge a word boundary
+        # at the start of the buffer.
+        self._context = ""
+
+    @classmethod
+    def from_session(cls, session_id: str, encoded_key: str) -> "Reidentifier":
+        return cls(load_matcher(session_id, encoded_key))
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        return self._emit(self._held_from())
+
+    def flush(self) -> str:
+        text = self._emit(len(self._buffer))
+        self._context = ""
+        return text
+
+    def _held_from(self) -> int:
+        buffer = self._buffer
+        for start in range(max(0, len(buffer) - self._longest), len(buffer)):
+            if buffer[start:] in self._prefixes and self._at_boundary(start):
+                return start
+        return len(buffer)
+
+    def _at_boundary(self, i: int) -> bool:
+        before = self._buffer[i - 1] if i else self._context
+        return _is_word(before) != _is_word(self._buffer[i])
+
+    def _emit(self, upto: int) -> str:
+        text = self._context + self._buffer
+        offset = len(self._context)
+        upto += offset
+
+        parts = []
+        cursor = offset
+        if self.matcher.pattern is not None:
+            for m in self.matcher.pattern.finditer(text, offset):
+                if m.start() >= upto:
+                    break
+                parts.append(text[cursor : m.start()])
+                parts.append(self.matcher.reverse_map[m.group(0)])
+                cursor = m.end()
+
+        end = max(upto, cursor)
+        parts.append(text[cursor:end])
+        self._buffer = text[end:]
+        if end > offset:
+            self._context = text[end - 1]
+        return "".join(parts)
+
+
+class SessionCache:
+    """Bounded LRU cache of session matchers, keyed by session and key.
+
+    Entries are keyed by the session id and a SHA-256 fingerprint of the
+    encoded key, so a lookup with the wrong key misses and goes on to fail
+    decryption as before. The cache holds at most ``max_entries`` matchers
+    and roughly ``max_bytes`` of maps and patterns; entries older than
+    ``ttl`` seconds, or past the ``expires_in`` given when they were added,
+    are dropped on lookup. A ``ttl`` of ``None`` keeps entries until they
+    are evicted or expire.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_CACHE_ENTRIES,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+        ttl: Optional[float] = DEFAULT_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (session id, key fingerprint) -> (matcher, size, monotonic deadline)
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(session_id: str, encoded_key: str) -> Tuple[str, bytes]:
+        return session_id, hashlib.sha256(encoded_key.encode()).digest()
+
+    def get(self, session_id: str, encoded_key: str) -> Optional[PseudonymMatcher]:
+        cache_key = self.cache_key(session_id, encoded_key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and self._expired(entry):
+                self._remove(cache_key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[0]
+
+    def put(
+        self,
+        session_id: str,
+        encoded_key: str,
+        matcher: PseudonymMatcher,
+        expires_in: Optional[float] = None,
+    ):
+        """Cache ``matcher`` for at most ``ttl`` and ``expires_in`` seconds."""
+        lifetimes = [t for t in (self.ttl, expires_in) if t is not None]
+        lifetime = min(lifetimes) if lifetimes else None
+        size = matcher.size()
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        if lifetime is not None and lifetime <= 0:
+            return
+        cache_key = self.cache_key(session_id, encoded_key)
+        deadline = None if lifetime is None else time.monotonic() + lifetime
+        with self._lock:
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            self._entries[cache_key] = (matcher, size, deadline)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def discard(self, session_id: str) -> None:
+        """Forget a session under every key, e.g. after deleting it."""
+        self.discard_many([session_id])
+
+    def discard_many(self, session_ids: Iterable[str]) -> None:
+        session_ids = set(session_ids)
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] in session_ids]:
+                self._remove(cache_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _expired(self, entry) -> bool:
+        return entry[2] is not None and time.monotonic() > entry[2]
+
+    def _remove(self, cache_key) -> None:
+        _, size, _ = self._entries.pop(cache_key)
+        self._bytes -= size
+
+
+session_cache = SessionCache()
+# Deleted and swept sessions must not outlive the store in the cache
+on_sessions_removed(session_cache.discard_many)
+
+
+def reidentify_stream(
+    chunks: Iterable[str], session_id: str, encoded_key: str
+) -> Iterator[str]:
+    """Reidentify a stream of anonymised chunks as they arrive."""
+    reidentifier = Reidentifier.from_session(session_id, encoded_key)
+    for chunk in chunks:
+        text = reidentifier.feed(chunk)
+        if text:
+            yield text
+    text = reidentifier.flush()
+    if text:
+        yield text
+
 
 def reidentify_text(
     anonymised_text: str, session_id: str, encoded_key: str, show_map: bool = False
 ) -> str:
+    with metrics.timed("reidentify_text"):
+        metrics.observe_text("reidentify", anonymised_text)
+        matcher = load_matcher(session_id, encoded_key)
+
+        if show_map:
+            print("Reverse map:")
+            pprint(matcher.reverse_map)
+
+        return matcher.sub(anonymised_text)
+
+
+def load_matcher(session_id: str, encoded_key: str) -> PseudonymMatcher:
+    """Return the matcher for a session, decrypting it only on a cache miss."""
+    matcher = session_cache.get(session_id, encoded_key)
+    if matcher is None:
+        matcher = PseudonymMatcher(_load_reverse_map(session_id, encoded_key))
+        # Never cache a session beyond its expiry in the store
+        expires_in = get_session_store().expires_in(session_id)
+        session_cache.put(session_id, encoded_key, matcher, expires_in)
+    return matcher
+
+
+def _load_reverse_map(session_id: str, encoded_key: str) -> Dict[str, str]:
     key = base64.urlsafe_b64decode(encoded_key.encode())
     pseudonym_map = load_encrypted_json(session_id, key)
+    return {v: k[1] for k, v in pseudonym_map.items()}
 
-    reverse_map = {v: k[1] for k, v in pseudonym_map.items()}
 
-    if show_map:
-        print("Reverse map:")
-        pprint(reverse_map)
+def _is_word(ch: str) -> bool:
+    return bool(ch) and _WORD_CHAR.match(ch) is not None
 
-    # Replace longest pseudonyms first
-    for pseudonym in sorted(reverse_map, key=lambda x: -len(x)):
-        anonymised_text = re.sub(
-            rf"\b{re.escape(pseudonym)}\b", reverse_map[pseudonym], anonymised_text
-        )
 
-    return anonymised_text
+def get_matcher(reverse_map: Dict[str, str]) -> PseudonymMatcher:
+    """Return a matcher for a reverse map, reusing one built for the same map."""
+    return _cached_matcher(frozenset(reverse_map.items()))
+
+
+@lru_cache(maxsize=256)
+def _cached_matcher(items: FrozenSet[Tuple[str, str]]) -> PseudonymMatcher:
+    return PseudonymMatcher(dict(items))
+
+
+def _trie_pattern(words) -> str:
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: dict) -> str:
+    branches = [
+        re.escape(ch) + _node_pattern(child) for ch, child in sorted(node.items()) if ch
+    ]
+    if not branches:
+        return ""
+
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A pseudonym ends here; the greedy group prefers a longer one.
+        return f"(?:{body})?"
+    return body
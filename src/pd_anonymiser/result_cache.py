@@ -0,0 +1,324 @@
+"""
+Content-addressed cache of analyser results.
+
+Repeated texts (templated emails, signatures, retried prompts) are analysed
+once. The cache stores the detected spans (entity type, offsets, score) and
+never the text itself, under a SHA-256 of the text, language, model
+selection and the versions of the recognisers that produced them: the
+library packages, the spaCy model packages and the revision of each Hugging
+Face model. An in-memory LRU sits in front of an optional SQLite store
+shared across processes and restarts.
+
+The cache is off unless ``PD_ANONYMISER_RESULT_CACHE`` is set or
+``set_analysis_cache`` is called:
+
+ - ``memory``: the in-memory LRU only;
+ - ``sqlite:<path>``: the LRU in front of a SQLite database.
+
+The SQLite store is kept to about ``PD_ANONYMISER_RESULT_CACHE_MAX_ROWS``
+rows (default 1,000,000): beyond that, the rows longest unread and unwritten
+in the database are dropped. ``AnalysisCache.clear`` empties both tiers.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from presidio_analyzer import RecognizerResult
+
+import pd_anonymiser.models as model_registry
+
+RESULT_CACHE_ENV = "PD_ANONYMISER_RESULT_CACHE"
+RESULT_CACHE_MAX_ROWS_ENV = "PD_ANONYMISER_RESULT_CACHE_MAX_ROWS"
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_DISK_ENTRIES = 1_000_000
+# Writes between checks of the SQLite store's size
+_PRUNE_EVERY = 100
+
+# Packages whose upgrades can change what is detected.
+_VERSIONED_PACKAGES = (
+    "pd-anonymiser",
+    "presidio-analyzer",
+    "spacy",
+    "transformers",
+    # Presidio's default NLP engine
+    "en_core_web_lg",
+)
+
+Span = Tuple[str, int, int, float]
+
+
+class AnalysisCache:
+    """LRU of analyser results in front of an optional SQLite store."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        path: Union[str, Path, None] = None,
+        max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+    ):
+        if max_disk_entries < 1:
+            raise ValueError(
+                f"max_disk_entries must be at least 1, got {max_disk_entries}"
+            )
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        # key -> (spans, seconds the analysis took)
+        self._memory: "OrderedDict[str, Tuple[List[Span], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                str(self.path), check_same_thread=False, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " spans TEXT NOT NULL,"
+                " seconds REAL NOT NULL,"
+                " used REAL NOT NULL DEFAULT 0"
+                ")"
+            )
+            columns = [
+                row[1] for row in self._conn.execute("PRAGMA table_info(results)")
+            ]
+            if "used" not in columns:
+                # A store from before the size limit; its rows count as oldest
+                self._conn.execute(
+                    "ALTER TABLE results ADD COLUMN used REAL NOT NULL DEFAULT 0"
+                )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_used ON results (used)"
+            )
+            self._prune()
+
+    def analyse(
+        self,
+        key: str,
+        analyse: Callable[[], List[RecognizerResult]],
+    ) -> List[RecognizerResult]:
+        """Return cached results for ``key``, or run ``analyse`` and cache them."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        results = analyse()
+        self.put(key, results, time.perf_counter() - start)
+        return results
+
+    def get(self, key: str) -> Optional[List[RecognizerResult]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT spans, seconds FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = ([tuple(span) for span in json.loads(row[0])], row[1])
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    self._conn.execute(
+                        "UPDATE results SET used = ? WHERE key = ?", (time.time(), key)
+                    )
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry[1]
+        return _to_results(entry[0])
+
+    def put(self, key: str, results: Sequence[RecognizerResult], seconds: float):
+        spans = [(r.entity_type, r.start, r.end, r.score) for r in results]
+        with self._lock:
+            self._remember(key, (spans, seconds))
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, spans, seconds, used)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(spans), seconds, time.time()),
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM results")
+            self.hits = self.disk_hits = self.misses = 0
+            self.saved_seconds = 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _prune(self) -> None:
+        """Drop the rows least recently read or written beyond ``max_disk_entries``."""
+        (rows,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        excess = rows - self.max_disk_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN"
+                " (SELECT key FROM results ORDER BY used LIMIT ?)",
+                (excess,),
+            )
+
+    def _remember(self, key: str, entry: Tuple[List[Span], float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+def cache_key(text: str, language: str, model: str, cascade: bool = False) -> str:
+    """SHA-256 of the text and everything else that decides its results."""
+    digest = hashlib.sha256()
+    digest.update(_recogniser_fingerprint(model, cascade).encode())
+    digest.update(b"\0")
+    digest.update(language.encode())
+    digest.update(b"\0")
+    digest.update(text.encode())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _package_versions() -> str:
+    return ";".join(
+        f"{package}=={_package_version(package)}" for package in _VERSIONED_PACKAGES
+    )
+
+
+def _package_version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+# Model name -> version or revision, once known
+_model_versions: Dict[str, str] = {}
+
+
+def _model_version(model_name: str) -> str:
+    """The installed spaCy model package's version, or a Hugging Face model's
+    commit hash. Empty while it cannot be determined, e.g. before a download.
+    """
+    version = _model_versions.get(model_name)
+    if version is None:
+        if "/" in model_name:
+            version = _hf_revision(model_name)
+        else:
+            version = _package_version(model_name)
+        if version:
+            _model_versions[model_name] = version
+    return version
+
+
+def _hf_revision(model_name: str) -> str:
+    recogniser = model_registry._loaded.get(model_name)
+    pipeline = getattr(recogniser, "ner_pipeline", None)
+    commit_hash = getattr(getattr(pipeline, "model", None), "config", None)
+    commit_hash = getattr(commit_hash, "_commit_hash", None)
+    if isinstance(commit_hash, str):
+        return commit_hash
+    # Not loaded (or exported to ONNX): the snapshot in the local Hub cache
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return ""
+    config = try_to_load_from_cache(model_name, "config.json")
+    return Path(config).parent.name if isinstance(config, str) else ""
+
+
+def _recogniser_fingerprint(model: str, cascade: bool) -> str:
+    return "|".join(
+        [
+            _package_versions(),
+            ",".join(
+                f"{name}@{_model_version(name)}"
+                for name in model_registry.resolve_models(model)
+            ),
+            os.getenv(model_registry.HF_BACKEND_ENV, "torch"),
+            "cascade" if cascade else "full",
+        ]
+    )
+
+
+def _to_results(spans: List[Span]) -> List[RecognizerResult]:
+    return [
+        RecognizerResult(entity_type=entity_type, start=start, end=end, score=score)
+        for entity_type, start, end, score in spans
+    ]
+
+
+def analysis_cache_from_url(url: str) -> AnalysisCache:
+    if url == "memory":
+        return AnalysisCache()
+    scheme, sep, location = url.partition(":")
+    if scheme == "sqlite" and sep and location:
+        max_rows = os.getenv(RESULT_CACHE_MAX_ROWS_ENV)
+        if max_rows:
+            return AnalysisCache(path=location, max_disk_entries=int(max_rows))
+        return AnalysisCache(path=location)
+    raise ValueError(f"Invalid result cache: {url!r}")
+
+
+_cache: Optional[AnalysisCache] = None
+_configured = False
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """The configured cache, or None when result caching is off."""
+    global _cache, _configured
+    if not _configured:
+        with _cache_lock:
+            if not _configured:
+                url = os.getenv(RESULT_CACHE_ENV)
+                _cache = analysis_cache_from_url(url) if url else None
+                _configured = True
+    return _cache
+
+
+def set_analysis_cache(cache: Optional[AnalysisCache]) -> None:
+    """Use ``cache`` for all analyses; ``None`` turns result caching off."""
+    global _cache, _configured
+    with _cache_lock:
+        _cache = cache
+        _configured = True
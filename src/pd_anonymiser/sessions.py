@@ -0,0 +1,408 @@
+"""
+Storage for encrypted session blobs.
+
+A session is an opaque, already-encrypted token stored under its session id.
+The store in use is configured with the ``PD_ANONYMISER_SESSION_STORE``
+environment variable or ``set_session_store``:
+
+ - ``file:<directory>`` (default ``file:sessions``): one ``<id>.enc`` file per session;
+ - ``sqlite:<path>``: a single SQLite database in WAL mode.
+
+Sessions record when they were created. A store with a ``ttl`` (seconds, or
+``PD_ANONYMISER_SESSION_TTL``) treats older sessions as gone and removes
+them in bulk on ``sweep``, either on demand or from a ``SessionSweeper``.
+Functions registered with ``on_sessions_removed`` are told the ids of
+sessions removed by ``delete`` and ``sweep``, e.g. to drop cached copies.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+SESSION_STORE_ENV = "PD_ANONYMISER_SESSION_STORE"
+SESSION_TTL_ENV = "PD_ANONYMISER_SESSION_TTL"
+DEFAULT_SESSION_STORE = "file:sessions"
+
+logger = logging.getLogger(__name__)
+
+# Stay well under SQLite's limit on bound parameters per statement.
+_SQLITE_LOOKUP_BATCH = 500
+
+
+class SessionNotFoundError(LookupError):
+    pass
+
+
+_removal_hooks: List[Callable[[List[str]], None]] = []
+
+
+def on_sessions_removed(hook: Callable[[List[str]], None]) -> None:
+    """Call ``hook`` with the ids of sessions removed from any store."""
+    _removal_hooks.append(hook)
+
+
+def _removed(session_ids: List[str]) -> None:
+    if session_ids:
+        for hook in _removal_hooks:
+            hook(session_ids)
+
+
+@dataclass
+class SessionStats:
+    count: int
+    bytes: int
+    # Creation time (epoch seconds) of the oldest session, None when empty
+    oldest: Optional[float]
+
+
+class SessionStore(ABC):
+    ttl: Optional[float] = None
+
+    def _expired_before(self, now: Optional[float] = None) -> Optional[float]:
+        """Sessions created before this time have expired."""
+        if self.ttl is None:
+            return None
+        return (time.time() if now is None else now) - self.ttl
+
+    @abstractmethod
+    def put(self, session_id: str, token: bytes) -> None: ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> bytes:
+        """Return the token for a session, or raise SessionNotFoundError."""
+
+    def created_at(self, session_id: str) -> Optional[float]:
+        """Creation time (epoch seconds) of a session, None if unknown or missing."""
+        return None
+
+    def expires_in(self, session_id: str) -> Optional[float]:
+        """Seconds until a session expires, None if it never does.
+
+        A session that is missing, or whose creation time is unknown, counts
+        as already expired.
+        """
+        if self.ttl is None:
+            return None
+        created_at = self.created_at(session_id)
+        if created_at is None:
+            return 0.0
+        return created_at + self.ttl - time.time()
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None: ...
+
+    @abstractmethod
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Remove every expired session and return how many were removed."""
+
+    @abstractmethod
+    def stats(self) -> SessionStats: ...
+
+    def compact(self) -> None:
+        """Give space freed by deleted sessions back to the filesystem."""
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]) -> None:
+        for session_id, token in items:
+            self.put(session_id, token)
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, bytes]:
+        """Return the tokens that exist; missing sessions are left out."""
+        found = {}
+        for session_id in session_ids:
+            try:
+                found[session_id] = self.get(session_id)
+            except SessionNotFoundError:
+                pass
+        return found
+
+    def close(self) -> None:
+        pass
+
+
+class FileSessionStore(SessionStore):
+    """One file per session; the file's modification time is its creation time."""
+
+    def __init__(
+        self, directory: Union[str, Path] = "sessions", ttl: Optional[float] = None
+    ):
+        self.directory = Path(directory)
+        self.ttl = ttl
+
+    def _path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.enc"
+
+    def put(self, session_id: str, token: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self._path(session_id), "wb") as f_out:
+            f_out.write(token)
+
+    def get(self, session_id: str) -> bytes:
+        try:
+            with open(self._path(session_id), "rb") as f_in:
+                expired_before = self._expired_before()
+                if (
+                    expired_before is not None
+                    and os.fstat(f_in.fileno()).st_mtime < expired_before
+                ):
+                    raise SessionNotFoundError(session_id)
+                return f_in.read()
+        except FileNotFoundError:
+            raise SessionNotFoundError(session_id) from None
+
+    def created_at(self, session_id: str) -> Optional[float]:
+        try:
+            return self._path(session_id).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def delete(self, session_id: str) -> None:
+        self._path(session_id).unlink(missing_ok=True)
+        _removed([session_id])
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".enc") and entry.is_file():
+                        yield entry
+        except FileNotFoundError:
+            return
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        expired_before = self._expired_before(now)
+        if expired_before is None:
+            return 0
+
+        removed = []
+        for entry in self._entries():
+            try:
+                if entry.stat().st_mtime < expired_before:
+                    os.unlink(entry.path)
+                    removed.append(entry.name[: -len(".enc")])
+            except FileNotFoundError:
+                pass  # removed concurrently
+        _removed(removed)
+        return len(removed)
+
+    def stats(self) -> SessionStats:
+        count, size, oldest = 0, 0, None
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            count += 1
+            size += st.st_size
+            oldest = st.st_mtime if oldest is None else min(oldest, st.st_mtime)
+        return SessionStats(count=count, bytes=size, oldest=oldest)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Encrypted session blobs in one SQLite database, indexed by session id.
+
+    The connection is shared by all threads and serialised with a lock; WAL
+    mode lets other processes read while one writes.
+    """
+
+    def __init__(
+        self, path: Union[str, Path] = "sessions.db", ttl: Optional[float] = None
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " token BLOB NOT NULL,"
+            " created_at REAL"
+            ")"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "created_at" not in columns:
+            # Databases written before sessions had a creation time
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN created_at REAL")
+        self._conn.execute(
+            "UPDATE sessions SET created_at = ? WHERE created_at IS NULL",
+            (time.time(),),
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at)"
+        )
+
+    def put(self, session_id: str, token: bytes) -> None:
+        self.put_many([(session_id, token)])
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]) -> None:
+        now = time.time()
+        rows = [(session_id, token, now) for session_id, token in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO sessions (session_id, token, created_at)"
+                    " VALUES (?, ?, ?)",
+                    rows,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get(self, session_id: str) -> bytes:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token FROM sessions WHERE session_id = ? AND created_at >= ?",
+                (session_id, self._expired_before() or 0),
+            ).fetchone()
+        if row is None:
+            raise SessionNotFoundError(session_id)
+        return row[0]
+
+    def get_many(self, session_ids: Iterable[str]) -> Dict[str, bytes]:
+        ids: List[str] = list(session_ids)
+        expired_before = self._expired_before() or 0
+        found = {}
+        with self._lock:
+            for i in range(0, len(ids), _SQLITE_LOOKUP_BATCH):
+                batch = ids[i : i + _SQLITE_LOOKUP_BATCH]
+                placeholders = ", ".join("?" * len(batch))
+                found.update(
+                    self._conn.execute(
+                        "SELECT session_id, token FROM sessions"
+                        f" WHERE session_id IN ({placeholders}) AND created_at >= ?",
+                        [*batch, expired_before],
+                    ).fetchall()
+                )
+        return found
+
+    def created_at(self, session_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+        _removed([session_id])
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        expired_before = self._expired_before(now)
+        if expired_before is None:
+            return 0
+        with self._lock:
+            removed = [
+                row[0]
+                for row in self._conn.execute(
+                    "DELETE FROM sessions WHERE created_at < ? RETURNING session_id",
+                    (expired_before,),
+                )
+            ]
+        _removed(removed)
+        return len(removed)
+
+    def stats(self) -> SessionStats:
+        with self._lock:
+            count, size, oldest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(token)), 0), MIN(created_at)"
+                " FROM sessions"
+            ).fetchone()
+        return SessionStats(count=count, bytes=size, oldest=oldest)
+
+    def compact(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SessionSweeper:
+    """Background thread that sweeps a store every ``interval`` seconds."""
+
+    def __init__(
+        self,
+        store: Optional[SessionStore] = None,
+        interval: float = 300.0,
+        compact: bool = False,
+    ):
+        self.store = store
+        self.interval = interval
+        self.compact = compact
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="session-sweeper", daemon=True
+        )
+
+    def start(self) -> "SessionSweeper":
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            store = self.store or get_session_store()
+            try:
+                removed = store.sweep()
+                if removed and self.compact:
+                    store.compact()
+            except Exception:
+                logger.exception("Session sweep failed")
+            else:
+                if removed:
+                    logger.info("Removed %d expired sessions", removed)
+
+
+def session_store_from_url(url: str, ttl: Optional[float] = None) -> SessionStore:
+    scheme, sep, location = url.partition(":")
+    if not sep or not location:
+        raise ValueError(f"Invalid session store: {url!r}")
+    if scheme == "file":
+        return FileSessionStore(location, ttl=ttl)
+    if scheme == "sqlite":
+        return SQLiteSessionStore(location, ttl=ttl)
+    raise ValueError(f"Unknown session store type: {scheme}")
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                ttl = os.getenv(SESSION_TTL_ENV)
+                _store = session_store_from_url(
+                    os.getenv(SESSION_STORE_ENV, DEFAULT_SESSION_STORE),
+                    ttl=float(ttl) if ttl else None,
+                )
+    return _store
+
+
+def set_session_store(store: Optional[SessionStore]) -> None:
+    """Use ``store`` for all sessions; ``None`` reverts to the configured default."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,136 @@
+import re
+from collections import Counter
+from typing import Iterable, Iterator, Optional
+
+from pd_anonymiser.anonymiser import (
+    _attach_replacements,
+    _generate_pseudonyms,
+    _render,
+    _save_session,
+    get_analyser,
+)
+from pd_anonymiser.merging import merge_results
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"\s")
+
+
+class AnonymisationStream:
+    """Anonymised text, yielded segment by segment as the input is read.
+
+    One pseudonym map is shared by the whole stream, so a name gets the same
+    pseudonym wherever it appears. The map is saved as a single session once
+    the stream is exhausted; ``session_id`` and ``key`` stay ``None`` until
+    then, and afterwards too if nothing was found. A stream can be iterated
+    only once.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[str],
+        language: str = "en",
+        use_reusable_tags: bool = True,
+        model: str = "all",
+        allow_reidentification: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.language = language
+        self.use_reusable_tags = use_reusable_tags
+        self.model = model
+        self.allow_reidentification = allow_reidentification
+        self.chunk_size = chunk_size
+        self.pseudonyms: dict = {}
+        self._counters: Counter = Counter()
+        self.session_id: Optional[str] = None
+        self.key: Optional[str] = None
+        self._chunks = chunks
+        self._started = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self._started:
+            raise RuntimeError("An AnonymisationStream can only be iterated once.")
+        self._started = True
+        return self._anonymise()
+
+    def _anonymise(self) -> Iterator[str]:
+        analyser = get_analyser(self.language, self.model)
+
+        for segment in _segments(self._chunks, self.chunk_size):
+            results = analyser.analyze(text=segment, language=self.language)
+            if results:
+                results = merge_results(results)
+                _generate_pseudonyms(
+                    results,
+                    segment,
+                    self.use_reusable_tags,
+                    self.pseudonyms,
+                    self._counters,
+                )
+                _attach_replacements(results, self.pseudonyms, segment)
+                segment = _render(segment, results, self.allow_reidentification)
+            yield segment
+
+        if self.pseudonyms:
+            self.session_id, self.key = _save_session(self.pseudonyms)
+
+
+def anonymise_stream(
+    chunks: Iterable[str],
+    language: str = "en",
+    use_reusable_tags: bool = True,
+    model: str = "all",
+    allow_reidentification: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> AnonymisationStream:
+    """Anonymise an iterable of text chunks, e.g. an open text file.
+
+    Input is regrouped into segments of ``chunk_size`` to ``2 * chunk_size``
+    characters that end on a line break where possible, so an entity is not
+    split between two analyses. Memory stays bounded by the segment size plus
+    the pseudonym map.
+    """
+    return AnonymisationStream(
+        chunks,
+        language=language,
+        use_reusable_tags=use_reusable_tags,
+        model=model,
+        allow_reidentification=allow_reidentification,
+        chunk_size=chunk_size,
+    )
+
+
+def _segments(chunks: Iterable[str], chunk_size: int) -> Iterator[str]:
+    parts, size = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size < chunk_size:
+            continue
+
+        buffer = "".join(parts)
+        while len(buffer) >= chunk_size:
+            cut = _cut_point(buffer, chunk_size)
+            if not cut:
+                break
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+        parts, size = [buffer], len(buffer)
+
+    if size:
+        yield "".join(parts)
+
+
+def _cut_point(buffer: str, chunk_size: int) -> int:
+    """Where to end the next segment, or 0 to keep reading."""
+    limit = 2 * chunk_size
+    cut = buffer.rfind("\n", 0, limit) + 1
+    if cut:
+        return cut
+
+    # No line break yet: give the line a little longer, then settle for
+    # the last whitespace, and only split a word as a last resort.
+    if len(buffer) < limit:
+        return 0
+    spaces = [m.end() for m in _WHITESPACE.finditer(buffer, 0, limit)]
+    return spaces[-1] if spaces else limit
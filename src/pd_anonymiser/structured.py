@@ -0,0 +1,168 @@
+"""
+Anonymisation of nested JSON-like data: dicts, lists and tuples of strings,
+numbers, booleans and ``None``.
+
+Fields are selected by dotted paths of keys, where list items are matched by
+their index or ``*``:
+
+ - ``*`` matches any single key or index, e.g. ``orders.*.note``;
+ - ``**`` matches any number of levels, e.g. ``**.id`` is every ``id`` field;
+ - a path also selects everything below it, so ``customer`` covers
+   ``customer.name`` and ``customer.address.city``.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from pd_anonymiser.anonymiser import (
+    DEFAULT_BATCH_SIZE,
+    _anonymise_shared,
+    _save_session,
+    analyse_texts,
+)
+from pd_anonymiser.reidentifier import load_matcher
+
+Path = Tuple[str, ...]
+
+
+@dataclass
+class JsonAnonymisationResult:
+    data: Any
+    session_id: Optional[str]
+    key: Optional[str]
+
+
+def anonymise_json(
+    obj: Any,
+    include_paths: Optional[Iterable[str]] = None,
+    exclude_paths: Iterable[str] = (),
+    language: str = "en",
+    use_reusable_tags: bool = True,
+    model: str = "all",
+    allow_reidentification: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> JsonAnonymisationResult:
+    """Anonymise the string leaves of ``obj``.
+
+    Leaves under ``include_paths`` (default: all of them) and not under
+    ``exclude_paths`` are anonymised. Dict keys and values that are not
+    strings are left as they are. Every distinct string is analysed once,
+    in one batch, and one pseudonym map covers the whole structure, so a
+    name gets the same pseudonym in every field; it is saved as a single
+    session. ``obj`` is not modified.
+    """
+    selector = _Selector(include_paths, exclude_paths)
+    leaves = _select_leaves(obj, selector)
+
+    # Distinct strings, in order of first appearance
+    values = list(dict.fromkeys(text for text in leaves.values() if text.strip()))
+
+    replacements, pseudonyms = _anonymise_shared(
+        values,
+        analyse_texts(values, language, model, batch_size),
+        use_reusable_tags,
+        allow_reidentification,
+    )
+
+    data = _rebuild(
+        obj,
+        (),
+        lambda path, text: (replacements.get(text, text) if path in leaves else text),
+    )
+
+    session_id = key = None
+    if pseudonyms:
+        session_id, key = _save_session(pseudonyms)
+    return JsonAnonymisationResult(data=data, session_id=session_id, key=key)
+
+
+def reidentify_json(
+    obj: Any,
+    session_id: str,
+    encoded_key: str,
+    include_paths: Optional[Iterable[str]] = None,
+    exclude_paths: Iterable[str] = (),
+) -> Any:
+    """Restore the original strings in data from ``anonymise_json``.
+
+    Pass the same ``include_paths`` and ``exclude_paths``: only the leaves
+    that were anonymised are restored.
+    """
+    selector = _Selector(include_paths, exclude_paths)
+    matcher = load_matcher(session_id, encoded_key)
+    cache: Dict[str, str] = {}
+
+    def restore(path: Path, text: str) -> str:
+        if not selector(path):
+            return text
+        if text not in cache:
+            cache[text] = matcher.sub(text)
+        return cache[text]
+
+    return _rebuild(obj, (), restore)
+
+
+class _Selector:
+    def __init__(
+        self, include_paths: Optional[Iterable[str]], exclude_paths: Iterable[str]
+    ):
+        self.include = (
+            None if include_paths is None else [_split(p) for p in include_paths]
+        )
+        self.exclude = [_split(p) for p in exclude_paths]
+
+    def __call__(self, path: Path) -> bool:
+        if any(_under(pattern, path) for pattern in self.exclude):
+            return False
+        return self.include is None or any(
+            _under(pattern, path) for pattern in self.include
+        )
+
+
+def _split(path: str) -> Path:
+    if not path:
+        raise ValueError("Empty path")
+    return tuple(path.split("."))
+
+
+def _under(pattern: Sequence[str], path: Path) -> bool:
+    """Whether ``path`` is at or below a location matched by ``pattern``."""
+    if not pattern:
+        return True
+    head, rest = pattern[0], pattern[1:]
+    if head == "**":
+        return any(_under(rest, path[i:]) for i in range(len(path) + 1))
+    return bool(path) and head in ("*", path[0]) and _under(rest, path[1:])
+
+
+def _select_leaves(
+    obj: Any,
+    selector: Callable[[Path], bool],
+    path: Path = (),
+    leaves: Optional[dict] = None,
+) -> Dict[Path, str]:
+    """The selected string leaves of ``obj`` by path, in document order."""
+    if leaves is None:
+        leaves = {}
+    if isinstance(obj, str):
+        if selector(path):
+            leaves[path] = obj
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            _select_leaves(v, selector, path + (str(k),), leaves)
+    elif isinstance(obj, (list, tuple)):
+        for i, v in enumerate(obj):
+            _select_leaves(v, selector, path + (str(i),), leaves)
+    return leaves
+
+
+def _rebuild(obj: Any, path: Path, replace) -> Any:
+    """A copy of ``obj`` with each string leaf passed through ``replace``."""
+    if isinstance(obj, str):
+        return replace(path, obj)
+    if isinstance(obj, dict):
+        return {k: _rebuild(v, path + (str(k),), replace) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        items = [_rebuild(v, path + (str(i),), replace) for i, v in enumerate(obj)]
+        return items if isinstance(obj, list) else tuple(items)
+    return obj
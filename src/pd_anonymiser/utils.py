@@ -1,34 +1,50 @@
 import json
-from pathlib import Path
+from typing import Iterable, Optional, Tuple
 
 from cryptography.fernet import Fernet
 
-DATA_DIR = Path("sessions")
-DATA_DIR.mkdir(exist_ok=True)
+import pd_anonymiser.metrics as metrics
+from pd_anonymiser.sessions import SessionStore, get_session_store
 
 
 def generate_key():
     return Fernet.generate_key()
 
 
-def save_encrypted_json(data: dict, session_id: str, key: bytes):
-    f = Fernet(key)
-    serialisable = {f"{k[0]}|||{k[1]}": v for k, v in data.items()}
-    token = f.encrypt(json.dumps(serialisable).encode())
+def encrypt_json(data: dict, key: bytes) -> bytes:
+    with metrics.timed("encrypt"):
+        serialisable = {f"{k[0]}|||{k[1]}": v for k, v in data.items()}
+        return Fernet(key).encrypt(json.dumps(serialisable).encode())
 
-    out_path = DATA_DIR / f"{session_id}.enc"
 
-    with open(out_path, "wb") as f_out:
-        f_out.write(token)
+def decrypt_json(token: bytes, key: bytes) -> dict:
+    with metrics.timed("decrypt"):
+        raw_map = json.loads(Fernet(key).decrypt(token))
+        return {tuple(k.split("|||")): v for k, v in raw_map.items()}
 
 
-def load_encrypted_json(session_id: str, key: bytes) -> dict:
-    f = Fernet(key)
-    in_path = DATA_DIR / f"{session_id}.enc"
+def save_encrypted_json(
+    data: dict, session_id: str, key: bytes, store: Optional[SessionStore] = None
+):
+    token = encrypt_json(data, key)
+    with metrics.timed("session_write"):
+        (store or get_session_store()).put(session_id, token)
 
-    with open(in_path, "rb") as f_in:
-        encrypted = f_in.read()
 
-    decrypted = f.decrypt(encrypted)
-    raw_map = json.loads(decrypted)
-    return {tuple(k.split("|||")): v for k, v in raw_map.items()}
+def save_encrypted_jsons(
+    sessions: Iterable[Tuple[dict, str, bytes]], store: Optional[SessionStore] = None
+):
+    """Save many (data, session_id, key) sessions in one batched write."""
+    tokens = [
+        (session_id, encrypt_json(data, key)) for data, session_id, key in sessions
+    ]
+    with metrics.timed("session_write"):
+        (store or get_session_store()).put_many(tokens)
+
+
+def load_encrypted_json(
+    session_id: str, key: bytes, store: Optional[SessionStore] = None
+) -> dict:
+    with metrics.timed("session_read"):
+        token = (store or get_session_store()).get(session_id)
+    return decrypt_json(token, key)
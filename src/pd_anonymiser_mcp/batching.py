@@ -0,0 +1,149 @@
+"""
+Micro-batching of concurrent requests.
+
+Requests that arrive within ``max_wait`` seconds of each other are collected,
+up to ``max_batch_size`` requests or ``max_batch_chars`` characters, and
+handed to a batch function in one call, so the models see one padded batch
+instead of many batches of one. Each caller awaits its own result.
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, List, Optional, Set, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT = 0.005
+DEFAULT_MAX_BATCH_CHARS = 100_000
+
+
+@dataclass
+class _Request(Generic[T]):
+    item: T
+    future: asyncio.Future
+    size: int
+
+
+@dataclass
+class BatchingStats:
+    queue_depth: int
+    requests: int
+    batches: int
+    # Number of batches of each size
+    batch_sizes: Counter = field(default_factory=Counter)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects concurrently submitted items into batches.
+
+    ``run_batch`` is awaited with a list of items and must return one result
+    per item, in order; ``size`` measures an item against ``max_batch_chars``.
+    A batch is dispatched as soon as it is full, or ``max_wait`` seconds
+    after its first item arrived, and the next batch starts forming while it
+    runs. If ``run_batch`` raises, every caller in that batch gets the error.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[T]], Awaitable[List[R]]],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        max_batch_chars: int = DEFAULT_MAX_BATCH_CHARS,
+        size: Callable[[T], int] = len,
+    ):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_batch_chars = max_batch_chars
+        self.size = size
+        self._requests = 0
+        self._batch_sizes: Counter = Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._carry: Optional[_Request] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._start(loop)
+        future = loop.create_future()
+        self._queue.put_nowait(_Request(item, future, self.size(item)))
+        return await future
+
+    def stats(self) -> BatchingStats:
+        return BatchingStats(
+            queue_depth=(self._queue.qsize() if self._queue else 0)
+            + (self._carry is not None),
+            requests=self._requests,
+            batches=sum(self._batch_sizes.values()),
+            batch_sizes=Counter(self._batch_sizes),
+        )
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._carry = None
+        self._spawn(self._dispatch())
+
+    def _spawn(self, coro) -> None:
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self) -> None:
+        while True:
+            batch = await self._collect()
+            self._requests += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._spawn(self._run(batch))
+
+    async def _collect(self) -> List[_Request]:
+        first, self._carry = self._carry, None
+        if first is None:
+            first = await self._queue.get()
+        batch, chars = [first], first.size
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if chars + request.size > self.max_batch_chars:
+                self._carry = request  # starts the next batch
+                break
+            batch.append(request)
+            chars += request.size
+        return batch
+
+    async def _run(self, batch: List[_Request]) -> None:
+        try:
+            results = await self.run_batch([r.item for r in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch of {len(batch)} returned {len(results)} results"
+                )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        for request, result in zip(batch, results):
+            if not request.future.done():
+                request.future.set_result(result)
@@ -1,12 +1,16 @@
 import logging
 import os
 from contextlib import asynccontextmanager
+from typing import Optional
 
 import openai
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
+from pd_anonymiser import metrics
 from pd_anonymiser_mcp.estimate_openai_cost import count_tokens, estimate_cost
+from pd_anonymiser_mcp.profiling import profiler
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
@@ -42,16 +46,43 @@ class CostEstimatorResponse(BaseModel):
     cost: float
 
 
+class ProfilingRequest(BaseModel):
+    requests: int = 0
+    fraction: float = 0.0
+    mode: Optional[str] = None
+
+
 @app.post(
     "/cost-estimation/open-ai",
     response_model=CostEstimatorResponse,
     responses={200: {"model": CostEstimatorResponse}},
 )
 async def estimate_openai_api_cost(request: CostEstimatorRequest):
-    prompt_token_count = count_tokens(request.prompt, request.model)
-    return CostEstimatorResponse(
-        cost=estimate_cost(
-            prompt_token_count, request.max_completion_tokens, request.model
-        ),
-        prompt_token_count=prompt_token_count,
-    )
+    with metrics.timed("cost_estimation"), profiler.profile("cost_estimation"):
+        metrics.observe_text("cost_estimation", request.prompt)
+        prompt_token_count = count_tokens(request.prompt, request.model)
+        return CostEstimatorResponse(
+            cost=estimate_cost(
+                prompt_token_count, request.max_completion_tokens, request.model
+            ),
+            prompt_token_count=prompt_token_count,
+        )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/profiling")
+async def profiling_status():
+    return profiler.status()
+
+
+@app.post("/profiling")
+async def arm_profiling(request: ProfilingRequest):
+    try:
+        profiler.arm(request.requests, request.fraction, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.status()
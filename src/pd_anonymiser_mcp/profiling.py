@@ -0,0 +1,244 @@
+"""
+On-demand profiling of live server requests.
+
+Profiling is off until it is armed, either to profile the next N requests or
+a random fraction of requests:
+
+ - at start-up with ``PD_ANONYMISER_PROFILE``: ``next:<N>`` or ``fraction:<F>``;
+ - at runtime with ``POST /profiling`` on the MCP or cost estimation server,
+   e.g. ``{"requests": 20}`` or ``{"fraction": 0.01}``; ``GET /profiling``
+   reports what is armed and the files written so far.
+
+Each profiled request writes one file to ``PD_ANONYMISER_PROFILE_DIR``
+(default ``profiles``). ``PD_ANONYMISER_PROFILE_MODE`` selects the profiler:
+
+ - ``cprofile`` (default): deterministic, written as ``.pstats`` for
+   ``python -m pstats`` or snakeviz;
+ - ``sample``: the request's stack sampled every few milliseconds, written
+   as ``.collapsed`` stacks for flamegraph.pl or speedscope.
+
+One request is profiled at a time; requests arriving meanwhile run as usual.
+"""
+
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, TypeVar, Union
+
+PROFILE_ENV = "PD_ANONYMISER_PROFILE"
+PROFILE_DIR_ENV = "PD_ANONYMISER_PROFILE_DIR"
+PROFILE_MODE_ENV = "PD_ANONYMISER_PROFILE_MODE"
+DEFAULT_PROFILE_DIR = "profiles"
+MODES = ("cprofile", "sample")
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Recently written files reported by status()
+RECENT_FILES = 20
+
+T = TypeVar("T")
+
+
+class RequestProfiler:
+    """Profiles the next ``requests`` requests and/or a ``fraction`` of them."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = DEFAULT_PROFILE_DIR,
+        mode: str = "cprofile",
+        sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+        chance: Callable[[], float] = random.random,
+    ):
+        _check_mode(mode)
+        self.directory = Path(directory)
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self._chance = chance
+        self._remaining = 0
+        self._fraction = 0.0
+        self._profiled = 0
+        self._files: deque = deque(maxlen=RECENT_FILES)
+        self._lock = threading.Lock()
+        # Held while a request is being profiled
+        self._busy = threading.Lock()
+
+    @property
+    def armed(self) -> bool:
+        return self._remaining > 0 or self._fraction > 0
+
+    def arm(
+        self, requests: int = 0, fraction: float = 0.0, mode: Optional[str] = None
+    ) -> None:
+        """Profile the next ``requests`` requests, and ``fraction`` of the rest."""
+        if requests < 0:
+            raise ValueError(f"requests must not be negative, got {requests}")
+        if not 0 <= fraction <= 1:
+            raise ValueError(f"fraction must be between 0 and 1, got {fraction}")
+        if mode is not None:
+            _check_mode(mode)
+        with self._lock:
+            self._remaining = requests
+            self._fraction = fraction
+            if mode is not None:
+                self.mode = mode
+
+    def disarm(self) -> None:
+        self.arm(0, 0.0)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "remaining": self._remaining,
+                "fraction": self._fraction,
+                "mode": self.mode,
+                "directory": str(self.directory),
+                "profiled": self._profiled,
+                "files": list(self._files),
+            }
+
+    def call(self, name: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Call ``fn``, profiling the call if it is selected."""
+        if not self.armed:
+            return fn(*args, **kwargs)
+        with self.profile(name):
+            return fn(*args, **kwargs)
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the enclosed block if this request is selected.
+
+        Only the calling thread is profiled, so enter this where the work is
+        done, e.g. inside the function handed to a worker pool.
+        """
+        number = self._select() if self.armed else None
+        if number is None:
+            yield
+            return
+
+        stem = f"{time.strftime('%Y%m%dT%H%M%S')}-{name}-{number}"
+        try:
+            if self.mode == "sample":
+                with self._sampled(stem):
+                    yield
+            else:
+                with self._cprofiled(stem):
+                    yield
+        finally:
+            self._busy.release()
+
+    def _select(self) -> Optional[int]:
+        with self._lock:
+            if self._remaining > 0:
+                chosen = True
+            else:
+                chosen = self._fraction > 0 and self._chance() < self._fraction
+            if not chosen or not self._busy.acquire(blocking=False):
+                return None
+            if self._remaining > 0:
+                self._remaining -= 1
+            self._profiled += 1
+            return self._profiled
+
+    @contextmanager
+    def _cprofiled(self, stem: str):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            path = self._path(stem, ".pstats")
+            profile.dump_stats(str(path))
+            self._written(path)
+
+    @contextmanager
+    def _sampled(self, stem: str):
+        sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = self._path(stem, ".collapsed")
+            with open(path, "w") as f_out:
+                for stack, count in sampler.stacks.most_common():
+                    f_out.write(f"{stack} {count}\n")
+            self._written(path)
+
+    def _path(self, stem: str, suffix: str) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return self.directory / f"{stem}{suffix}"
+
+    def _written(self, path: Path) -> None:
+        with self._lock:
+            self._files.append(str(path))
+
+
+class _StackSampler(threading.Thread):
+    """Counts the collapsed stacks of one thread, sampled at an interval."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="pd-anonymiser-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def _collapse(frame) -> str:
+    """``outermost;...;innermost`` frame names, as flamegraph.pl expects."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _check_mode(mode: str) -> None:
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode: {mode!r} (expected one of {MODES})")
+
+
+def parse_profile_spec(spec: str) -> Tuple[int, float]:
+    """``next:<N>`` or ``fraction:<F>`` as (requests, fraction)."""
+    kind, sep, value = spec.partition(":")
+    try:
+        if sep and kind == "next":
+            return int(value), 0.0
+        if sep and kind == "fraction":
+            return 0, float(value)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid profiling spec: {spec!r}")
+
+
+def profiler_from_env() -> RequestProfiler:
+    profiler = RequestProfiler(
+        directory=os.getenv(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR),
+        mode=os.getenv(PROFILE_MODE_ENV, "cprofile"),
+    )
+    spec = os.getenv(PROFILE_ENV)
+    if spec:
+        profiler.arm(*parse_profile_spec(spec))
+    return profiler
+
+
+profiler = profiler_from_env()
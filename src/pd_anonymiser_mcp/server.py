@@ -1,11 +1,32 @@
 import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from dataclasses import asdict
+from typing import Callable, List, Optional, Tuple, TypeVar
 
 from fastmcp import FastMCP, Context
 from fastmcp.utilities.logging import get_logger
 from openai import OpenAI
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
-from pd_anonymiser.anonymiser import AnonymisationResult, anonymise_text
+from pd_anonymiser.anonymiser import (
+    AnonymisationResult,
+    anonymise_texts,
+    get_analyser,
+)
+from pd_anonymiser import metrics
 from pd_anonymiser import reidentifier as reid
+from pd_anonymiser.sessions import SessionSweeper, get_session_store
+from pd_anonymiser_mcp.profiling import profiler
+from pd_anonymiser_mcp.batching import (
+    DEFAULT_MAX_BATCH_CHARS,
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_WAIT,
+    MicroBatcher,
+)
 
 logger = get_logger(__name__)
 
@@ -15,13 +36,112 @@ reid_mcp_server = FastMCP(
 
 openai_tool = OpenAI(api_key="12345")
 
+# --- Blocking work ------------------------------------------------------------------
+# NER and session I/O run on a bounded pool of worker threads so that the event loop
+# keeps serving other sessions and health checks while a request is being analysed.
+WORKERS_ENV = "PD_ANONYMISER_MCP_WORKERS"
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def configure_workers(workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """(Re)create the worker pool.
+
+    ``workers`` defaults to PD_ANONYMISER_MCP_WORKERS, or DEFAULT_WORKERS.
+    """
+    global _executor
+    if workers is None:
+        workers = int(os.getenv(WORKERS_ENV, DEFAULT_WORKERS))
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="pd-anonymiser"
+    )
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking call on the worker pool without blocking the event loop."""
+    executor = _executor or configure_workers()
+    loop = asyncio.get_running_loop()
+    # Profiled on the worker thread, where the work happens
+    name = getattr(fn, "__name__", "request")
+    return await loop.run_in_executor(
+        executor, partial(profiler.call, name, fn, *args, **kwargs)
+    )
+
+
+def _anonymise_batch(
+    requests: List[Tuple[str, bool]], cascade: bool = False
+) -> List[AnonymisationResult]:
+    """Anonymise (text, allow_reidentification) requests, one model batch per flag.
+
+    Texts already in the result cache (PD_ANONYMISER_RESULT_CACHE) are not
+    analysed again; see ``analyse_texts``.
+    """
+    results: List[Optional[AnonymisationResult]] = [None] * len(requests)
+    for flag in (True, False):
+        indices = [i for i, (_, allow) in enumerate(requests) if allow is flag]
+        if indices:
+            texts = [requests[i][0] for i in indices]
+            for i, result in zip(
+                indices,
+                anonymise_texts(texts, allow_reidentification=flag, cascade=cascade),
+            ):
+                results[i] = result
+    return results
+
+
+async def _run_anonymise_batch(requests, cascade: bool = False):
+    return await run_blocking(_anonymise_batch, requests, cascade=cascade)
+
+
+# Concurrent anonymisation requests are collected for a few milliseconds and run
+# through the models as one batch.
+anonymisation_batcher = MicroBatcher(_run_anonymise_batch, size=lambda r: len(r[0]))
+
+
+def configure_batching(
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_wait: float = DEFAULT_MAX_WAIT,
+    max_batch_chars: int = DEFAULT_MAX_BATCH_CHARS,
+    cascade: bool = False,
+) -> MicroBatcher:
+    """Replace the anonymisation scheduler; max_batch_size=1 turns batching off.
+
+    With ``cascade``, the models only see the sentences the cheap stage flags.
+    """
+    global anonymisation_batcher
+    anonymisation_batcher = MicroBatcher(
+        partial(_run_anonymise_batch, cascade=cascade),
+        max_batch_size=max_batch_size,
+        max_wait=max_wait,
+        max_batch_chars=max_batch_chars,
+        size=lambda r: len(r[0]),
+    )
+    return anonymisation_batcher
+
+
+async def anonymise(
+    text: str, allow_reidentification: bool = False
+) -> AnonymisationResult:
+    return await anonymisation_batcher.submit((text, bool(allow_reidentification)))
+
+
 @reid_mcp_server.resource(
     name="anonymisation",
     description="Raw text → anonymised text + mapping",
     uri="mcp://pd-anonymiser/anonymisation?text={text}&allow_reidentification={allow_reidentification}",
 )
-def anonymisation_resource(text: str, allow_reidentification: bool = True) -> dict:
-    result: AnonymisationResult = anonymise_text(
+async def anonymisation_resource(
+    text: str, allow_reidentification: bool = True
+) -> dict:
+    result: AnonymisationResult = await anonymise(
         text, allow_reidentification=allow_reidentification
     )
 
@@ -37,13 +157,54 @@ def anonymisation_resource(text: str, allow_reidentification: bool = True) -> di
     description="Anonymised text + session info → real text",
     uri="mcp://pd-anonymiser/reidentification?text={text}&session_id={session_id}&key={key}",
 )
-def reidentification_resource(text: str, session_id: str, key: str) -> dict:
-    return {"reidentified_text": reid.reidentify_text(text, session_id, key)}
+async def reidentification_resource(text: str, session_id: str, key: str) -> dict:
+    return {
+        "reidentified_text": await run_blocking(
+            reid.reidentify_text, text, session_id, key
+        )
+    }
+
+
+@reid_mcp_server.resource(
+    name="batching-stats",
+    description="Queue depth and batch sizes of the anonymisation scheduler",
+    uri="mcp://pd-anonymiser/stats/batching",
+)
+def batching_stats_resource() -> dict:
+    stats = anonymisation_batcher.stats()
+    return {
+        **asdict(stats),
+        "batch_sizes": dict(stats.batch_sizes),
+        "mean_batch_size": stats.mean_batch_size,
+    }
+
+
+@reid_mcp_server.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Per-stage latency and size histograms in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@reid_mcp_server.custom_route("/profiling", methods=["GET", "POST"])
+async def profiling_endpoint(request: Request) -> JSONResponse:
+    """GET: profiler status. POST {"requests": N} or {"fraction": F}: arm it."""
+    if request.method == "POST":
+        try:
+            # Malformed JSON raises JSONDecodeError, a ValueError
+            body = await request.json()
+            profiler.arm(
+                requests=int(body.get("requests", 0)),
+                fraction=float(body.get("fraction", 0.0)),
+                mode=body.get("mode"),
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(profiler.status())
 
 
 @reid_mcp_server.tool("execute-prompt-with-anonymisation")
 async def redact_and_summarise(text: str, ctx: Context) -> dict:
-    anon: AnonymisationResult = anonymise_text(text)
+    anon: AnonymisationResult = await anonymise(text)
 
     llm_response = await ctx.sample(
         messages=[
@@ -76,6 +237,23 @@ def anonymise_prompt(text: str) -> list[dict]:
 
 # --- Run the server ---------------------------------------------------------------- ----------------------------------------------------------------
 def run_server_with_args(args):
+    # Build the shared analyser before accepting requests so the first caller
+    # does not pay for loading the models.
+    if args.metrics:
+        metrics.enable()
+    get_analyser(cascade=args.cascade)
+    configure_workers(args.workers)
+    configure_batching(
+        max_batch_size=args.batch_max_size,
+        max_wait=args.batch_max_wait_ms / 1000,
+        max_batch_chars=args.batch_max_chars,
+        cascade=args.cascade,
+    )
+
+    # With a session TTL configured, expired sessions are removed periodically.
+    if get_session_store().ttl is not None:
+        SessionSweeper(interval=args.sweep_interval).start()
+
     transport = args.transport
     if transport == "stdio":
         reid_mcp_server.run(transport="stdio")
@@ -126,6 +304,65 @@ def parse_args():
         metavar = "PATH"
    )
 
+    parser.add_argument(
+        "--sweep-interval",
+        type=float,
+        default=300.0,
+        help=(
+            "Seconds between sweeps of expired sessions "
+            "(needs PD_ANONYMISER_SESSION_TTL)"
+        ),
+        metavar="SECONDS"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "Worker threads for anonymisation and re-identification "
+            f"(default: ${WORKERS_ENV} or {DEFAULT_WORKERS})"
+        ),
+        metavar="N"
+    )
+
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help=(
+            "Record per-stage metrics, served at /metrics "
+            f"(also ${metrics.METRICS_ENV}=1)"
+        ),
+    )
+
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Run the models only on sentences the cheap NLP stage flags",
+    )
+
+    parser.add_argument(
+        "--batch-max-size",
+        type=int,
+        default=DEFAULT_MAX_BATCH_SIZE,
+        help="Most anonymisation requests run as one model batch (1 disables batching)",
+        metavar="N"
+    )
+    parser.add_argument(
+        "--batch-max-wait-ms",
+        type=float,
+        default=DEFAULT_MAX_WAIT * 1000,
+        help="How long the first request of a batch waits for others to join",
+        metavar="MS"
+    )
+    parser.add_argument(
+        "--batch-max-chars",
+        type=int,
+        default=DEFAULT_MAX_BATCH_CHARS,
+        help="Character budget of one batch",
+        metavar="CHARS"
+    )
+
     args = parser.parse_args()
     return args
 
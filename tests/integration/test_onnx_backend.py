@@ -0,0 +1,28 @@
+import pytest
+
+PASSAGES = [
+    "Theresa May met Boris Johnson at Downing Street in London.",
+    "Alice Smith works for Barclays in Leeds.",
+    "Green apples and lavender fields were mentioned during the gardening segment.",
+]
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_onnx_backend_matches_torch(quantize, tmp_path, monkeypatch):
+    pytest.importorskip("optimum.onnxruntime")
+    from pd_anonymiser.recognisers.huggingface import HuggingFaceRecogniser
+
+    monkeypatch.setenv("PD_ANONYMISER_ONNX_CACHE", str(tmp_path))
+    torch_recogniser = HuggingFaceRecogniser()
+    onnx_recogniser = HuggingFaceRecogniser(backend="onnx", quantize=quantize)
+    entities = torch_recogniser.supported_entities
+
+    for passage in PASSAGES:
+        expected = torch_recogniser.analyze(passage, entities)
+        actual = onnx_recogniser.analyze(passage, entities)
+        assert [(r.entity_type, r.start, r.end) for r in actual] == [
+            (r.entity_type, r.start, r.end) for r in expected
+        ]
+        tolerance = 0.05 if quantize else 1e-3
+        for a, e in zip(actual, expected):
+            assert a.score == pytest.approx(e.score, abs=tolerance)
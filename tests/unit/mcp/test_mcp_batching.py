@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from pd_anonymiser_mcp.batching import MicroBatcher
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(self.delay)
+        return [item.upper() for item in items]
+
+
+def submit_all(batcher, items, stagger=0.0):
+    async def one(i, item):
+        await asyncio.sleep(i * stagger)
+        return await batcher.submit(item)
+
+    async def run():
+        return await asyncio.gather(*(one(i, item) for i, item in enumerate(items)))
+
+    return asyncio.run(run())
+
+
+def test_concurrent_requests_share_a_batch():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait=0.05)
+
+    results = submit_all(batcher, ["a", "b", "c"])
+
+    assert results == ["A", "B", "C"]
+    assert run.batches == [["a", "b", "c"]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_batch_size=2, max_wait=0.05)
+
+    results = submit_all(batcher, list("abcde"))
+
+    assert results == list("ABCDE")
+    assert run.batches == [["a", "b"], ["c", "d"], ["e"]]
+    stats = batcher.stats()
+    assert stats.requests == 5 and stats.batches == 3
+    assert stats.batch_sizes == {2: 2, 1: 1}
+    assert stats.mean_batch_size == pytest.approx(5 / 3)
+
+
+def test_late_requests_start_a_new_batch():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait=0.01)
+
+    submit_all(batcher, ["a", "b"], stagger=0.1)
+
+    assert run.batches == [["a"], ["b"]]
+
+
+def test_character_budget_carries_over_to_next_batch():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait=0.05, max_batch_chars=6)
+
+    results = submit_all(batcher, ["aaa", "bbb", "cccc", "d"])
+
+    assert results == ["AAA", "BBB", "CCCC", "D"]
+    assert run.batches == [["aaa", "bbb"], ["cccc", "d"]]
+
+
+def test_oversized_request_runs_alone():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait=0.05, max_batch_chars=2)
+
+    submit_all(batcher, ["toolong", "x"])
+
+    assert run.batches == [["toolong"], ["x"]]
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    async def fail(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher(fail, max_wait=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+
+    assert [str(e) for e in errors] == ["model crashed", "model crashed"]
+
+
+def test_wrong_number_of_results_is_an_error():
+    async def short(items):
+        return items[:1]
+
+    batcher = MicroBatcher(short, max_wait=0.05)
+
+    with pytest.raises(RuntimeError, match="Batch of 2 returned 1 results"):
+        submit_all(batcher, ["a", "b"])
+
+
+def test_queue_depth_counts_waiting_requests():
+    run = Recorder(delay=0.05)
+    batcher = MicroBatcher(run, max_batch_size=1, max_wait=0)
+
+    async def run_all():
+        tasks = [asyncio.ensure_future(batcher.submit(c)) for c in "abc"]
+        await asyncio.sleep(0)
+        depth = batcher.stats().queue_depth
+        await asyncio.gather(*tasks)
+        return depth, batcher.stats().queue_depth
+
+    waiting, after = asyncio.run(run_all())
+
+    assert waiting == 3
+    assert after == 0
+
+
+def test_batcher_can_be_used_from_successive_event_loops():
+    run = Recorder()
+    batcher = MicroBatcher(run, max_wait=0.01)
+
+    assert submit_all(batcher, ["a"]) == ["A"]
+    assert submit_all(batcher, ["b"]) == ["B"]
+
+
+def test_max_batch_size_is_validated():
+    with pytest.raises(ValueError, match="at least 1"):
+        MicroBatcher(Recorder(), max_batch_size=0)
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastmcp import Client
+
+import pd_anonymiser_mcp.server as server
+from pd_anonymiser.anonymiser import AnonymisationResult
+
+CLIENTS = 8
+WORKERS = 4
+# Only reached if a test is broken: nothing waits this long when it passes
+TIMEOUT_S = 10
+
+
+class GatedAnonymiser:
+    """Stands in for NER: while ``gate`` is closed each batch blocks its
+    thread. Records the threads, peak concurrency and batch sizes."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.batches = []
+        self.threads = set()
+        self.options = {}
+        self.gate = threading.Event()
+        self.gate.set()
+        self._changed = threading.Condition()
+
+    def __call__(self, texts, allow_reidentification=False, **options):
+        with self._changed:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.batches.append(list(texts))
+            self.threads.add(threading.current_thread().name)
+            self.options = options
+            self._changed.notify_all()
+        try:
+            if not self.gate.wait(TIMEOUT_S):
+                raise TimeoutError("The gate was never opened")
+        finally:
+            with self._changed:
+                self.running -= 1
+        return [
+            AnonymisationResult(text=f"anon {text}", session_id="s", key="k")
+            for text in texts
+        ]
+
+    async def running_at_least(self, n: int) -> bool:
+        """Wait, off the event loop, until ``n`` batches are blocked at once."""
+
+        def wait():
+            with self._changed:
+                return self._changed.wait_for(lambda: self.running >= n, TIMEOUT_S)
+
+        return await asyncio.to_thread(wait)
+
+
+@pytest.fixture
+def gated_anonymiser(monkeypatch):
+    fake = GatedAnonymiser()
+    monkeypatch.setattr(server, "anonymise_texts", fake)
+    server.configure_workers(WORKERS)
+    server.configure_batching(max_batch_size=1)
+    yield fake
+    fake.gate.set()
+    server.configure_workers()
+    server.configure_batching()
+
+
+def read_anonymisation(client, i):
+    return client.read_resource(
+        f"mcp://pd-anonymiser/anonymisation?text=hello{i}"
+        "&allow_reidentification=true"
+    )
+
+
+def test_parallel_clients_share_the_worker_pool(gated_anonymiser):
+    gated_anonymiser.gate.clear()
+
+    async def call():
+        async with Client(server.reid_mcp_server) as client:
+            requests = [
+                asyncio.create_task(read_anonymisation(client, i))
+                for i in range(CLIENTS)
+            ]
+            # Every worker is busy at once...
+            assert await gated_anonymiser.running_at_least(WORKERS)
+            # ...and the event loop still serves other requests meanwhile
+            await client.read_resource("mcp://pd-anonymiser/stats/batching")
+            assert gated_anonymiser.running == WORKERS
+            gated_anonymiser.gate.set()
+            return await asyncio.gather(*requests)
+
+    results = asyncio.run(call())
+
+    assert len(results) == CLIENTS
+    assert gated_anonymiser.peak == WORKERS
+    assert len(gated_anonymiser.batches) == CLIENTS
+
+
+def test_tool_offloads_anonymisation(gated_anonymiser):
+    gated_anonymiser.gate.clear()
+
+    class FakeContext:
+        async def sample(self, messages, **kwargs):
+            return f"summary of {messages[-1]}"
+
+    async def call():
+        tool = asyncio.create_task(server.redact_and_summarise("Alice", FakeContext()))
+        # Anonymisation blocks a worker thread, not the event loop running this
+        assert await gated_anonymiser.running_at_least(1)
+        gated_anonymiser.gate.set()
+        return await tool
+
+    result = asyncio.run(call())
+
+    assert result == {
+        "llm_response_anonymised": "summary of anon Alice",
+        "session_id": "s",
+        "key": "k",
+    }
+    [thread] = gated_anonymiser.threads
+    assert thread.startswith("pd-anonymiser")
+
+
+def test_parallel_clients_are_micro_batched(gated_anonymiser):
+    gated_anonymiser.gate.clear()
+    # Full batches are dispatched at once, so the wait never runs out
+    server.configure_batching(max_batch_size=4, max_wait=TIMEOUT_S)
+
+    async def call():
+        async with Client(server.reid_mcp_server) as client:
+            requests = [
+                asyncio.create_task(read_anonymisation(client, i))
+                for i in range(CLIENTS)
+            ]
+            # Both batches run side by side on the worker pool
+            assert await gated_anonymiser.running_at_least(2)
+            gated_anonymiser.gate.set()
+            await asyncio.gather(*requests)
+
+    asyncio.run(call())
+
+    stats = server.anonymisation_batcher.stats()
+    assert sorted(map(len, gated_anonymiser.batches)) == [4, 4]
+    assert stats.requests == CLIENTS and stats.batch_sizes == {4: 2}
+    assert stats.queue_depth == 0
+
+
+def test_batches_are_split_by_reidentification_flag(gated_anonymiser):
+    server.configure_batching(max_wait=0.05)
+
+    async def call():
+        return await asyncio.gather(
+            server.anonymise("a", allow_reidentification=True),
+            server.anonymise("b"),
+            server.anonymise("c", allow_reidentification=True),
+        )
+
+    results = asyncio.run(call())
+
+    assert [r.text for r in results] == ["anon a", "anon b", "anon c"]
+    assert gated_anonymiser.batches == [["a", "c"], ["b"]]
+
+
+def test_cascade_reaches_the_batch(gated_anonymiser):
+    server.configure_batching(cascade=True)
+
+    asyncio.run(server.anonymise("a"))
+
+    assert gated_anonymiser.options == {"cascade": True}
+
+
+def test_batching_stats_resource(gated_anonymiser):
+    async def call():
+        async with Client(server.reid_mcp_server) as client:
+            await client.read_resource(
+                "mcp://pd-anonymiser/anonymisation?text=hi&allow_reidentification=true"
+            )
+            return await client.read_resource("mcp://pd-anonymiser/stats/batching")
+
+    [contents] = asyncio.run(call())
+    stats = json.loads(contents.text)
+    assert stats["requests"] == 1
+    assert stats["batch_sizes"] == {"1": 1}
+    assert stats["mean_batch_size"] == 1.0
+
+
+def test_configure_workers_validates():
+    with pytest.raises(ValueError, match="at least 1"):
+        server.configure_workers(0)
@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import pd_anonymiser_mcp.cost_estimation_server as cost_server
+import pd_anonymiser_mcp.server as server
+from pd_anonymiser import metrics
+
+
+@pytest.fixture(autouse=True)
+def enabled_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.enable(False)
+    metrics.reset()
+
+
+def test_mcp_server_serves_prometheus_metrics():
+    with metrics.timed("anonymise_text"):
+        pass
+
+    client = TestClient(server.reid_mcp_server.http_app())
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'pd_anonymiser_stage_seconds_count{stage="anonymise_text"} 1' in response.text
+    )
+
+
+def test_cost_estimation_server_serves_prometheus_metrics(monkeypatch):
+    monkeypatch.setattr(cost_server, "count_tokens", lambda prompt, model: 1)
+    client = TestClient(cost_server.app)
+    client.post(
+        "/cost-estimation/open-ai",
+        json={"prompt": "Hello", "model": "gpt-4o", "max_completion_tokens": 10},
+    )
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert (
+        'pd_anonymiser_stage_seconds_count{stage="cost_estimation"} 1' in response.text
+    )
+    assert 'pd_anonymiser_text_chars_sum{stage="cost_estimation"} 5' in response.text
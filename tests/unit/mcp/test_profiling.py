@@ -0,0 +1,170 @@
+import asyncio
+import pstats
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import pd_anonymiser_mcp.cost_estimation_server as cost_server
+import pd_anonymiser_mcp.server as server
+from pd_anonymiser_mcp import profiling
+from pd_anonymiser_mcp.profiling import RequestProfiler, parse_profile_spec
+
+
+def busy(seconds=0.05):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+@pytest.fixture
+def shared_profiler(tmp_path, monkeypatch):
+    profiler = RequestProfiler(directory=tmp_path)
+    monkeypatch.setattr(server, "profiler", profiler)
+    monkeypatch.setattr(cost_server, "profiler", profiler)
+    return profiler
+
+
+def test_unarmed_profiler_profiles_nothing(tmp_path):
+    profiler = RequestProfiler(directory=tmp_path)
+
+    assert profiler.call("busy", busy, 0) == "done"
+
+    assert profiler.status()["profiled"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiles_the_next_n_requests(tmp_path):
+    profiler = RequestProfiler(directory=tmp_path)
+    profiler.arm(requests=2)
+
+    for _ in range(3):
+        profiler.call("busy", busy)
+
+    status = profiler.status()
+    assert status["remaining"] == 0
+    assert status["profiled"] == 2
+    assert len(status["files"]) == 2
+    stats = pstats.Stats(status["files"][0])
+    assert any(name == "busy" for _, _, name in stats.stats)
+
+
+def test_profiles_a_fraction_of_requests(tmp_path):
+    draws = iter([0.5, 0.05, 0.9, 0.01])
+    profiler = RequestProfiler(directory=tmp_path, chance=lambda: next(draws))
+    profiler.arm(fraction=0.1)
+
+    for _ in range(4):
+        profiler.call("busy", busy, 0)
+
+    assert profiler.status()["profiled"] == 2
+
+
+def test_sampling_mode_writes_collapsed_stacks(tmp_path):
+    profiler = RequestProfiler(directory=tmp_path, mode="sample", sample_interval=0.001)
+    profiler.arm(requests=1)
+
+    profiler.call("busy", busy, 0.2)
+
+    [path] = profiler.status()["files"]
+    assert path.endswith(".collapsed")
+    lines = open(path).read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "busy (test_profiling.py:" in stack.split(";")[-1]
+
+
+def test_only_one_request_is_profiled_at_a_time(tmp_path):
+    profiler = RequestProfiler(directory=tmp_path)
+    profiler.arm(requests=2)
+
+    with profiler.profile("outer"):
+        with profiler.profile("inner"):
+            pass
+
+    assert profiler.status()["profiled"] == 1
+    assert profiler.status()["remaining"] == 1
+
+
+def test_arm_validates_arguments(tmp_path):
+    profiler = RequestProfiler(directory=tmp_path)
+
+    with pytest.raises(ValueError):
+        profiler.arm(requests=-1)
+    with pytest.raises(ValueError):
+        profiler.arm(fraction=1.5)
+    with pytest.raises(ValueError, match="Unknown profiling mode"):
+        profiler.arm(requests=1, mode="perf")
+
+
+@pytest.mark.parametrize(
+    "spec, expected", [("next:20", (20, 0.0)), ("fraction:0.01", (0, 0.01))]
+)
+def test_parse_profile_spec(spec, expected):
+    assert parse_profile_spec(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["20", "next:", "fraction:often", "every:2"])
+def test_parse_profile_spec_rejects_invalid(spec):
+    with pytest.raises(ValueError, match="Invalid profiling spec"):
+        parse_profile_spec(spec)
+
+
+def test_profiler_is_armed_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiling.PROFILE_ENV, "next:3")
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+    monkeypatch.setenv(profiling.PROFILE_MODE_ENV, "sample")
+
+    status = profiling.profiler_from_env().status()
+
+    assert status["remaining"] == 3
+    assert status["mode"] == "sample"
+    assert status["directory"] == str(tmp_path)
+
+
+def test_mcp_server_profiles_worker_calls(shared_profiler):
+    client = TestClient(server.reid_mcp_server.http_app())
+
+    response = client.post("/profiling", json={"requests": 1})
+    assert response.json()["remaining"] == 1
+    assert client.post("/profiling", json={"fraction": 2}).status_code == 400
+
+    asyncio.run(server.run_blocking(busy))
+
+    status = client.get("/profiling").json()
+    assert status["profiled"] == 1
+    assert "-busy-1.pstats" in status["files"][0]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"{not json", b"[1, 2]", b'"next"', b'{"requests": null}', b'{"requests": "x"}'],
+)
+def test_mcp_server_rejects_malformed_profiling_requests(shared_profiler, body):
+    client = TestClient(server.reid_mcp_server.http_app())
+
+    response = client.post(
+        "/profiling", content=body, headers={"content-type": "application/json"}
+    )
+
+    assert response.status_code == 400
+    assert "error" in response.json()
+    assert not shared_profiler.armed
+
+
+def test_cost_estimation_server_profiles_requests(shared_profiler, monkeypatch):
+    monkeypatch.setattr(cost_server, "count_tokens", lambda prompt, model: 1)
+    client = TestClient(cost_server.app)
+
+    assert client.post("/profiling", json={"requests": 1}).json()["remaining"] == 1
+    client.post(
+        "/cost-estimation/open-ai",
+        json={"prompt": "Hello", "model": "gpt-4o", "max_completion_tokens": 10},
+    )
+
+    status = client.get("/profiling").json()
+    assert status["profiled"] == 1
+    assert "-cost_estimation-1.pstats" in status["files"][0]
+    assert client.post("/profiling", json={"mode": "perf"}).status_code == 400
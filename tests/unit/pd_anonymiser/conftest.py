@@ -0,0 +1,54 @@
+import re
+
+import pytest
+from presidio_analyzer import RecognizerResult
+
+from pd_anonymiser.anonymiser import clear_engines
+from pd_anonymiser.reidentifier import session_cache
+from pd_anonymiser.sessions import FileSessionStore, set_session_store
+
+NAMES = re.compile(r"Alice Smith|Bob Jones|Leeds")
+
+
+class FakeAnalyser:
+    """Stands in for ``analyse_texts``: finds fixed names and records every
+    batch it is asked to analyse."""
+
+    def __init__(self):
+        self.batches = []
+
+    @property
+    def analysed(self):
+        return [text for batch in self.batches for text in batch]
+
+    def __call__(self, texts, language="en", model="all", batch_size=32):
+        self.batches.append(list(texts))
+        return [
+            [
+                RecognizerResult(
+                    "LOCATION" if m.group() == "Leeds" else "PERSON",
+                    m.start(),
+                    m.end(),
+                    0.9,
+                )
+                for m in NAMES.finditer(text)
+            ]
+            for text in texts
+        ]
+
+
+@pytest.fixture
+def fake_analyser():
+    return FakeAnalyser()
+
+
+@pytest.fixture
+def session_store(tmp_path):
+    """Sessions in a temporary directory, with empty caches around the test."""
+    set_session_store(FileSessionStore(tmp_path))
+    session_cache.clear()
+    clear_engines()
+    yield
+    set_session_store(None)
+    session_cache.clear()
+    clear_engines()
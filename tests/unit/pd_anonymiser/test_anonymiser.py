@@ -1,21 +1,37 @@
 import base64
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from unittest.mock import patch, MagicMock
 
 from pd_anonymiser.anonymiser import (
     anonymise_text,
+    anonymise_texts,
+    analyse_lines,
+    clear_engines,
+    get_analyser,
+    _anonymise_shared,
     _generate_pseudonyms,
     _attach_replacements,
     _apply_manual_replacements,
     AnonymisationResult,
 )
 from presidio_analyzer import RecognizerResult
+from presidio_anonymizer import OperatorConfig
 
 
 SAMPLE_TEXT = "Alice Smith emailed bob@example.com from Acme Corp in London."
 
 
+@pytest.fixture(autouse=True)
+def fresh_engines():
+    clear_engines()
+    yield
+    clear_engines()
+
+
 @patch("pd_anonymiser.anonymiser.AnalyzerEngine")
 @patch("pd_anonymiser.anonymiser.save_encrypted_json")
 def test_anonymise_text_basic(mock_save, mock_analyzer):
@@ -83,3 +99,329 @@ def test_apply_manual_replacements_order():
 
     result = _apply_manual_replacements("Alice Smith", [r1, r2])
     assert result == "X Y"
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+@patch("pd_anonymiser.anonymiser.save_encrypted_json")
+def test_anonymise_text_reuses_analyser(mock_save, mock_analyzer):
+    mock_analyzer.return_value.analyze.return_value = []
+
+    with patch("pd_anonymiser.anonymiser.model_registry.register_models") as mock_reg:
+        anonymise_text(SAMPLE_TEXT, model="hf")
+        anonymise_text(SAMPLE_TEXT, model="hf")
+
+    assert mock_analyzer.call_count == 1
+    assert mock_reg.call_count == 1
+    assert mock_analyzer.return_value.analyze.call_count == 2
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+def test_get_analyser_keyed_by_language_and_model(mock_analyzer):
+    mock_analyzer.side_effect = lambda **kwargs: MagicMock()
+
+    with patch("pd_anonymiser.anonymiser.model_registry.register_models"):
+        first = get_analyser("en", "all")
+        again = get_analyser("en", "all")
+        other = get_analyser("en", "dslim/bert-base-NER")
+
+    assert first is again
+    assert first is not other
+    # The second engine shares the first one's NLP engine
+    assert mock_analyzer.call_args_list[1].kwargs["nlp_engine"] is first.nlp_engine
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+def test_get_analyser_builds_once_across_threads(mock_analyzer):
+    with patch("pd_anonymiser.anonymiser.model_registry.register_models"):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            engines = list(pool.map(lambda _: get_analyser("en", "all"), range(32)))
+
+    assert mock_analyzer.call_count == 1
+    assert all(e is engines[0] for e in engines)
+
+
+def _fake_base_engine(mock_analyzer):
+    base = mock_analyzer.return_value
+    base.nlp_engine.process_batch.side_effect = lambda texts, language, batch_size: (
+        (t, None) for t in texts
+    )
+    base.analyze.side_effect = (
+        lambda text, language, nlp_artifacts, ad_hoc_recognizers: [
+            r
+            for recogniser in ad_hoc_recognizers
+            for r in recogniser.analyze(text, recogniser.supported_entities)
+        ]
+    )
+    return base
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+@patch("pd_anonymiser.anonymiser.save_encrypted_jsons")
+def test_anonymise_texts_runs_recognisers_once_per_batch(mock_save, mock_analyzer):
+    base = _fake_base_engine(mock_analyzer)
+    recogniser = MagicMock()
+    recogniser.name = "fake"
+    recogniser.supported_entities = ["PERSON"]
+    recogniser.analyze_batch.return_value = [
+        [RecognizerResult("PERSON", 0, 5, 0.9)],
+        [],
+    ]
+
+    with patch(
+        "pd_anonymiser.anonymiser.model_registry.resolve_models",
+        return_value=["fake"],
+    ), patch(
+        "pd_anonymiser.anonymiser.model_registry.get_recogniser",
+        return_value=recogniser,
+    ):
+        results = anonymise_texts(
+            ["Alice went home.", "Nothing to see."],
+            model="fake",
+            allow_reidentification=True,
+            batch_size=8,
+        )
+
+    recogniser.analyze_batch.assert_called_once_with(
+        ["Alice went home.", "Nothing to see."], ["PERSON"], batch_size=8
+    )
+    recogniser.analyze.assert_not_called()
+    base.nlp_engine.process_batch.assert_called_once()
+    assert results[0].text == "Person A went home."
+    assert results[0].session_id is not None
+    # One batched write for the whole batch
+    mock_save.assert_called_once()
+    [(pseudonyms, session_id, _)] = mock_save.call_args.args[0]
+    assert pseudonyms == {("PERSON", "Alice"): "Person A"}
+    assert session_id == results[0].session_id
+    assert results[1] == AnonymisationResult("Nothing to see.", None, None)
+
+
+def test_anonymise_texts_empty():
+    assert anonymise_texts([]) == []
+
+
+@patch("pd_anonymiser.anonymiser.save_encrypted_jsons")
+def test_anonymise_texts_without_sessions_saves_nothing(mock_save):
+    with patch(
+        "pd_anonymiser.anonymiser.analyse_texts",
+        return_value=[[RecognizerResult("PERSON", 0, 5, 0.9)]],
+    ):
+        results = anonymise_texts(
+            ["Alice went home."], allow_reidentification=True, save_sessions=False
+        )
+
+    assert results == [AnonymisationResult("Person A went home.", None, None)]
+    mock_save.assert_not_called()
+
+
+def test_generate_pseudonyms_extends_existing_map():
+    existing = {("PERSON", "Alice"): "Person A"}
+    results = [
+        RecognizerResult("PERSON", 0, 5, 0.9),
+        RecognizerResult("PERSON", 6, 9, 0.9),
+    ]
+
+    pseudonyms = _generate_pseudonyms(results, "Alice Bob", True, existing)
+
+    assert pseudonyms is existing
+    assert pseudonyms[("PERSON", "Bob")] == "Person B"
+
+
+def test_reusable_tags_continue_past_z():
+    names = [f"name{i}" for i in range(28)]
+    text = " ".join(names)
+    results, start = [], 0
+    for name in names:
+        results.append(RecognizerResult("PERSON", start, start + len(name), 0.9))
+        start += len(name) + 1
+
+    pseudonyms = _generate_pseudonyms(results, text, use_reusable=True)
+
+    assert pseudonyms[("PERSON", "name25")] == "Person Z"
+    assert pseudonyms[("PERSON", "name26")] == "Person AA"
+    assert pseudonyms[("PERSON", "name27")] == "Person AB"
+
+
+def _with_replacement(result, value):
+    result.operator = OperatorConfig("replace", {"new_value": value})
+    return result
+
+
+def test_apply_manual_replacements_skips_overlaps():
+    text = "Alice Smith met Bob"
+    results = [
+        _with_replacement(RecognizerResult("PERSON", 6, 11, 0.5), "Person C"),
+        _with_replacement(RecognizerResult("PERSON", 0, 11, 0.9), "Person A"),
+        _with_replacement(RecognizerResult("PERSON", 0, 5, 0.7), "Person D"),
+        _with_replacement(RecognizerResult("PERSON", 16, 19, 0.9), "Person B"),
+    ]
+
+    assert _apply_manual_replacements(text, results) == "Person A met Person B"
+
+
+def test_apply_manual_replacements_adjacent_spans():
+    results = [
+        _with_replacement(RecognizerResult("PERSON", 0, 3, 0.9), "X"),
+        _with_replacement(RecognizerResult("PERSON", 3, 6, 0.9), "Y"),
+    ]
+    assert _apply_manual_replacements("AbcDef!", results) == "XY!"
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+@patch("pd_anonymiser.anonymiser.save_encrypted_json")
+def test_anonymise_text_merges_overlapping_results(mock_save, mock_analyzer):
+    mock_analyzer.return_value.analyze.return_value = [
+        RecognizerResult("PERSON", 0, 11, 0.85),  # spaCy: "Alice Smith"
+        RecognizerResult("PERSON", 0, 5, 0.99),  # BERT: "Alice"
+        RecognizerResult("PERSON", 6, 11, 0.98),  # BERT: "Smith"
+        RecognizerResult("ORGANIZATION", 41, 50, 0.9),
+        RecognizerResult("LOCATION", 41, 45, 0.6),
+    ]
+
+    with patch("pd_anonymiser.anonymiser.model_registry.register_models"):
+        result = anonymise_text(SAMPLE_TEXT, allow_reidentification=True)
+
+    assert result.text == "Person A emailed bob@example.com from Company A in London."
+    pseudonyms = mock_save.call_args[0][0]
+    assert pseudonyms == {
+        ("PERSON", "Alice Smith"): "Person A",
+        ("ORGANIZATION", "Acme Corp"): "Company A",
+    }
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+def test_anonymise_text_cascade_uses_its_own_engine(mock_analyzer):
+    mock_analyzer.side_effect = lambda **kwargs: MagicMock(
+        analyze=MagicMock(return_value=[])
+    )
+
+    with patch("pd_anonymiser.anonymiser.model_registry.register_models") as mock_reg:
+        anonymise_text("Nothing here.", cascade=True)
+        anonymise_text("Nothing here.")
+
+    assert get_analyser(cascade=True) is not get_analyser()
+    assert [c.kwargs for c in mock_reg.call_args_list] == [
+        {"cascade": True},
+        {"cascade": False},
+    ]
+
+
+def _name_recogniser():
+    """Tags capitalised words as people, one line at a time."""
+    recogniser = MagicMock()
+    recogniser.name = "names"
+    recogniser.supported_entities = ["PERSON"]
+    recogniser.analyze_batch.side_effect = lambda texts, entities, batch_size: [
+        [
+            RecognizerResult("PERSON", m.start(), m.end(), 0.9)
+            for m in re.finditer(r"\b[A-Z][a-z]+\b", text)
+        ]
+        for text in texts
+    ]
+    return recogniser
+
+
+FOOTER = "Regards,\nCarol Jones\n\nThis email is confidential. Contact Dave.\n"
+BATCH = [
+    "Hi Alice,\nBob says hello.\n" + FOOTER,
+    "Hi Bob,\r\nAlice says hello.\r\n" + FOOTER,
+    FOOTER + "\n> Hi Alice,\n> Bob says hello.\n",
+    "   \n",
+]
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+def test_analyse_lines_dedupes_repeated_lines(mock_analyzer):
+    _fake_base_engine(mock_analyzer)
+    recogniser = _name_recogniser()
+
+    with patch(
+        "pd_anonymiser.anonymiser.model_registry.resolve_models",
+        return_value=["names"],
+    ), patch(
+        "pd_anonymiser.anonymiser.model_registry.get_recogniser",
+        return_value=recogniser,
+    ):
+        deduped = analyse_lines(BATCH, model="names")
+        analysed = recogniser.analyze_batch.call_args.args[0]
+        every_line = analyse_lines(BATCH, model="names", dedupe=False)
+
+    assert len(analysed) == len(set(analysed)) == 9
+    assert len(recogniser.analyze_batch.call_args.args[0]) == 15
+    assert [[(r.entity_type, r.start, r.end) for r in rs] for rs in deduped] == [
+        [(r.entity_type, r.start, r.end) for r in rs] for rs in every_line
+    ]
+    # Copies, not shared objects, since results are mutated downstream
+    assert deduped[0][-1] is not deduped[1][-1]
+    assert [BATCH[2][r.start : r.end] for r in deduped[2]][:2] == ["Regards", "Carol"]
+    assert deduped[3] == []
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+@patch("pd_anonymiser.anonymiser.save_encrypted_jsons")
+def test_anonymise_texts_dedupe_matches_line_by_line_output(mock_save, mock_analyzer):
+    _fake_base_engine(mock_analyzer)
+
+    def run(**kwargs):
+        with patch(
+            "pd_anonymiser.anonymiser.model_registry.resolve_models",
+            return_value=["names"],
+        ), patch(
+            "pd_anonymiser.anonymiser.model_registry.get_recogniser",
+            return_value=_name_recogniser(),
+        ):
+            results = anonymise_texts(
+                BATCH, model="names", allow_reidentification=True, **kwargs
+            )
+        maps = [pseudonyms for pseudonyms, _, _ in mock_save.call_args.args[0]]
+        return [r.text for r in results], maps
+
+    with_dedupe = run(dedupe=True)
+    with patch(
+        "pd_anonymiser.anonymiser.analyse_lines",
+        side_effect=lambda *args, **kwargs: analyse_lines(
+            *args, **kwargs, dedupe=False
+        ),
+    ):
+        without_dedupe = run(dedupe=True)
+
+    assert with_dedupe == without_dedupe
+    # The recogniser is line-local, so whole-text analysis agrees too
+    assert run() == with_dedupe
+    texts, maps = with_dedupe
+    assert texts[0].startswith("Person A Person B,\nPerson C says")
+    assert maps[0][("PERSON", "Carol")] == "Person E"
+
+
+def test_generate_pseudonyms_updates_the_counters_passed_in():
+    pseudonyms, counters = {}, Counter()
+
+    _generate_pseudonyms(
+        [RecognizerResult("PERSON", 0, 5, 0.9)], "Alice", True, pseudonyms, counters
+    )
+    _generate_pseudonyms(
+        [
+            RecognizerResult("PERSON", 0, 3, 0.9),
+            RecognizerResult("LOCATION", 4, 9, 0.9),
+        ],
+        "Bob Leeds",
+        True,
+        pseudonyms,
+        counters,
+    )
+
+    assert counters == Counter({"PERSON": 2, "LOCATION": 1})
+    assert pseudonyms[("PERSON", "Bob")] == "Person B"
+    assert pseudonyms[("LOCATION", "Leeds")] == "Location A"
+
+
+def test_anonymise_shared_continues_the_lettering_across_texts():
+    texts = [f"name{i}" for i in range(30)]
+    analyses = [[RecognizerResult("PERSON", 0, len(text), 0.9)] for text in texts]
+
+    replacements, pseudonyms = _anonymise_shared(texts, analyses, True, True)
+
+    assert len(pseudonyms) == 30
+    assert replacements["name0"] == "Person A"
+    assert replacements["name26"] == "Person AA"
+    assert replacements["name29"] == "Person AD"
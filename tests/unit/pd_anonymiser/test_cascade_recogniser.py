@@ -0,0 +1,113 @@
+from unittest.mock import MagicMock
+
+import pytest
+import spacy
+from presidio_analyzer import RecognizerResult
+from presidio_analyzer.nlp_engine import NlpArtifacts
+from spacy.tokens import Span
+
+from pd_anonymiser.recognisers.cascade import CascadeRecogniser, _segments
+
+LOG = "\n".join(f"2024-05-0{n} 12:00:0{n} job {n} finished in {n}ms." for n in range(9))
+
+
+def artifacts(text, ents):
+    """NLP artifacts with the given (start_char, end_char, label, score) entities."""
+    doc = spacy.blank("en")(text)
+    spans = [doc.char_span(s, e, label=label) for s, e, label, _ in ents]
+    doc.ents = spans
+    return NlpArtifacts(
+        entities=list(doc.ents),
+        tokens=doc,
+        tokens_indices=[t.idx for t in doc],
+        lemmas=[],
+        nlp_engine=None,
+        language="en",
+        scores=[score for *_, score in ents],
+    )
+
+
+@pytest.fixture
+def model():
+    """A batch recogniser tagging capitalised words as people."""
+    recogniser = MagicMock()
+    recogniser.supported_entities = ["PERSON", "LOCATION"]
+    recogniser.analyze_batch.side_effect = lambda texts, entities: [
+        [
+            RecognizerResult("PERSON", i, i + len(word), 0.99)
+            for i, word in ((text.index(w), w) for w in text.split() if w[0].isupper())
+        ]
+        for text in texts
+    ]
+    return recogniser
+
+
+def test_clean_text_is_not_escalated(model):
+    cascade = CascadeRecogniser([model])
+    assert cascade.analyze(LOG, ["PERSON"], artifacts(LOG, [])) == []
+
+    model.analyze_batch.assert_not_called()
+    assert cascade.stats() == {"texts": 1, "segments": 9, "escalated": 0}
+
+
+def test_only_flagged_sentences_are_escalated(model):
+    text = "The build passed. Yesterday we met with Alice in the lab. All done.\nok"
+    cascade = CascadeRecogniser([model])
+    results = cascade.analyze(text, ["PERSON"], artifacts(text, []))
+
+    model.analyze_batch.assert_called_once_with(
+        ["Yesterday we met with Alice in the lab."], ["PERSON"]
+    )
+    assert [text[r.start : r.end] for r in results] == ["Yesterday", "Alice"]
+    assert cascade.stats()["escalated"] == 1
+
+
+def test_low_confidence_cheap_entities_are_escalated(model):
+    text = "Alice went home. Bob stayed. Carol left."
+    ents = [(0, 5, "PERSON", 0.85), (17, 20, "PERSON", 0.95)]
+    cascade = CascadeRecogniser([model], threshold=0.9)
+    results = cascade.analyze(text, ["PERSON"], artifacts(text, ents))
+
+    # "Bob" is confident enough, "Carol" was not flagged at all
+    model.analyze_batch.assert_called_once_with(["Alice went home."], ["PERSON"])
+    assert [text[r.start : r.end] for r in results] == ["Alice"]
+
+
+def test_confident_cheap_entities_are_not_escalated_by_default(model):
+    # Presidio scores every spaCy entity 0.85
+    text = "Yesterday we met with Alice Smith in Leeds."
+    ents = [(22, 33, "PERSON", 0.85), (37, 42, "GPE", 0.85)]
+    cascade = CascadeRecogniser([model])
+
+    assert cascade.analyze(text, ["PERSON"], artifacts(text, ents)) == []
+    model.analyze_batch.assert_not_called()
+
+
+def test_capitalised_words_outside_cheap_entities_are_escalated(model):
+    text = "Yesterday we met with Alice Smith and Bob."
+    ents = [(22, 33, "PERSON", 0.85)]
+    cascade = CascadeRecogniser([model])
+    cascade.analyze(text, ["PERSON"], artifacts(text, ents))
+
+    model.analyze_batch.assert_called_once_with([text], ["PERSON"])
+
+
+def test_recognisers_without_wanted_entities_are_skipped(model):
+    other = MagicMock(supported_entities=["DATE_TIME"])
+    cascade = CascadeRecogniser([model, other])
+    text = "We met with Alice."
+    cascade.analyze(text, ["PERSON"], artifacts(text, []))
+
+    other.analyze_batch.assert_not_called()
+    assert cascade.supported_entities == ["DATE_TIME", "LOCATION", "PERSON"]
+
+
+def test_segments_split_sentences_and_lines():
+    text = "  First one. Second!\n\nThird line\n  e.g. 3.5 stays  "
+    assert [text[s:e] for s, e in _segments(text)] == [
+        "First one.",
+        "Second!",
+        "Third line",
+        "e.g.",
+        "3.5 stays",
+    ]
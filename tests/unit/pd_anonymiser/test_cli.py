@@ -0,0 +1,368 @@
+import csv
+import json
+
+import pytest
+
+from pd_anonymiser import cli
+from pd_anonymiser.cli import Checkpoint, anonymise_file, main
+from pd_anonymiser.reidentifier import reidentify_text
+
+from .conftest import FakeAnalyser
+
+pytestmark = pytest.mark.usefixtures("session_store")
+
+
+class CrashingAnalyser(FakeAnalyser):
+    """Fails on the batch numbered ``fail_on``, as if the job were killed."""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+
+    def __call__(self, texts, **options):
+        if len(self.batches) + 1 == self.fail_on:
+            raise RuntimeError("killed")
+        return super().__call__(texts, **options)
+
+
+@pytest.fixture
+def analyser(monkeypatch, fake_analyser):
+    monkeypatch.setattr(cli, "analyse_texts", fake_analyser)
+    return fake_analyser
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerows(rows)
+
+
+def read_csv(path):
+    with open(path, newline="") as f_in:
+        return list(csv.reader(f_in))
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def session_files(tmp_path):
+    return list(tmp_path.glob("*.enc"))
+
+
+def test_csv_fields_are_anonymised(tmp_path, analyser):
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_csv(
+        src,
+        [
+            ["id", "name", "notes"],
+            ["1", "Alice Smith", "Met Bob Jones,\nthen left"],
+            ["2", "Bob Jones", ""],
+        ],
+    )
+
+    count = anonymise_file(src, dst, fields=["name", "notes"], records_per_batch=1)
+
+    assert count == 2
+    assert read_csv(dst) == [
+        ["id", "name", "notes"],
+        ["1", "<PERSON>", "Met <PERSON>,\nthen left"],
+        ["2", "<PERSON>", ""],
+    ]
+    assert not (tmp_path / "out.csv.checkpoint").exists()
+
+
+def test_no_sessions_are_saved_without_reidentification(tmp_path, analyser):
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_csv(src, [["name"], ["Alice Smith"], ["Bob Jones"]])
+
+    main([str(src), "-o", str(dst), "--fields", "name"])
+
+    assert read_csv(dst) == [["name"], ["<PERSON>"], ["<PERSON>"]]
+    assert session_files(tmp_path) == []
+    assert not (tmp_path / "out.csv.keys.jsonl").exists()
+
+
+def test_jsonl_string_fields_are_anonymised(tmp_path, analyser):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(
+        src, [{"id": 1, "name": "Alice Smith", "tags": ["Bob Jones"]}, {"name": None}]
+    )
+
+    anonymise_file(src, dst)
+
+    assert read_jsonl(dst) == [
+        {"id": 1, "name": "<PERSON>", "tags": ["<PERSON>"]},
+        {"name": None},
+    ]
+    assert analyser.batches == [["Alice Smith", "Bob Jones"]]
+
+
+def test_nested_jsonl_values_are_anonymised_by_default(tmp_path, analyser):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(
+        src,
+        [
+            {
+                "id": 7,
+                "customer": {"name": "Alice Smith", "address": {"city": "Leeds"}},
+                "orders": [{"note": "For Bob Jones", "total": 3}],
+            }
+        ],
+    )
+
+    anonymise_file(src, dst)
+
+    assert read_jsonl(dst) == [
+        {
+            "id": 7,
+            "customer": {"name": "<PERSON>", "address": {"city": "<LOCATION>"}},
+            "orders": [{"note": "For <PERSON>", "total": 3}],
+        }
+    ]
+
+
+def test_jsonl_fields_are_dotted_paths(tmp_path, analyser):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(
+        src,
+        [
+            {
+                "customer": {"name": "Alice Smith", "city": "Leeds"},
+                "orders": [{"note": "For Bob Jones", "by": "Bob Jones"}],
+            }
+        ],
+    )
+
+    main([str(src), "-o", str(dst), "--fields", "customer.name,orders.*.note"])
+
+    assert read_jsonl(dst) == [
+        {
+            "customer": {"name": "<PERSON>", "city": "Leeds"},
+            "orders": [{"note": "For <PERSON>", "by": "Bob Jones"}],
+        }
+    ]
+
+
+def test_csv_fields_are_column_names_even_with_dots(tmp_path, analyser):
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_csv(src, [["customer.name", "city"], ["Alice Smith", "Leeds"]])
+
+    anonymise_file(src, dst, fields=["customer.name"])
+
+    assert read_csv(dst) == [["customer.name", "city"], ["<PERSON>", "Leeds"]]
+
+
+def test_distinct_values_of_a_batch_are_analysed_together(tmp_path, analyser):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(src, [{"a": f"Alice Smith {i}", "b": "Bob Jones"} for i in range(10)])
+
+    anonymise_file(src, dst, records_per_batch=4)
+
+    assert [len(batch) for batch in analyser.batches] == [5, 5, 3]
+
+
+def test_batch_shares_one_session_in_the_keys_file(tmp_path, analyser):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    records = [
+        {"name": "Alice Smith", "note": "Knows Bob Jones"},
+        {"name": "Bob Jones", "city": "Leeds"},
+        {"name": "nobody"},
+    ]
+    write_jsonl(src, records)
+
+    anonymise_file(src, dst, allow_reidentification=True, records_per_batch=2)
+
+    assert read_jsonl(dst) == [
+        {"name": "Person A", "note": "Knows Person B"},
+        {"name": "Person B", "city": "Location A"},
+        {"name": "nobody"},
+    ]
+    keys = read_jsonl(tmp_path / "out.jsonl.keys.jsonl")
+    assert [(k["first_record"], k["last_record"]) for k in keys] == [(0, 1)]
+    assert len(session_files(tmp_path)) == 1
+    session_id, key = keys[0]["session_id"], keys[0]["key"]
+    assert reidentify_text("Knows Person B", session_id, key) == "Knows Bob Jones"
+
+
+@pytest.mark.parametrize("max_pending", [1, 3])
+def test_killed_job_resumes_from_last_checkpoint(tmp_path, monkeypatch, max_pending):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    records = [
+        {"n": i, "name": f"Alice Smith {i}" if i % 2 else "Bob Jones"}
+        for i in range(20)
+    ]
+    write_jsonl(src, records)
+
+    monkeypatch.setattr(cli, "analyse_texts", CrashingAnalyser(fail_on=3))
+    with pytest.raises(RuntimeError, match="killed"):
+        anonymise_file(
+            src,
+            dst,
+            allow_reidentification=True,
+            records_per_batch=3,
+            max_pending=max_pending,
+        )
+
+    checkpoint = Checkpoint.load(tmp_path / "out.jsonl.checkpoint")
+    assert checkpoint.records == 6
+    # Simulate a partial write after the last checkpoint
+    with open(dst, "a") as f_out:
+        f_out.write('{"n": 6, "na')
+
+    resumed = FakeAnalyser()
+    monkeypatch.setattr(cli, "analyse_texts", resumed)
+    count = anonymise_file(src, dst, allow_reidentification=True, records_per_batch=3)
+
+    assert count == 20
+    assert resumed.batches[0] == ["Bob Jones", "Alice Smith 7"]  # records 6 to 8
+    assert [r["n"] for r in read_jsonl(dst)] == list(range(20))
+    keys = read_jsonl(tmp_path / "out.jsonl.keys.jsonl")
+    assert [k["first_record"] for k in keys] == list(range(0, 20, 3))
+    assert keys[-1]["last_record"] == 19
+
+
+def test_csv_job_resumes_without_repeating_the_header(tmp_path, monkeypatch):
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_csv(src, [["name"]] + [[f"Alice Smith {i}"] for i in range(5)])
+
+    monkeypatch.setattr(cli, "analyse_texts", CrashingAnalyser(fail_on=2))
+    with pytest.raises(RuntimeError):
+        anonymise_file(src, dst, records_per_batch=2, max_pending=1)
+    monkeypatch.setattr(cli, "analyse_texts", FakeAnalyser())
+    anonymise_file(src, dst, records_per_batch=2)
+
+    assert read_csv(dst) == [["name"]] + [[f"<PERSON> {i}"] for i in range(5)]
+
+
+def test_csv_header_is_written_before_the_first_checkpoint(
+    tmp_path, monkeypatch, analyser
+):
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    write_csv(src, [["name"], ["Alice Smith"]])
+    saved = []
+    save = Checkpoint.save
+
+    def save_and_check(checkpoint, path):
+        saved.append((checkpoint.output_bytes, dst.stat().st_size))
+        save(checkpoint, path)
+
+    monkeypatch.setattr(Checkpoint, "save", save_and_check)
+    anonymise_file(src, dst, allow_reidentification=True)
+
+    assert saved[0] == (len("name\n"), len("name\n"))
+
+
+def test_checkpoint_for_another_job_is_refused(tmp_path, monkeypatch):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(src, [{"name": f"Alice Smith {i}"} for i in range(4)])
+    monkeypatch.setattr(cli, "analyse_texts", CrashingAnalyser(fail_on=2))
+    with pytest.raises(RuntimeError):
+        anonymise_file(src, dst, records_per_batch=1, max_pending=1)
+    monkeypatch.setattr(cli, "analyse_texts", FakeAnalyser())
+
+    with pytest.raises(ValueError, match="another job"):
+        anonymise_file(src, dst, fields=["other"])
+    assert anonymise_file(src, dst, fields=["other"], restart=True) == 4
+
+
+def kill_after_first_batch(tmp_path, monkeypatch, **options):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(src, [{"name": f"Alice Smith {i}"} for i in range(4)])
+    monkeypatch.setattr(cli, "analyse_texts", CrashingAnalyser(fail_on=2))
+    with pytest.raises(RuntimeError):
+        anonymise_file(src, dst, records_per_batch=1, max_pending=1, **options)
+    monkeypatch.setattr(cli, "analyse_texts", FakeAnalyser())
+    return src, dst
+
+
+@pytest.mark.parametrize(
+    "before, after",
+    [
+        ({}, {"allow_reidentification": True}),
+        ({"allow_reidentification": True}, {}),
+        ({}, {"model": "spacy"}),
+        ({}, {"language": "de"}),
+        (
+            {"allow_reidentification": True},
+            {"allow_reidentification": True, "keys_path": "other.keys.jsonl"},
+        ),
+    ],
+)
+def test_checkpoint_is_refused_when_settings_change(
+    tmp_path, monkeypatch, before, after
+):
+    src, dst = kill_after_first_batch(tmp_path, monkeypatch, **before)
+    if "keys_path" in after:
+        after["keys_path"] = tmp_path / after["keys_path"]
+
+    with pytest.raises(ValueError, match="another job"):
+        anonymise_file(src, dst, **after)
+    assert anonymise_file(src, dst, restart=True, **after) == 4
+
+
+def test_resume_with_a_missing_keys_file_is_refused(tmp_path, monkeypatch):
+    src, dst = kill_after_first_batch(
+        tmp_path, monkeypatch, allow_reidentification=True
+    )
+    (tmp_path / "out.jsonl.keys.jsonl").unlink()
+
+    with pytest.raises(ValueError, match="keys.jsonl is missing"):
+        anonymise_file(src, dst, allow_reidentification=True)
+
+
+def test_resume_with_a_truncated_output_is_refused(tmp_path, monkeypatch):
+    src, dst = kill_after_first_batch(tmp_path, monkeypatch)
+    dst.write_text("")
+
+    with pytest.raises(ValueError, match="shorter than the checkpoint"):
+        anonymise_file(src, dst)
+
+
+def test_unknown_csv_field_is_an_error(tmp_path, analyser):
+    src = tmp_path / "in.csv"
+    write_csv(src, [["name"], ["Alice Smith"]])
+
+    with pytest.raises(SystemExit, match="Unknown fields: email"):
+        main([str(src), "-o", str(tmp_path / "out.csv"), "--fields", "name,email"])
+
+
+def test_main_parses_arguments(tmp_path, analyser):
+    src, dst = tmp_path / "in.data", tmp_path / "out.jsonl"
+    write_jsonl(src, [{"name": "Alice Smith", "note": "Bob Jones"}])
+
+    main([str(src), "-o", str(dst), "--format", "jsonl", "--fields", "note"])
+
+    assert read_jsonl(dst) == [{"name": "Alice Smith", "note": "<PERSON>"}]
+
+
+def test_workers_use_a_process_pool(tmp_path, monkeypatch):
+    pools = []
+
+    class FakePool:
+        def __init__(self, workers, **options):
+            self.workers = workers
+            self.options = options
+            self.analyse = FakeAnalyser()
+            pools.append(self)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+    monkeypatch.setattr(cli, "ParallelAnonymiser", FakePool)
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(src, [{"name": "Alice Smith"}])
+
+    anonymise_file(src, dst, workers=4, model="dslim/bert-base-NER")
+
+    assert pools[0].workers == 4
+    assert pools[0].options["model"] == "dslim/bert-base-NER"
+    assert pools[0].analyse.batches == [["Alice Smith"]]
+    assert read_jsonl(dst) == [{"name": "<PERSON>"}]
@@ -0,0 +1,141 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from pd_anonymiser.dataframe import anonymise_dataframe, reidentify_dataframe
+
+pytestmark = pytest.mark.usefixtures("session_store")
+
+
+@pytest.fixture
+def analyser(monkeypatch, fake_analyser):
+    monkeypatch.setattr("pd_anonymiser.dataframe.analyse_texts", fake_analyser)
+    return fake_analyser
+
+
+@pytest.fixture
+def customers():
+    return pd.DataFrame(
+        {
+            "customer_name": ["Alice Smith", "Bob Jones", "Alice Smith", None] * 250,
+            "contact": ["Bob Jones", "Alice Smith", "Bob Jones", "Alice Smith"] * 250,
+            "city": ["Leeds", "Leeds", "Hull", "Leeds"] * 250,
+            "orders": [1, 2, 3, 4] * 250,
+        }
+    )
+
+
+def test_each_distinct_value_is_analysed_once(analyser, customers):
+    anonymise_dataframe(customers, allow_reidentification=True)
+
+    assert sorted(analyser.analysed) == ["Alice Smith", "Bob Jones", "Hull", "Leeds"]
+
+
+def test_pseudonyms_are_shared_across_columns(analyser, customers):
+    result = anonymise_dataframe(customers, allow_reidentification=True)
+    frame = result.frame
+
+    assert frame["customer_name"].tolist()[:3] == ["Person A", "Person B", "Person A"]
+    assert frame["contact"].tolist()[:2] == ["Person B", "Person A"]
+    assert frame["city"].tolist()[:3] == ["Location A", "Location A", "Hull"]
+    assert frame["customer_name"].isna().sum() == 250
+    assert frame["orders"].tolist() == customers["orders"].tolist()
+    assert frame["customer_name"].dtype == customers["customer_name"].dtype
+
+
+def test_input_frame_is_not_modified(analyser, customers):
+    original = customers.copy()
+
+    anonymise_dataframe(customers, allow_reidentification=True)
+
+    pd.testing.assert_frame_equal(customers, original)
+
+
+def test_only_selected_columns_are_anonymised(analyser, customers):
+    result = anonymise_dataframe(
+        customers, columns=["customer_name"], allow_reidentification=True
+    )
+
+    assert result.frame["customer_name"].iloc[0] == "Person A"
+    assert result.frame["contact"].iloc[0] == "Bob Jones"
+    assert "Leeds" not in analyser.analysed
+
+
+def test_frame_can_be_reidentified_from_one_session(analyser, customers):
+    result = anonymise_dataframe(customers, allow_reidentification=True)
+
+    restored = reidentify_dataframe(
+        result.frame, result.session_id, result.key, result.columns
+    )
+
+    pd.testing.assert_frame_equal(restored, customers)
+
+
+def test_reidentify_leaves_other_columns_alone(analyser):
+    df = pd.DataFrame({"name": ["Alice Smith"], "alias": ["Person A"]})
+
+    result = anonymise_dataframe(df, columns=["name"], allow_reidentification=True)
+    restored = reidentify_dataframe(
+        result.frame, result.session_id, result.key, result.columns
+    )
+
+    assert result.columns == ["name"]
+    assert restored["alias"].tolist() == ["Person A"]
+    pd.testing.assert_frame_equal(restored, df)
+
+
+def test_columns_keep_their_dtype(analyser):
+    df = pd.DataFrame(
+        {
+            "orders": [1, 2, 1],
+            "city": pd.Categorical(["Leeds", "Hull", "Leeds"], ordered=True),
+            "name": pd.Categorical(["Alice Smith", "Bob Jones", None]),
+        }
+    )
+
+    result = anonymise_dataframe(
+        df, columns=["orders", "city", "name"], allow_reidentification=True
+    )
+    frame = result.frame
+
+    assert frame.dtypes.to_dict() == {
+        "orders": df["orders"].dtype,
+        "city": "category",
+        "name": "category",
+    }
+    assert frame["orders"].tolist() == [1, 2, 1]
+    assert frame["city"].tolist() == ["Location A", "Hull", "Location A"]
+    assert frame["city"].cat.ordered
+    assert frame["name"].tolist()[:2] == ["Person A", "Person B"]
+    assert frame["name"].isna().tolist() == [False, False, True]
+
+    restored = reidentify_dataframe(
+        frame, result.session_id, result.key, result.columns
+    )
+    pd.testing.assert_frame_equal(restored, df)
+
+
+def test_categories_that_merge_stay_categorical(analyser):
+    df = pd.DataFrame({"name": pd.Categorical(["Alice Smith", "Bob Jones"])})
+
+    frame = anonymise_dataframe(df).frame
+
+    assert frame["name"].dtype == "category"
+    assert frame["name"].tolist() == ["<PERSON>", "<PERSON>"]
+
+
+def test_without_reidentification_entities_are_tagged(analyser):
+    df = pd.DataFrame({"note": ["Call Alice Smith", "No names here"]})
+
+    result = anonymise_dataframe(df)
+
+    assert result.frame["note"].tolist() == ["Call <PERSON>", "No names here"]
+
+
+def test_frame_without_pii_has_no_session(analyser):
+    df = pd.DataFrame({"note": ["nothing", "to see", ""]})
+
+    result = anonymise_dataframe(df, allow_reidentification=True)
+
+    assert result.session_id is None and result.key is None
+    pd.testing.assert_frame_equal(result.frame, df)
@@ -1,4 +1,7 @@
-from unittest.mock import MagicMock
+import re
+from unittest.mock import MagicMock, patch
+
+import pytest
 from presidio_analyzer import AnalyzerEngine, RecognizerResult
 
 from pd_anonymiser.recognisers.huggingface import HuggingFaceRecogniser
@@ -72,3 +75,132 @@ def test_should_not_flag_generic_nouns_as_pii():
     findings = analyser.analyze(text=passage, language="en")
 
     assert all(f.entity_type not in {"PERSON", "EMAIL_ADDRESS"} for f in findings)
+
+
+class FakeTokenizer:
+    """One token per whitespace-separated word."""
+
+    model_max_length = 512
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=True):
+        return {
+            "offset_mapping": [m.span() for m in re.finditer(r"\S+", text)],
+        }
+
+
+def fake_ner(texts, batch_size):
+    """Tags runs of capitalised words as people."""
+    return [
+        [
+            {"entity_group": "PER", "start": m.start(), "end": m.end(), "score": 0.9}
+            for m in re.finditer(r"[A-Z]\w*(?: [A-Z]\w*)*", text)
+        ]
+        for text in texts
+    ]
+
+
+@pytest.fixture
+def mock_ner():
+    with patch("pd_anonymiser.recognisers.huggingface.pipeline") as mock_pipeline:
+        ner = mock_pipeline.return_value
+        ner.tokenizer = FakeTokenizer()
+        yield ner
+
+
+def test_analyze_batch_uses_pipeline_batching(mock_ner):
+    ner = mock_ner
+    ner.return_value = [
+        [{"entity_group": "PER", "start": 0, "end": 5, "score": 0.99}],
+        [{"entity_group": "MISC", "start": 0, "end": 4, "score": 0.5}],
+    ]
+    recogniser = HuggingFaceRecogniser()
+
+    texts = ["Alice went home.", "Word salad."]
+    batches = recogniser.analyze_batch(texts, ["PERSON"], batch_size=8)
+
+    ner.assert_called_once_with(texts, batch_size=8)
+    assert [(r.entity_type, r.start, r.end) for r in batches[0]] == [("PERSON", 0, 5)]
+    assert batches[1] == []
+
+
+def test_default_window_fits_model():
+    with patch("pd_anonymiser.recognisers.huggingface.pipeline") as mock_pipeline:
+        mock_pipeline.return_value.tokenizer = FakeTokenizer()
+        assert HuggingFaceRecogniser().window_size == 510
+
+
+def test_stride_must_be_smaller_than_window(mock_ner):
+    with pytest.raises(ValueError, match="stride"):
+        HuggingFaceRecogniser(window_size=8, stride=8)
+
+
+def test_long_text_is_windowed_in_one_batch(mock_ner):
+    mock_ner.side_effect = fake_ner
+    words = ["word"] * 60
+    for i, name in [
+        (0, "Alice"),
+        (9, "Bob"),
+        (10, "Carter"),
+        (31, "Dana"),
+        (59, "Eve"),
+    ]:
+        words[i] = name
+    text = " ".join(words)
+
+    recogniser = HuggingFaceRecogniser(window_size=10, stride=4)
+    results = recogniser.analyze(text, ["PERSON"])
+
+    mock_ner.assert_called_once()
+    windows = mock_ner.call_args.args[0]
+    assert len(windows) > 1
+    assert all(len(w.split()) <= 10 for w in windows)
+    assert [text[r.start : r.end] for r in results] == [
+        "Alice",
+        "Bob Carter",
+        "Dana",
+        "Eve",
+    ]
+
+
+def test_long_texts_share_one_pipeline_call(mock_ner):
+    mock_ner.side_effect = fake_ner
+    texts = [" ".join(["Name"] + ["word"] * 30), "Short Text here"]
+
+    recogniser = HuggingFaceRecogniser(window_size=10, stride=4)
+    batches = recogniser.analyze_batch(texts, ["PERSON"], batch_size=4)
+
+    mock_ner.assert_called_once()
+    assert [[t[r.start : r.end] for r in rs] for t, rs in zip(texts, batches)] == [
+        ["Name"],
+        ["Short Text"],
+    ]
+
+
+def test_onnx_backend_runs_exported_model():
+    with patch(
+        "pd_anonymiser.recognisers.huggingface.pipeline"
+    ) as mock_pipeline, patch(
+        "pd_anonymiser.recognisers.onnx.load_onnx_model",
+        return_value=("ort-model", "tokenizer"),
+    ) as load:
+        mock_pipeline.return_value.tokenizer = FakeTokenizer()
+        recogniser = HuggingFaceRecogniser(backend="onnx", quantize=True)
+
+    load.assert_called_once_with("dslim/bert-base-NER", quantize=True)
+    mock_pipeline.assert_called_once_with(
+        task="ner",
+        model="ort-model",
+        tokenizer="tokenizer",
+        aggregation_strategy="simple",
+    )
+    assert recogniser.window_size == 510
+
+
+def test_backend_validation(mock_ner):
+    with pytest.raises(ValueError, match="Unknown backend"):
+        HuggingFaceRecogniser(backend="tensorrt")
+    with pytest.raises(ValueError, match="onnx backend"):
+        HuggingFaceRecogniser(quantize=True)
@@ -0,0 +1,108 @@
+import random
+
+from presidio_analyzer import RecognizerResult
+
+from pd_anonymiser.merging import ENTITY_PRIORITY, merge_results
+
+
+def spans(results):
+    return [(r.entity_type, r.start, r.end) for r in results]
+
+
+def test_duplicates_collapse_to_best_score():
+    results = [
+        RecognizerResult("PERSON", 0, 11, 0.85),
+        RecognizerResult("PERSON", 0, 11, 0.99),
+        RecognizerResult("PERSON", 0, 11, 0.6),
+    ]
+    merged = merge_results(results)
+    assert spans(merged) == [("PERSON", 0, 11)]
+    assert merged[0].score == 0.99
+
+
+def test_overlapping_same_type_spans_are_merged():
+    # "Theresa May" from one model, "May" and "Theresa" from others
+    results = [
+        RecognizerResult("PERSON", 8, 11, 0.99),
+        RecognizerResult("PERSON", 0, 11, 0.85),
+        RecognizerResult("PERSON", 0, 7, 0.7),
+        RecognizerResult("PERSON", 5, 14, 0.5),
+    ]
+    merged = merge_results(results)
+    assert spans(merged) == [("PERSON", 0, 14)]
+    assert merged[0].score == 0.99
+
+
+def test_different_types_resolved_by_score():
+    results = [
+        RecognizerResult("LOCATION", 0, 10, 0.9),
+        RecognizerResult("ORGANIZATION", 0, 15, 0.8),
+    ]
+    assert spans(merge_results(results)) == [("LOCATION", 0, 10)]
+
+
+def test_score_ties_resolved_by_priority_then_length():
+    email = RecognizerResult("EMAIL_ADDRESS", 5, 20, 0.9)
+    person = RecognizerResult("PERSON", 0, 20, 0.9)
+    assert spans(merge_results([person, email])) == [("EMAIL_ADDRESS", 5, 20)]
+
+    short = RecognizerResult("CUSTOM_A", 0, 4, 0.9)
+    long = RecognizerResult("CUSTOM_B", 2, 12, 0.9)
+    assert spans(merge_results([short, long])) == [("CUSTOM_B", 2, 12)]
+
+    custom = {**ENTITY_PRIORITY, "PERSON": 100}
+    assert spans(merge_results([person, email], priority=custom)) == [("PERSON", 0, 20)]
+
+
+def test_loser_does_not_block_later_spans():
+    # B loses to A, so C, which only overlaps B, is kept
+    results = [
+        RecognizerResult("PERSON", 0, 10, 0.9),
+        RecognizerResult("LOCATION", 8, 20, 0.5),
+        RecognizerResult("DATE_TIME", 15, 25, 0.6),
+    ]
+    assert spans(merge_results(results)) == [
+        ("PERSON", 0, 10),
+        ("DATE_TIME", 15, 25),
+    ]
+
+
+def test_adjacent_spans_are_not_overlaps():
+    results = [
+        RecognizerResult("PERSON", 6, 11, 0.9),
+        RecognizerResult("PERSON", 0, 6, 0.9),
+        RecognizerResult("LOCATION", 11, 17, 0.9),
+    ]
+    assert spans(merge_results(results)) == [
+        ("PERSON", 0, 6),
+        ("PERSON", 6, 11),
+        ("LOCATION", 11, 17),
+    ]
+
+
+def test_merge_results_empty():
+    assert merge_results([]) == []
+
+
+def test_random_results_come_out_sorted_and_disjoint():
+    rng = random.Random(7)
+    types = list(ENTITY_PRIORITY)
+    for _ in range(200):
+        results = []
+        for _ in range(rng.randint(1, 30)):
+            start = rng.randint(0, 100)
+            results.append(
+                RecognizerResult(
+                    rng.choice(types),
+                    start,
+                    start + rng.randint(1, 15),
+                    rng.choice([0.5, 0.85, 0.9, 0.99]),
+                )
+            )
+        merged = merge_results(results)
+
+        assert all(a.end <= b.start for a, b in zip(merged, merged[1:]))
+        # Every input span is covered by, or conflicts with, a kept span
+        for r in results:
+            assert any(m.start < r.end and r.start < m.end for m in merged)
+        assert merge_results(merged) == merged
@@ -0,0 +1,148 @@
+import re
+from unittest.mock import patch
+
+import pytest
+from presidio_analyzer import EntityRecognizer, RecognizerResult
+
+from pd_anonymiser import metrics
+from pd_anonymiser.anonymiser import anonymise_text
+from pd_anonymiser.reidentifier import reidentify_text
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.enable(False)
+    metrics.reset()
+
+
+@pytest.fixture
+def enabled():
+    metrics.enable()
+
+
+class NameRecogniser(EntityRecognizer):
+    model_name = "fake/names"
+
+    def __init__(self):
+        super().__init__(supported_entities=["PERSON"], name="NameRecogniser")
+
+    def load(self):
+        pass
+
+    def analyze(self, text, entities, nlp_artifacts=None):
+        return [
+            RecognizerResult("PERSON", m.start(), m.end(), 0.9)
+            for m in re.finditer(r"Alice|Bob", text)
+        ]
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test.", (0.1, 1), ("stage",))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, "a")
+
+    assert list(histogram.render()) == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1"} 3',
+        'test_seconds_bucket{stage="a",le="+Inf"} 4',
+        'test_seconds_sum{stage="a"} 4.05',
+        'test_seconds_count{stage="a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    histogram = metrics.Histogram("test", "Test.", (1,), ("model",))
+    histogram.observe(0, 'a"b\\c\nd')
+
+    assert 'test_count{model="a\\"b\\\\c\\nd"} 1' in list(histogram.render())
+
+
+def test_nothing_is_recorded_while_disabled():
+    with metrics.timed("anonymise_text"):
+        pass
+    metrics.observe_text("anonymise", "text")
+    metrics.observe_entities(3)
+
+    assert metrics.stage_seconds.count("anonymise_text") == 0
+    assert metrics.text_chars.count("anonymise") == 0
+    assert metrics.entities.count() == 0
+
+
+def test_stages_of_anonymisation_and_reidentification(enabled, session_store):
+    with patch(
+        "pd_anonymiser.models.get_recogniser", return_value=NameRecogniser()
+    ), patch("pd_anonymiser.anonymiser.AnalyzerEngine") as engine:
+        engine.return_value.analyze.return_value = [
+            RecognizerResult("PERSON", 0, 5, 0.9)
+        ]
+        result = anonymise_text("Alice met Bob", allow_reidentification=True)
+    reidentify_text(result.text, result.session_id, result.key)
+
+    for stage in (
+        "anonymise_text",
+        "pseudonyms",
+        "encrypt",
+        "session_write",
+        "reidentify_text",
+        "session_read",
+        "decrypt",
+    ):
+        assert metrics.stage_seconds.count(stage) == 1, stage
+    assert metrics.text_chars.count("anonymise") == 1
+    assert metrics.text_chars.count("reidentify") == 1
+    assert metrics.entities.count() == 1
+
+
+def test_recogniser_calls_are_labelled_by_model(enabled):
+    recogniser = NameRecogniser()
+    metrics.instrument_recogniser(recogniser)
+    metrics.instrument_recogniser(recogniser)  # idempotent
+
+    assert len(recogniser.analyze("Alice", ["PERSON"])) == 1
+    assert metrics.recogniser_seconds.count("fake/names", "analyze") == 1
+
+
+def test_instrumented_recogniser_records_nothing_while_disabled():
+    recogniser = NameRecogniser()
+    metrics.instrument_recogniser(recogniser)
+
+    recogniser.analyze("Alice", ["PERSON"])
+
+    assert metrics.recogniser_seconds.count("fake/names", "analyze") == 0
+
+
+def test_nlp_batches_are_timed_per_text(enabled):
+    class NlpEngine:
+        def process_text(self, text, language):
+            return text
+
+        def process_batch(self, texts, language, batch_size=1):
+            for text in texts:
+                yield text, text
+
+    engine = NlpEngine()
+    metrics.instrument_nlp_engine(engine)
+
+    engine.process_text("a", "en")
+    assert list(engine.process_batch(["b", "c"], "en")) == [("b", "b"), ("c", "c")]
+    assert metrics.stage_seconds.count("nlp") == 3
+
+
+def test_render_lists_every_histogram(enabled):
+    with metrics.timed("encrypt"):
+        pass
+
+    text = metrics.render()
+
+    for name in (
+        "pd_anonymiser_stage_seconds",
+        "pd_anonymiser_recogniser_seconds",
+        "pd_anonymiser_entities",
+        "pd_anonymiser_text_chars",
+    ):
+        assert f"# TYPE {name} histogram" in text
+    assert 'pd_anonymiser_stage_seconds_count{stage="encrypt"} 1' in text
@@ -1,9 +1,18 @@
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
 import pytest
 from presidio_analyzer import AnalyzerEngine
 
-from pd_anonymiser.models import model_registry, register_models
-from pd_anonymiser.recognisers.huggingface import HuggingFaceRecogniser
-from pd_anonymiser.recognisers.spacy import SpacyNERRecogniser
+import pd_anonymiser.models as models
+from pd_anonymiser.models import (
+    get_recogniser,
+    model_registry,
+    preload,
+    register_models,
+    unload,
+)
 
 
 def test_model_registry_keys_present():
@@ -15,9 +24,81 @@ def test_model_registry_keys_present():
     assert expected_keys.issubset(model_registry.keys())
 
 
-def test_model_registry_values_types():
-    for recogniser in model_registry.values():
-        assert isinstance(recogniser, (HuggingFaceRecogniser, SpacyNERRecogniser))
+def test_model_registry_values_are_factories():
+    for factory in model_registry.values():
+        assert callable(factory)
+
+
+@pytest.fixture
+def fake_registry(monkeypatch):
+    factories = {
+        "fast": MagicMock(
+            side_effect=lambda: MagicMock(name="fast", supported_entities=["PERSON"])
+        ),
+        "slow": MagicMock(
+            side_effect=lambda: MagicMock(name="slow", supported_entities=["LOCATION"])
+        ),
+    }
+    monkeypatch.setattr(models, "model_registry", factories)
+    monkeypatch.setattr(models, "_loaded", {})
+    monkeypatch.setattr(models, "_cascades", {})
+    return factories
+
+
+def test_get_recogniser_loads_once(fake_registry):
+    first = get_recogniser("fast")
+    second = get_recogniser("fast")
+
+    assert first is second
+    assert fake_registry["fast"].call_count == 1
+    assert fake_registry["slow"].call_count == 0
+
+
+def test_get_recogniser_unknown_raises(fake_registry):
+    with pytest.raises(ValueError, match="Unknown model type: nope"):
+        get_recogniser("nope")
+
+
+def test_preload_and_unload(fake_registry):
+    preload()
+    assert models.is_loaded("fast") and models.is_loaded("slow")
+
+    unload("slow")
+    assert models.is_loaded("fast") and not models.is_loaded("slow")
+
+
+def test_register_single_model_only_loads_that_model(fake_registry):
+    engine = MagicMock()
+    register_models(engine, "slow")
+
+    engine.registry.add_recognizer.assert_called_once()
+    assert fake_registry["fast"].call_count == 0
+
+
+def test_register_models_cascade_wraps_selection(fake_registry):
+    engine = MagicMock()
+    register_models(engine, "all", cascade=True)
+    register_models(MagicMock(), "all", cascade=True)
+
+    engine.registry.add_recognizer.assert_called_once()
+    cascade = engine.registry.add_recognizer.call_args[0][0]
+    assert cascade is models.get_cascade("all")
+    assert [r._extract_mock_name() for r in cascade.recognisers] == ["fast", "slow"]
+    assert cascade.supported_entities == ["LOCATION", "PERSON"]
+    assert models.cascade_stats("all")["texts"] == 0
+    assert models.cascade_stats("slow") == {"texts": 0, "segments": 0, "escalated": 0}
+
+
+def test_import_does_not_load_models():
+    code = (
+        "import sys, pd_anonymiser.anonymiser, pd_anonymiser.reidentifier; "
+        "from pd_anonymiser.models import _loaded; "
+        "print(bool(_loaded) or 'pd_anonymiser.recognisers.huggingface' in sys.modules)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "False"
 
 
 def test_register_single_model(monkeypatch):
@@ -51,3 +132,21 @@ def test_register_invalid_model_raises():
 
     with pytest.raises(ValueError, match="Unknown model type: invalid_model"):
         register_models(engine, "invalid_model")
+
+
+@pytest.mark.parametrize(
+    "env, expected",
+    [
+        (None, {"backend": "torch"}),
+        ("onnx", {"backend": "onnx"}),
+        ("onnx-int8", {"backend": "onnx", "quantize": True}),
+    ],
+)
+def test_huggingface_backend_from_environment(env, expected, monkeypatch):
+    if env:
+        monkeypatch.setenv(models.HF_BACKEND_ENV, env)
+    with patch(
+        "pd_anonymiser.recognisers.huggingface.HuggingFaceRecogniser"
+    ) as recogniser:
+        models._huggingface_recogniser("org/model")
+    recogniser.assert_called_once_with(model_name="org/model", **expected)
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pd_anonymiser.recognisers.onnx import (
+    MODEL_FILE,
+    QUANTIZED_MODEL_FILE,
+    _write_once,
+    export_dir,
+    load_onnx_model,
+)
+
+
+def test_export_dir_layout(tmp_path, monkeypatch):
+    monkeypatch.setenv("PD_ANONYMISER_ONNX_CACHE", str(tmp_path))
+    assert export_dir("dslim/bert-base-NER") == tmp_path / "dslim--bert-base-NER/fp32"
+    assert export_dir("dslim/bert-base-NER", quantize=True, cache_dir="/x") == (
+        Path("/x/dslim--bert-base-NER/int8")
+    )
+
+
+@pytest.fixture
+def fake_optimum():
+    onnxruntime = MagicMock()
+    with patch.dict(
+        sys.modules, {"optimum": MagicMock(), "optimum.onnxruntime": onnxruntime}
+    ), patch("transformers.AutoTokenizer.from_pretrained") as tokenizer:
+        yield onnxruntime.ORTModelForTokenClassification, tokenizer
+
+
+def test_load_onnx_model_exports_and_quantises_once(tmp_path, fake_optimum):
+    ort_model, _ = fake_optimum
+
+    def export(model_name, save_dir):
+        (save_dir / MODEL_FILE).write_bytes(b"onnx")
+
+    def quantize(fp32_dir, save_dir):
+        assert (fp32_dir / MODEL_FILE).exists()
+        (save_dir / QUANTIZED_MODEL_FILE).write_bytes(b"int8")
+
+    with patch(
+        "pd_anonymiser.recognisers.onnx._export", side_effect=export
+    ) as mock_export, patch(
+        "pd_anonymiser.recognisers.onnx._quantize", side_effect=quantize
+    ) as mock_quantize:
+        for _ in range(2):
+            load_onnx_model("org/model", quantize=True, cache_dir=tmp_path)
+
+    mock_export.assert_called_once()
+    mock_quantize.assert_called_once()
+    ort_model.from_pretrained.assert_called_with(
+        tmp_path / "org--model/int8", file_name=QUANTIZED_MODEL_FILE
+    )
+    assert not [p for p in (tmp_path / "org--model").iterdir() if p.name[0] == "."]
+
+
+def test_load_onnx_model_without_optimum():
+    with patch.dict(sys.modules, {"optimum.onnxruntime": None}):
+        with pytest.raises(ImportError, match=r"pd-anonymiser\[onnx\]"):
+            load_onnx_model("org/model")
+
+
+def test_write_once_keeps_first_export(tmp_path):
+    target = tmp_path / "fp32"
+    _write_once(target, lambda d: (d / MODEL_FILE).write_text("first"))
+    _write_once(target, lambda d: (d / MODEL_FILE).write_text("second"))
+
+    assert (target / MODEL_FILE).read_text() == "first"
+    assert [p.name for p in tmp_path.iterdir()] == ["fp32"]
+
+
+def test_write_once_cleans_up_failed_export(tmp_path):
+    def fail(d):
+        (d / MODEL_FILE).write_text("partial")
+        raise RuntimeError("export failed")
+
+    with pytest.raises(RuntimeError):
+        _write_once(tmp_path / "fp32", fail)
+    assert list(tmp_path.iterdir()) == []
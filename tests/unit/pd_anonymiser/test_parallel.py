@@ -0,0 +1,160 @@
+from concurrent.futures import Future
+from unittest.mock import patch
+
+import pytest
+from presidio_analyzer import RecognizerResult
+
+from pd_anonymiser.anonymiser import AnonymisationResult
+from pd_anonymiser.parallel import (
+    CHUNKS_PER_WORKER,
+    _TEXT_OVERHEAD,
+    ParallelAnonymiser,
+    anonymise_corpus,
+    balanced_chunks,
+)
+
+
+class InlineExecutor:
+    """Runs the initializer and every task in this process."""
+
+    instances = []
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        self.max_workers = max_workers
+        self.initargs = initargs
+        self.submitted = []
+        self.shut_down = False
+        initializer(*initargs)
+        InlineExecutor.instances.append(self)
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self):
+        self.shut_down = True
+
+
+def fake_anonymise_many(
+    texts, language, use_reusable_tags, model, allow, size, pending, save_sessions
+):
+    results = []
+    for text in texts:
+        if not save_sessions:
+            results.append(AnonymisationResult(text.upper(), None, None))
+            continue
+        pending.append(({("PERSON", text): "Person A"}, f"id-{text}", b"key"))
+        results.append(AnonymisationResult(text.upper(), f"id-{text}", "key"))
+    return results
+
+
+def fake_analyse_texts(texts, language, model, batch_size):
+    return [[RecognizerResult("PERSON", 0, len(text), 0.9)] for text in texts]
+
+
+@pytest.fixture
+def inline_pool():
+    InlineExecutor.instances.clear()
+    with patch("pd_anonymiser.parallel.ProcessPoolExecutor", InlineExecutor), patch(
+        "pd_anonymiser.parallel.model_registry.resolve_models", return_value=["fake"]
+    ), patch("pd_anonymiser.parallel.model_registry.preload") as preload, patch(
+        "pd_anonymiser.parallel.get_analyser"
+    ), patch(
+        "pd_anonymiser.parallel._anonymise_many", side_effect=fake_anonymise_many
+    ), patch(
+        "pd_anonymiser.parallel.analyse_texts", side_effect=fake_analyse_texts
+    ), patch(
+        "pd_anonymiser.parallel.save_encrypted_jsons"
+    ) as save:
+        yield preload, save
+
+
+def test_balanced_chunks_cover_texts_in_order():
+    texts = ["x" * n for n in (10, 500, 20, 30, 400, 5, 5, 300, 50)]
+    chunks = balanced_chunks(texts, 3)
+
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(texts)
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    assert all(start < end for start, end in chunks)
+    assert len(chunks) <= 3
+
+
+def test_balanced_chunks_balance_by_size():
+    texts = ["x" * 1000] * 4 + ["x" * 10] * 400
+    sizes = [
+        sum(len(t) + _TEXT_OVERHEAD for t in texts[start:end])
+        for start, end in balanced_chunks(texts, 2)
+    ]
+    assert len(sizes) == 2
+    assert max(sizes) / min(sizes) < 1.1
+
+
+def test_balanced_chunks_edge_cases():
+    assert balanced_chunks([], 4) == []
+    assert balanced_chunks(["a", "b"], 8) == [(0, 1), (1, 2)]
+    assert balanced_chunks(["a", "b", "c"], 1) == [(0, 3)]
+
+
+def test_parallel_anonymiser_returns_results_in_input_order(inline_pool):
+    preload, save = inline_pool
+    texts = [f"text {n}" * (n % 7 + 1) for n in range(50)]
+
+    with ParallelAnonymiser(workers=3, model="fake") as pool:
+        results = pool.anonymise(texts)
+
+    executor = InlineExecutor.instances[0]
+    assert [r.text for r in results] == [t.upper() for t in texts]
+    assert 1 < len(executor.submitted) <= 3 * CHUNKS_PER_WORKER
+    assert executor.shut_down
+    preload.assert_called_once_with("fake")
+
+    # Sessions come back from the workers and are written once, in order
+    save.assert_called_once()
+    assert [sid for _, sid, _ in save.call_args[0][0]] == [f"id-{t}" for t in texts]
+
+
+def test_parallel_anonymiser_can_skip_sessions(inline_pool):
+    _, save = inline_pool
+
+    results = anonymise_corpus(["a", "b"], workers=2, save_sessions=False)
+
+    assert [(r.text, r.session_id) for r in results] == [("A", None), ("B", None)]
+    save.assert_not_called()
+
+
+def test_parallel_analyse_returns_results_in_input_order(inline_pool):
+    _, save = inline_pool
+    texts = [f"text {n}" for n in range(20)]
+
+    with ParallelAnonymiser(workers=3, model="fake") as pool:
+        analyses = pool.analyse(texts)
+
+    assert [[r.end for r in results] for results in analyses] == [
+        [len(t)] for t in texts
+    ]
+    assert len(InlineExecutor.instances[0].submitted) > 1
+    save.assert_not_called()
+
+
+def test_parallel_anonymiser_splits_cores_between_workers(inline_pool):
+    with patch("pd_anonymiser.parallel.os.cpu_count", return_value=32), patch(
+        "torch.set_num_threads"
+    ) as set_threads:
+        pool = ParallelAnonymiser(workers=8)
+    pool.close()
+
+    assert InlineExecutor.instances[0].max_workers == 8
+    set_threads.assert_called_once_with(4)
+
+
+def test_anonymise_corpus_without_entities_saves_nothing(inline_pool):
+    _, save = inline_pool
+    assert anonymise_corpus([], workers=2) == []
+    save.assert_not_called()
+
+
+def test_parallel_anonymiser_rejects_unknown_model():
+    with pytest.raises(ValueError, match="Unknown model type"):
+        ParallelAnonymiser(workers=1, model="nope")
@@ -1,8 +1,26 @@
 import base64
+import os
+import re
+import time
 import pytest
 from unittest.mock import patch
 
-from pd_anonymiser.reidentifier import reidentify_text
+from pd_anonymiser.reidentifier import (
+    PseudonymMatcher,
+    Reidentifier,
+    SessionCache,
+    get_matcher,
+    reidentify_stream,
+    reidentify_text,
+    session_cache,
+)
+from pd_anonymiser.sessions import (
+    FileSessionStore,
+    SessionNotFoundError,
+    SQLiteSessionStore,
+    set_session_store,
+)
+from pd_anonymiser.utils import generate_key, save_encrypted_json
 
 # Sample pseudonym map for mocking
 mock_pseudonym_map = {
@@ -15,6 +33,13 @@ mock_pseudonym_map = {
 encoded_key = base64.urlsafe_b64encode(b"test_key_12345678901234567890").decode()
 
 
+@pytest.fixture(autouse=True)
+def empty_session_cache():
+    session_cache.clear()
+    yield
+    session_cache.clear()
+
+
 @patch("pd_anonymiser.reidentifier.load_encrypted_json")
 def test_reidentify_basic_substitution(mock_loader):
     mock_loader.return_value = mock_pseudonym_map
@@ -66,3 +91,226 @@ def test_missing_key_gracefully_replaces_nothing(mock_loader):
     result = reidentify_text(anon_text, "dummy", encoded_key)
 
     assert result == anon_text
+
+
+@patch("pd_anonymiser.reidentifier.load_encrypted_json")
+def test_reidentify_does_not_rewrite_restored_text(mock_loader):
+    # The original for Person A looks like another pseudonym
+    mock_loader.return_value = {
+        ("PERSON", "Person B"): "Person A",
+        ("PERSON", "Bob"): "Person B",
+    }
+
+    result = reidentify_text("Person A and Person B", "dummy", encoded_key)
+
+    assert result == "Person B and Bob"
+
+
+@patch("pd_anonymiser.reidentifier.load_encrypted_json")
+def test_reidentify_respects_word_boundaries(mock_loader):
+    mock_loader.return_value = {
+        ("PERSON", "Alice"): "Person A",
+        ("PERSON", "Zed"): "Person AB",
+    }
+
+    result = reidentify_text(
+        "Person ABC, Person AB, Person A. (Person A)", "dummy", encoded_key
+    )
+
+    assert result == "Person ABC, Zed, Alice. (Alice)"
+
+
+def test_matcher_matches_sequential_replacement_on_many_pseudonyms():
+    reverse_map = {
+        f"Person {chr(65 + i)}{chr(65 + j)}": f"name{i}_{j}"
+        for i in range(20)
+        for j in range(20)
+    }
+    reverse_map.update({f"Person {chr(65 + i)}": f"solo{i}" for i in range(26)})
+    text = " ".join(list(reverse_map)[::7]) + " Person Q."
+
+    expected = text
+    for pseudonym in sorted(reverse_map, key=lambda x: -len(x)):
+        expected = re.sub(
+            rf"\b{re.escape(pseudonym)}\b", reverse_map[pseudonym], expected
+        )
+
+    assert PseudonymMatcher(reverse_map).sub(text) == expected
+
+
+def test_get_matcher_is_cached_per_map():
+    first = get_matcher({"Person A": "Alice"})
+    assert get_matcher({"Person A": "Alice"}) is first
+    assert get_matcher({"Person A": "Alicia"}) is not first
+
+
+STREAM_MAP = {
+    "Person A": "Alice",
+    "Person AB": "Zed",
+    "Company A": "Acme Corp",
+    "Location A": "Cambridge",
+}
+STREAM_TEXT = (
+    "Person AB met Person A at Company A. xPerson A, Person ABC and "
+    "Location A (Person A) Person A"
+)
+
+
+def test_reidentifier_matches_batch_output_for_every_split():
+    expected = PseudonymMatcher(STREAM_MAP).sub(STREAM_TEXT)
+
+    for size in range(1, 12):
+        reidentifier = Reidentifier(STREAM_MAP)
+        chunks = [STREAM_TEXT[i : i + size] for i in range(0, len(STREAM_TEXT), size)]
+        output = "".join(reidentifier.feed(c) for c in chunks) + reidentifier.flush()
+        assert output == expected
+
+
+def test_reidentifier_holds_only_possible_pseudonym_prefix():
+    reidentifier = Reidentifier(STREAM_MAP)
+
+    assert reidentifier.feed("Hello Pers") == "Hello "
+    assert reidentifier.feed("on A") == ""
+    assert reidentifier.feed("B is here, Perseus") == "Zed is here, Perseus"
+    assert reidentifier.feed(" Person A.") == " Alice."
+    assert reidentifier.flush() == ""
+
+
+@patch("pd_anonymiser.reidentifier.load_encrypted_json")
+def test_reidentify_stream(mock_loader):
+    mock_loader.return_value = mock_pseudonym_map
+
+    chunks = ["Person", " A met Per", "son B at Comp", "any A."]
+    output = "".join(reidentify_stream(chunks, "dummy", encoded_key))
+
+    assert output == "Alice met Bob at Acme Corp."
+
+
+@patch("pd_anonymiser.reidentifier.load_encrypted_json")
+def test_repeat_reidentify_uses_session_cache(mock_loader):
+    mock_loader.return_value = mock_pseudonym_map
+
+    for _ in range(3):
+        assert reidentify_text("Person A", "session", encoded_key) == "Alice"
+    assert list(reidentify_stream(["Person ", "B"], "session", encoded_key)) == ["Bob"]
+
+    mock_loader.assert_called_once()
+    assert session_cache.stats()["hits"] == 3
+    assert session_cache.stats()["misses"] == 1
+
+
+@patch("pd_anonymiser.reidentifier.load_encrypted_json")
+def test_session_cache_misses_with_another_key(mock_loader):
+    mock_loader.return_value = mock_pseudonym_map
+    reidentify_text("Person A", "session", encoded_key)
+
+    mock_loader.side_effect = ValueError("Invalid token")
+    other_key = base64.urlsafe_b64encode(b"some_other_key").decode()
+    with pytest.raises(ValueError):
+        reidentify_text("Person A", "session", other_key)
+    assert mock_loader.call_count == 2
+
+
+def test_session_cache_evicts_least_recently_used():
+    cache = SessionCache(max_entries=2)
+    matchers = {sid: PseudonymMatcher({"Person A": sid}) for sid in "abc"}
+    cache.put("a", "k", matchers["a"])
+    cache.put("b", "k", matchers["b"])
+    assert cache.get("a", "k") is matchers["a"]
+    cache.put("c", "k", matchers["c"])
+
+    assert cache.get("b", "k") is None
+    assert cache.get("a", "k") is matchers["a"]
+    assert cache.get("c", "k") is matchers["c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_session_cache_byte_limit():
+    small = PseudonymMatcher({"Person A": "Alice"})
+    cache = SessionCache(max_bytes=small.size() * 2 - 1)
+    cache.put("a", "k", small)
+    cache.put("b", "k", PseudonymMatcher({"Person A": "Alice"}))
+
+    assert cache.get("a", "k") is None
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    cache.put("huge", "k", PseudonymMatcher({"Person A": "x" * cache.max_bytes}))
+    assert cache.get("huge", "k") is None
+
+
+def test_session_cache_ttl():
+    cache = SessionCache(ttl=60)
+    matcher = PseudonymMatcher({"Person A": "Alice"})
+    with patch("pd_anonymiser.reidentifier.time.monotonic", return_value=1000.0):
+        cache.put("a", "k", matcher)
+    with patch("pd_anonymiser.reidentifier.time.monotonic", return_value=1059.0):
+        assert cache.get("a", "k") is matcher
+    with patch("pd_anonymiser.reidentifier.time.monotonic", return_value=1061.0):
+        assert cache.get("a", "k") is None
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def ttl_session(request, tmp_path):
+    """A saved session in a store with a 60s TTL, and its encoded key."""
+    if request.param == "file":
+        store = FileSessionStore(tmp_path / "sessions", ttl=60)
+    else:
+        store = SQLiteSessionStore(tmp_path / "sessions.db", ttl=60)
+    set_session_store(store)
+    key = generate_key()
+    save_encrypted_json(mock_pseudonym_map, "session", key)
+    key = base64.urlsafe_b64encode(key).decode()
+    yield store, key
+    set_session_store(None)
+    store.close()
+
+
+def test_expired_session_is_not_served_from_cache(ttl_session):
+    _, key = ttl_session
+    assert reidentify_text("Person A", "session", key) == "Alice"
+    assert reidentify_text("Person A", "session", key) == "Alice"
+    assert session_cache.stats()["hits"] == 1
+
+    later = time.monotonic() + 61
+    with (
+        patch("pd_anonymiser.reidentifier.time.monotonic", return_value=later),
+        patch("pd_anonymiser.sessions.time.time", return_value=time.time() + 61),
+    ):
+        with pytest.raises(SessionNotFoundError):
+            reidentify_text("Person A", "session", key)
+
+
+def test_cached_session_lives_no_longer_than_the_store_allows(tmp_path):
+    store = FileSessionStore(tmp_path, ttl=60)
+    set_session_store(store)
+    try:
+        fernet_key = generate_key()
+        save_encrypted_json(mock_pseudonym_map, "session", fernet_key)
+        key = base64.urlsafe_b64encode(fernet_key).decode()
+        fifty_seconds_ago = time.time() - 50
+        os.utime(tmp_path / "session.enc", (fifty_seconds_ago, fifty_seconds_ago))
+        assert reidentify_text("Person A", "session", key) == "Alice"
+
+        # The cache's own TTL is 600s, but the session only has ~10s left
+        later = time.monotonic() + 11
+        with patch("pd_anonymiser.reidentifier.time.monotonic", return_value=later):
+            assert session_cache.get("session", key) is None
+    finally:
+        set_session_store(None)
+
+
+def test_deleted_and_swept_sessions_leave_the_cache(ttl_session):
+    store, key = ttl_session
+    reidentify_text("Person A", "session", key)
+    store.delete("session")
+    with pytest.raises(SessionNotFoundError):
+        reidentify_text("Person A", "session", key)
+
+    save_encrypted_json(
+        mock_pseudonym_map, "session", base64.urlsafe_b64decode(key.encode())
+    )
+    reidentify_text("Person A", "session", key)
+    assert store.sweep(now=time.time() + 61) == 1
+    assert session_cache.stats()["entries"] == 0
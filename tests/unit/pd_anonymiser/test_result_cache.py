@@ -0,0 +1,233 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from presidio_analyzer import RecognizerResult
+
+import pd_anonymiser.result_cache as result_cache
+from pd_anonymiser.anonymiser import analyse_texts, anonymise_text, clear_engines
+from pd_anonymiser.result_cache import (
+    AnalysisCache,
+    analysis_cache_from_url,
+    cache_key,
+    get_analysis_cache,
+    set_analysis_cache,
+)
+
+TEXT = "Alice Smith emailed bob@example.com from Acme Corp in London."
+
+
+def person():
+    return [RecognizerResult("PERSON", 0, 11, 0.85)]
+
+
+@pytest.fixture(autouse=True)
+def unconfigured(monkeypatch):
+    monkeypatch.setattr(result_cache, "_cache", None)
+    monkeypatch.setattr(result_cache, "_configured", False)
+    clear_engines()
+    yield
+    clear_engines()
+
+
+def test_analyse_runs_once_per_key():
+    cache = AnalysisCache()
+    analyse = MagicMock(side_effect=person)
+
+    first = cache.analyse("k", analyse)
+    second = cache.analyse("k", analyse)
+
+    analyse.assert_called_once()
+    assert [(r.entity_type, r.start, r.end, r.score) for r in second] == [
+        ("PERSON", 0, 11, 0.85)
+    ]
+    # Callers mutate results, so every hit gets its own objects
+    assert second[0] is not first[0]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_hits_report_saved_time():
+    cache = AnalysisCache()
+    cache.put("k", person(), seconds=0.25)
+    cache.get("k")
+    cache.get("k")
+    assert cache.stats()["saved_seconds"] == pytest.approx(0.5)
+
+
+def test_memory_tier_is_lru():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("a", person(), 0.1)
+    cache.put("b", [], 0.1)
+    cache.get("a")
+    cache.put("c", [], 0.1)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_survives_restart_without_storing_text(tmp_path):
+    path = tmp_path / "results.db"
+    key = cache_key(TEXT, "en", "all")
+    first = AnalysisCache(path=path)
+    first.put(key, person(), 0.1)
+    first.close()
+
+    second = AnalysisCache(path=path)
+    assert [r.end for r in second.get(key)] == [11]
+    assert second.get(key) is not None
+    stats = second.stats()
+    assert (stats["hits"], stats["disk_hits"]) == (2, 1)
+    second.close()
+
+    assert b"Alice" not in b"".join(p.read_bytes() for p in tmp_path.iterdir())
+
+
+def test_disk_tier_drops_least_recently_used_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "_PRUNE_EVERY", 1)
+    clock = iter(range(100))
+    monkeypatch.setattr(result_cache.time, "time", lambda: next(clock))
+    cache = AnalysisCache(max_entries=1, path=tmp_path / "r.db", max_disk_entries=2)
+    cache.put("a", person(), 0.1)
+    cache.put("b", person(), 0.1)
+    cache.get("a")  # from disk, as the LRU only holds "b"
+    cache.put("c", person(), 0.1)
+    cache.close()
+
+    reopened = AnalysisCache(path=tmp_path / "r.db")
+    assert reopened.get("b") is None
+    assert reopened.get("a") is not None and reopened.get("c") is not None
+
+
+def test_disk_tier_is_pruned_when_opened_with_a_lower_limit(tmp_path):
+    cache = AnalysisCache(path=tmp_path / "r.db")
+    for key in "abcde":
+        cache.put(key, person(), 0.1)
+    cache.close()
+
+    smaller = AnalysisCache(path=tmp_path / "r.db", max_disk_entries=2)
+    rows = smaller._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    assert rows == 2
+
+
+def test_cache_key_covers_everything_that_changes_results(monkeypatch):
+    key = cache_key(TEXT, "en", "all")
+    assert key == cache_key(TEXT, "en", "all")
+    assert (
+        len(
+            {
+                key,
+                cache_key(TEXT + " ", "en", "all"),
+                cache_key(TEXT, "de", "all"),
+                cache_key(TEXT, "en", "dslim/bert-base-NER"),
+                cache_key(TEXT, "en", "all", cascade=True),
+            }
+        )
+        == 5
+    )
+
+    monkeypatch.setenv("PD_ANONYMISER_HF_BACKEND", "onnx")
+    assert cache_key(TEXT, "en", "all") != key
+    monkeypatch.delenv("PD_ANONYMISER_HF_BACKEND")
+
+    with patch.object(result_cache, "_package_versions", return_value="spacy==9"):
+        assert cache_key(TEXT, "en", "all") != key
+
+
+def test_cache_key_covers_model_revisions(monkeypatch):
+    versions = {
+        "en_core_web_trf": "3.8.0",
+        "dslim/bert-base-NER": "abc123",
+        "StanfordAIMI/stanford-deidentifier-base": "def456",
+    }
+    monkeypatch.setattr(result_cache, "_model_versions", dict(versions))
+    key = cache_key(TEXT, "en", "all")
+
+    monkeypatch.setitem(result_cache._model_versions, "en_core_web_trf", "3.8.1")
+    assert cache_key(TEXT, "en", "all") != key
+    monkeypatch.setitem(result_cache._model_versions, "en_core_web_trf", "3.8.0")
+    monkeypatch.setitem(result_cache._model_versions, "dslim/bert-base-NER", "fff")
+    assert cache_key(TEXT, "en", "all") != key
+    assert cache_key(TEXT, "en", "en_core_web_trf") == cache_key(
+        TEXT, "en", "en_core_web_trf"
+    )
+
+
+def test_hf_revision_from_loaded_model_or_hub_cache(monkeypatch):
+    monkeypatch.setattr(result_cache, "_model_versions", {})
+    recogniser = MagicMock()
+    recogniser.ner_pipeline.model.config._commit_hash = "loaded-hash"
+    monkeypatch.setattr(
+        "pd_anonymiser.models._loaded", {"dslim/bert-base-NER": recogniser}
+    )
+    assert result_cache._model_version("dslim/bert-base-NER") == "loaded-hash"
+
+    monkeypatch.setattr("pd_anonymiser.models._loaded", {})
+    monkeypatch.setattr(
+        "huggingface_hub.try_to_load_from_cache",
+        lambda repo, filename: f"/hub/models--org--m/snapshots/{repo[-1]}99/{filename}",
+    )
+    assert result_cache._model_version("org/m") == "m99"
+
+    monkeypatch.setattr(
+        "huggingface_hub.try_to_load_from_cache", lambda repo, filename: None
+    )
+    assert result_cache._model_version("org/missing") == ""
+    assert "org/missing" not in result_cache._model_versions
+
+
+def test_configuration(monkeypatch, tmp_path):
+    assert get_analysis_cache() is None
+
+    monkeypatch.setattr(result_cache, "_configured", False)
+    monkeypatch.setenv("PD_ANONYMISER_RESULT_CACHE", "memory")
+    assert isinstance(get_analysis_cache(), AnalysisCache)
+
+    disk = analysis_cache_from_url(f"sqlite:{tmp_path / 'r.db'}")
+    assert disk.path == tmp_path / "r.db"
+    assert disk.max_disk_entries == result_cache.DEFAULT_MAX_DISK_ENTRIES
+    disk.close()
+    monkeypatch.setenv("PD_ANONYMISER_RESULT_CACHE_MAX_ROWS", "500")
+    disk = analysis_cache_from_url(f"sqlite:{tmp_path / 'r.db'}")
+    assert disk.max_disk_entries == 500
+    disk.close()
+    with pytest.raises(ValueError, match="Invalid result cache"):
+        analysis_cache_from_url("redis://localhost")
+
+
+@patch("pd_anonymiser.anonymiser.AnalyzerEngine")
+@patch("pd_anonymiser.anonymiser.save_encrypted_json")
+def test_anonymise_text_consults_cache_before_analysing(mock_save, mock_analyzer):
+    mock_analyzer.return_value.analyze.side_effect = lambda **kwargs: person()
+    set_analysis_cache(AnalysisCache())
+
+    with patch("pd_anonymiser.anonymiser.model_registry.register_models"):
+        first = anonymise_text(TEXT, allow_reidentification=True)
+        second = anonymise_text(TEXT, allow_reidentification=True)
+        anonymise_text(TEXT, language="en", model="dslim/bert-base-NER")
+
+    assert first.text == second.text
+    assert first.text.startswith("Person A emailed")
+    assert mock_analyzer.return_value.analyze.call_count == 2
+    assert get_analysis_cache().stats()["hits"] == 1
+
+
+def test_analyse_texts_batches_only_the_cache_misses(monkeypatch):
+    batches = []
+
+    def analyse(texts, language, model, batch_size, cascade):
+        batches.append((list(texts), cascade))
+        return [person() for _ in texts]
+
+    monkeypatch.setattr("pd_anonymiser.anonymiser._analyse_uncached", analyse)
+    set_analysis_cache(AnalysisCache())
+
+    first = analyse_texts(["a", "b", "a"])
+    analyse_texts(["a", "c"])
+    analyse_texts(["a"], cascade=True)
+
+    assert batches == [(["a", "b"], False), (["c"], False), (["a"], True)]
+    assert [[r.end for r in results] for results in first] == [[11], [11], [11]]
+    # A repeated text gets its own result objects
+    assert first[0][0] is not first[2][0]
+    assert get_analysis_cache().stats()["hits"] == 1
@@ -0,0 +1,219 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pd_anonymiser.sessions import (
+    SESSION_STORE_ENV,
+    FileSessionStore,
+    SessionNotFoundError,
+    SessionStats,
+    SessionSweeper,
+    SQLiteSessionStore,
+    get_session_store,
+    session_store_from_url,
+    set_session_store,
+)
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "file":
+        store = FileSessionStore(tmp_path / "sessions")
+    else:
+        store = SQLiteSessionStore(tmp_path / "sessions.db")
+    yield store
+    store.close()
+
+
+def test_put_get_delete(store):
+    store.put("abc", b"token")
+    assert store.get("abc") == b"token"
+
+    store.put("abc", b"replaced")
+    assert store.get("abc") == b"replaced"
+
+    store.delete("abc")
+    with pytest.raises(SessionNotFoundError):
+        store.get("abc")
+
+
+def test_batched_put_and_get(store):
+    items = [(f"s{i}", f"t{i}".encode()) for i in range(1200)]
+    store.put_many(items)
+
+    found = store.get_many([f"s{i}" for i in range(0, 1200, 3)] + ["missing"])
+
+    assert len(found) == 400
+    assert found["s3"] == b"t3"
+    assert "missing" not in found
+
+
+def test_sqlite_uses_wal(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "nested" / "sessions.db")
+    mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    store.close()
+    assert mode == "wal"
+
+
+def test_sqlite_shared_between_threads(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "sessions.db")
+
+    def write_then_read(i):
+        store.put(f"s{i}", b"x" * i)
+        return store.get(f"s{i}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        tokens = list(pool.map(write_then_read, range(64)))
+
+    assert tokens == [b"x" * i for i in range(64)]
+    store.close()
+
+
+def test_session_store_from_url(tmp_path):
+    assert isinstance(session_store_from_url(f"file:{tmp_path}"), FileSessionStore)
+    sqlite_store = session_store_from_url(f"sqlite:{tmp_path / 's.db'}")
+    assert isinstance(sqlite_store, SQLiteSessionStore)
+    sqlite_store.close()
+
+    with pytest.raises(ValueError, match="Unknown session store type"):
+        session_store_from_url("redis:localhost")
+    with pytest.raises(ValueError, match="Invalid session store"):
+        session_store_from_url("sqlite")
+
+
+def test_store_configured_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv(SESSION_STORE_ENV, f"sqlite:{tmp_path / 'env.db'}")
+    set_session_store(None)
+    try:
+        store = get_session_store()
+        assert isinstance(store, SQLiteSessionStore)
+        assert store is get_session_store()
+        store.close()
+    finally:
+        set_session_store(None)
+
+
+def test_import_does_not_create_sessions_dir(tmp_path):
+    subprocess.run(
+        [sys.executable, "-c", "import pd_anonymiser.utils"],
+        cwd=tmp_path,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    assert not (tmp_path / "sessions").exists()
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def ttl_store(request, tmp_path):
+    if request.param == "file":
+        store = FileSessionStore(tmp_path / "sessions", ttl=60)
+    else:
+        store = SQLiteSessionStore(tmp_path / "sessions.db", ttl=60)
+    yield store
+    store.close()
+
+
+def test_stats(ttl_store):
+    assert ttl_store.stats() == SessionStats(count=0, bytes=0, oldest=None)
+
+    before = time.time()
+    ttl_store.put_many([("a", b"12345"), ("b", b"123")])
+    stats = ttl_store.stats()
+
+    assert (stats.count, stats.bytes) == (2, 8)
+    assert before - 1 <= stats.oldest <= time.time()
+
+
+def test_sweep_removes_only_expired_sessions(ttl_store):
+    ttl_store.put_many([("old", b"x"), ("new", b"y")])
+
+    assert ttl_store.sweep() == 0
+    assert ttl_store.sweep(now=time.time() + 61) == 2
+    assert ttl_store.stats().count == 0
+
+
+def test_expired_session_is_not_returned_before_sweep(tmp_path):
+    store = FileSessionStore(tmp_path, ttl=60)
+    store.put("old", b"x")
+    store.put("live", b"y")
+    an_hour_ago = time.time() - 3600
+    os.utime(tmp_path / "old.enc", (an_hour_ago, an_hour_ago))
+
+    with pytest.raises(SessionNotFoundError):
+        store.get("old")
+    assert store.get("live") == b"y"
+    assert store.sweep() == 1
+    assert store.get("live") == b"y"
+
+
+def test_sqlite_expired_session_is_not_returned(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "s.db", ttl=0.01)
+    store.put("old", b"x")
+    time.sleep(0.05)
+
+    with pytest.raises(SessionNotFoundError):
+        store.get("old")
+    assert store.get_many(["old"]) == {}
+    assert store.sweep() == 1
+    store.compact()
+    store.close()
+
+
+def test_sqlite_adds_creation_time_to_older_databases(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, token BLOB)")
+    conn.execute("INSERT INTO sessions VALUES ('legacy', x'00')")
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path, ttl=60)
+    assert store.get("legacy") == b"\x00"
+    assert store.stats().count == 1
+    store.close()
+
+
+def test_no_ttl_never_expires(store):
+    store.put("forever", b"x")
+    assert store.sweep(now=time.time() + 10**9) == 0
+    assert store.get("forever") == b"x"
+
+
+def test_sweeper_runs_in_background(tmp_path):
+    store = SQLiteSessionStore(tmp_path / "s.db", ttl=0.01)
+    store.put("old", b"x")
+
+    sweeper = SessionSweeper(store, interval=0.02, compact=True).start()
+    deadline = time.time() + 5
+    while store.stats().count and time.time() < deadline:
+        time.sleep(0.02)
+    sweeper.stop()
+
+    assert store.stats().count == 0
+    store.close()
+
+
+def test_removal_hooks_see_deleted_and_swept_sessions(ttl_store, monkeypatch):
+    removed = []
+    monkeypatch.setattr("pd_anonymiser.sessions._removal_hooks", [removed.extend])
+    ttl_store.put_many([("a", b"x"), ("b", b"y"), ("c", b"z")])
+
+    ttl_store.delete("a")
+    ttl_store.sweep(now=time.time() + 61)
+
+    assert removed[0] == "a"
+    assert sorted(removed[1:]) == ["b", "c"]
+
+
+def test_expires_in(ttl_store, store):
+    ttl_store.put("a", b"x")
+
+    assert 59 < ttl_store.expires_in("a") <= 60
+    assert ttl_store.expires_in("missing") == 0
+    store.put("a", b"x")
+    assert store.expires_in("a") is None
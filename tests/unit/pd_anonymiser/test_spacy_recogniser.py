@@ -1,4 +1,4 @@
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from presidio_analyzer import AnalyzerEngine, RecognizerResult
 from pd_anonymiser.recognisers.spacy import SpacyNERRecogniser
 
@@ -68,3 +68,32 @@ def test_should_recognise_people_date_and_place():
 
     if not any("Parliament" in span for span in recognised_spans):
         print("Warning: 'Parliament' was not recognised as a named entity.")
+
+
+def _fake_doc(*ents):
+    doc = MagicMock()
+    doc.ents = [
+        MagicMock(label_=label, start_char=start, end_char=end)
+        for label, start, end in ents
+    ]
+    return doc
+
+
+@patch("pd_anonymiser.recognisers.spacy.spacy.load")
+def test_analyze_batch_uses_nlp_pipe(mock_load):
+    nlp = mock_load.return_value
+    nlp.pipe.return_value = iter(
+        [_fake_doc(("PERSON", 0, 5), ("GPE", 15, 21)), _fake_doc()]
+    )
+    recogniser = SpacyNERRecogniser()
+
+    texts = ["Alice lives in London.", "Nothing here."]
+    batches = recogniser.analyze_batch(texts, ["PERSON", "LOCATION"], batch_size=16)
+
+    nlp.pipe.assert_called_once_with(texts, batch_size=16)
+    nlp.assert_not_called()
+    assert [(r.entity_type, r.start, r.end) for r in batches[0]] == [
+        ("PERSON", 0, 5),
+        ("LOCATION", 15, 21),
+    ]
+    assert batches[1] == []
@@ -0,0 +1,81 @@
+import io
+import re
+from unittest.mock import MagicMock, patch
+
+import pytest
+from presidio_analyzer import RecognizerResult
+
+from pd_anonymiser.streaming import _segments, anonymise_stream
+
+
+def fake_analyse(text, language):
+    return [
+        RecognizerResult("PERSON", m.start(), m.end(), 0.9)
+        for m in re.finditer(r"Alice|Bob", text)
+    ]
+
+
+@pytest.fixture
+def mock_analyser():
+    analyser = MagicMock()
+    analyser.analyze.side_effect = fake_analyse
+    with patch("pd_anonymiser.streaming.get_analyser", return_value=analyser):
+        yield analyser
+
+
+@patch("pd_anonymiser.anonymiser.save_encrypted_json")
+def test_stream_shares_pseudonyms_and_saves_once(mock_save, mock_analyser):
+    log = io.StringIO("Alice logged in\nBob logged in\nAlice logged out\n" * 50)
+
+    stream = anonymise_stream(log, allow_reidentification=True, chunk_size=64)
+    assert stream.session_id is None
+
+    output = "".join(stream)
+
+    assert mock_analyser.analyze.call_count > 1
+    assert (
+        output == "Person A logged in\nPerson B logged in\nPerson A logged out\n" * 50
+    )
+    mock_save.assert_called_once()
+    assert mock_save.call_args.args[0] == {
+        ("PERSON", "Alice"): "Person A",
+        ("PERSON", "Bob"): "Person B",
+    }
+    assert stream.session_id == mock_save.call_args.args[1]
+    assert stream.key is not None
+
+
+@patch("pd_anonymiser.anonymiser.save_encrypted_json")
+def test_stream_without_entities_has_no_session(mock_save, mock_analyser):
+    stream = anonymise_stream(["nothing ", "to see\n"])
+
+    assert "".join(stream) == "nothing to see\n"
+    mock_save.assert_not_called()
+    assert stream.session_id is None
+
+
+def test_stream_iterates_once(mock_analyser):
+    stream = anonymise_stream([])
+    list(stream)
+    with pytest.raises(RuntimeError):
+        iter(stream)
+
+
+def test_segments_cut_on_line_breaks():
+    lines = [f"line {i} Alice Smith\n" for i in range(100)]
+
+    segments = list(_segments(lines, chunk_size=100))
+
+    assert "".join(segments) == "".join(lines)
+    assert all(s.endswith("\n") for s in segments)
+    assert max(len(s) for s in segments) <= 200
+
+
+def test_segments_fall_back_to_whitespace_then_hard_cut():
+    words = ["word"] * 100
+    assert all(
+        s.endswith(" ") for s in list(_segments([" ".join(words) + " "], 20))[:-1]
+    )
+
+    blob = "x" * 100
+    assert list(_segments([blob], 20)) == ["x" * 40, "x" * 40, "x" * 20]
@@ -0,0 +1,128 @@
+import copy
+
+import pytest
+
+from pd_anonymiser.structured import anonymise_json, reidentify_json
+
+pytestmark = pytest.mark.usefixtures("session_store")
+
+
+@pytest.fixture
+def analyser(monkeypatch, fake_analyser):
+    monkeypatch.setattr("pd_anonymiser.structured.analyse_texts", fake_analyser)
+    return fake_analyser
+
+
+@pytest.fixture
+def payload():
+    return {
+        "id": "Alice Smith",
+        "created_at": "2024-05-01T10:00:00Z",
+        "customer": {"name": "Alice Smith", "city": "Leeds", "age": 42},
+        "orders": [
+            {"id": "o-1", "note": "Deliver to Bob Jones", "paid": True},
+            {"id": "o-2", "note": "Alice Smith will collect", "total": 9.5},
+        ],
+        "tags": ("Bob Jones", None),
+    }
+
+
+def test_string_leaves_are_analysed_in_one_batch(analyser, payload):
+    anonymise_json(payload, exclude_paths=["**.id", "created_at"])
+
+    assert analyser.batches == [
+        [
+            "Alice Smith",
+            "Leeds",
+            "Deliver to Bob Jones",
+            "Alice Smith will collect",
+            "Bob Jones",
+        ]
+    ]
+
+
+def test_pseudonyms_are_shared_across_fields(analyser, payload):
+    result = anonymise_json(
+        payload, exclude_paths=["**.id", "created_at"], allow_reidentification=True
+    )
+
+    assert result.data == {
+        "id": "Alice Smith",
+        "created_at": "2024-05-01T10:00:00Z",
+        "customer": {"name": "Person A", "city": "Location A", "age": 42},
+        "orders": [
+            {"id": "o-1", "note": "Deliver to Person B", "paid": True},
+            {"id": "o-2", "note": "Person A will collect", "total": 9.5},
+        ],
+        "tags": ("Person B", None),
+    }
+
+
+def test_include_paths_select_fields(analyser, payload):
+    result = anonymise_json(payload, include_paths=["orders.*.note", "tags.0"])
+
+    assert result.data["customer"] == payload["customer"]
+    assert result.data["orders"][0]["note"] == "Deliver to <PERSON>"
+    assert result.data["tags"] == ("<PERSON>", None)
+
+
+def test_exclusions_apply_below_a_path(analyser, payload):
+    result = anonymise_json(payload, exclude_paths=["customer", "orders.1"])
+
+    assert result.data["customer"] == payload["customer"]
+    assert result.data["orders"][1] == payload["orders"][1]
+    assert result.data["id"] == "<PERSON>"
+
+
+def test_input_is_not_modified(analyser, payload):
+    original = copy.deepcopy(payload)
+
+    anonymise_json(payload, allow_reidentification=True)
+
+    assert payload == original
+
+
+def test_data_can_be_reidentified_from_one_session(analyser, payload):
+    result = anonymise_json(
+        payload, exclude_paths=["**.id"], allow_reidentification=True
+    )
+    restored = reidentify_json(
+        result.data, result.session_id, result.key, exclude_paths=["**.id"]
+    )
+
+    assert restored == payload
+
+
+def test_excluded_fields_are_not_reidentified(analyser):
+    payload = {"ref": "Person A", "name": "Alice Smith", "notes": ["Bob Jones"]}
+
+    result = anonymise_json(payload, exclude_paths=["ref"], allow_reidentification=True)
+    restored = reidentify_json(
+        result.data, result.session_id, result.key, exclude_paths=["ref"]
+    )
+
+    assert result.data == {"ref": "Person A", "name": "Person A", "notes": ["Person B"]}
+    assert restored == payload
+
+    result = anonymise_json(
+        payload, include_paths=["notes"], allow_reidentification=True
+    )
+    restored = reidentify_json(
+        {**result.data, "name": "Person A"},
+        result.session_id,
+        result.key,
+        include_paths=["notes"],
+    )
+    assert restored == {"ref": "Person A", "name": "Person A", "notes": ["Bob Jones"]}
+
+
+def test_data_without_pii_has_no_session(analyser):
+    result = anonymise_json({"a": ["nothing", ""], "b": 1}, allow_reidentification=True)
+
+    assert result.session_id is None and result.key is None
+    assert result.data == {"a": ["nothing", ""], "b": 1}
+
+
+def test_empty_path_is_rejected():
+    with pytest.raises(ValueError, match="Empty path"):
+        anonymise_json({}, exclude_paths=[""])
@@ -4,16 +4,24 @@ from pathlib import Path
 import pytest
 from cryptography.fernet import Fernet
 
-from pd_anonymiser.utils import generate_key, save_encrypted_json, load_encrypted_json
+from pd_anonymiser.sessions import FileSessionStore, set_session_store
+from pd_anonymiser.utils import (
+    generate_key,
+    save_encrypted_json,
+    save_encrypted_jsons,
+    load_encrypted_json,
+)
 
 
 @pytest.fixture
-def temp_session_dir(monkeypatch):
-    """Creates a temporary sessions/ directory and patches DATA_DIR."""
+def temp_session_dir():
+    """Creates a temporary sessions/ directory and stores sessions there."""
     temp_dir = tempfile.TemporaryDirectory()
     temp_path = Path(temp_dir.name)
-    monkeypatch.setattr("pd_anonymiser.utils.DATA_DIR", temp_path)
-    return temp_path, temp_dir
+    set_session_store(FileSessionStore(temp_path))
+    yield temp_path, temp_dir
+    set_session_store(None)
+    temp_dir.cleanup()
 
 
 def test_generate_key_is_valid():
@@ -54,3 +62,16 @@ def test_decryption_fails_with_wrong_key(temp_session_dir):
 
     with pytest.raises(Exception):
         load_encrypted_json(session_id, wrong_key)
+
+
+def test_save_encrypted_jsons_batch(temp_session_dir):
+    keys = [generate_key() for _ in range(3)]
+    sessions = [
+        ({("PERSON", f"name{i}"): "Person A"}, f"batch-{i}", key)
+        for i, key in enumerate(keys)
+    ]
+
+    save_encrypted_jsons(sessions)
+
+    for data, session_id, key in sessions:
+        assert load_encrypted_json(session_id, key) == data